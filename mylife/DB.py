@@ -1,9 +1,69 @@
 import json
-from jsonschema import validate, ValidationError
+from array import array
 from mylife.schema import schema 
+from mylife.columnar import ColumnStore, LazyDates, encode_dates
+from mylife.locking import FileLock
+from mylife.dates import parse_date, decode_dates
+from mylife.rollups import habit_rollup, ordinals_rollup, merge_rollups
+from mylife.archive import ArchiveStore, TieredDates
+from mylife.completions import CompletionBitset
+from mylife.streak import new_state
+from mylife import trace
+from contextlib import contextmanager, nullcontext
 import os
+import time
 # dir_path = os.path.dirname(os.path.realpath(__file__))
 
+_validators = {}
+
+def get_validator(field: str = None):
+    """
+    Returns the validator for mylife.schema.schema, or for one of its properties, compiled once per process.
+    The schema itself is only checked against its metaschema on the first call.
+    jsonschema is imported here rather than at module level so commands that never validate start faster.
+    """
+    if None not in _validators:
+        from jsonschema.validators import validator_for
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        _validators[None] = cls(schema)
+    if field not in _validators:
+        _validators[field] = _validators[None].evolve(schema=schema["properties"][field])
+    return _validators[field]
+
+def first_error(validator, instance) -> str:
+    """ Message of the most relevant validation error (the one jsonschema.validate would raise), or None."""
+    from jsonschema.exceptions import best_match
+    error = best_match(validator.iter_errors(instance))
+    return None if error is None else error.message
+
+
+def sorted_ordinals(completion_dates: list[str], since: int = None, cached: tuple = None) -> tuple:
+    """
+    Sorted day ordinals of completion dates, as the cache entry (completion list, its length, sorted day ordinals, recent only).
+    cached is returned as it is while it still describes the completion list, dates still in a history store are not decoded.
+    When no date before the day ordinal since is needed and none of the later ones are archived, only the recent dates
+    of a TieredDates are sorted and the archive is not read.
+    """
+    dates = completion_dates
+    recent = since is not None and isinstance(dates, TieredDates) and not dates.loaded and since > dates.archived_until
+    if cached is not None and cached[0] is dates and cached[1] == len(dates) and not (cached[3] and not recent):
+        return cached
+    trace.count("ordinal sorts")
+    if recent:
+        ordinals = array("i", sorted(dates.recent_ordinals()))
+    elif isinstance(dates, CompletionBitset):
+        ordinals = array("i", dates.ordinals())
+    elif isinstance(dates, LazyDates) and not dates.loaded:
+        ordinals = array("i", sorted(dates.ordinals()))
+    else:
+        ordinals = array("i", sorted(map(parse_date, dates)))
+    return (dates, len(dates), ordinals, recent)
+
+
+class VersionConflict(RuntimeError):
+    """ Raised by a write when another process changed the database since this instance loaded it."""
+
 class Database:
     """ 
     Database Class
@@ -20,6 +80,64 @@ class Database:
         The default schema structure for the database.
     db : dict
         The in-memory representation of the loaded database.
+    journal : bool
+        when True, save_habit and delete_habit append small records to the journal file instead of rewriting the whole JSON file.
+    journal_filename : str
+        location of the append-only journal, kept next to the JSON file.
+    compact_every : int
+        number of journal records after which the journal is compacted into a fresh snapshot.
+    defer_writes : bool
+        when True, journal records are kept in memory until flush() writes them in one append (used by the 'mla serve' daemon).
+    layout : ["inline", "columnar", "sharded"]
+        where save_db puts completion dates: inside the JSON file, in the binary history sidecar, or in per id range
+        shard files with the JSON file acting as a metadata index. Defaults to the layout found on disk.
+    date_format : ["text", "ordinal"]
+        how the JSON snapshot and the journal store completion dates: 'DD/MM/YYYY' strings or integer day ordinals
+        (smaller and faster to parse). Loaded habits always hold strings. Defaults to the format found on disk.
+    history_filename : str
+        location of the completion history sidecar, kept next to the JSON file.
+    shard_dirname : str
+        location of the shard folder, kept next to the JSON file.
+    shard_size : int
+        number of consecutive habit ids sharing one shard file.
+    history : ColumnStore | ShardStore | None
+        store the lazily decoded completion dates are read from.
+    archive_dirname : str
+        location of the archive segments written by archive(), kept next to the JSON file.
+    archive : ArchiveStore | None
+        store the archived completion dates of TieredDates lists are read from, None while nothing is archived.
+    rollups_filename : str
+        location of the rollup side file, kept next to the JSON file. One JSON line per habit rollup written, then one
+        version line per write: every write appends the rollups of the habits it touched, a snapshot rewrites it whole.
+    lock_filename : str
+        location of the advisory lock taken around every read and write of the files, it also holds the version counter.
+    read_only : bool
+        when True, loading neither takes the lock (nor creates the lock file) nor writes anything: an empty file is not
+        initialized and a torn journal record is left in place. Every write raises ValueError. Used by reports over many databases.
+    _version : int
+        version of the files this instance last loaded or wrote. Every snapshot stores its version and every journal
+        record adds one, a write is refused with VersionConflict when the counter on disk moved on.
+    _name_index : dict[str, list[str]]
+        habit name -> ids of the habits using it, kept in sync on every load, save, delete and seed injection.
+    _last_id : int
+        highest id ever seen by this instance, never decreases so deleted ids are not handed out again.
+    _valid_fields : dict[str, tuple]
+        (name, desc, frequency) of every stored habit as it was indexed, a save that leaves them unchanged only revalidates
+        the other fields. Its name is the one the name index holds, even when the stored dictionary was changed in place.
+    _dirty : dict[str, str] | None
+        habit id -> last operation ("save" or "delete") of the open transaction(), None outside of one.
+    _dirty_snapshot : bool
+        True when save_db was called inside the open transaction, which then ends with a full snapshot.
+    _rollups : dict[str, dict] | None
+        habit id -> days completed per ISO week and per month, read from the rollup side file on the first use of rollups
+        and then kept in sync by every save and delete, which only rebuild the rollup of the habit they touch.
+        Never stored in the records.
+    _rollup_keys : set[str]
+        ids of the habits saved or deleted since the last load or write, their rollups are the ones the next write appends
+        to the side file, and the ones recomputed over a side file read before they were written.
+    _ordinals : dict[str, tuple]
+        habit id -> sorted day ordinals of its completions (see sorted_ordinals), built by the first date range query
+        on the habit and dropped when it is saved or deleted, so later queries are two binary searches.
         
     Methods
     -------
@@ -28,42 +146,621 @@ class Database:
     
     load_db()
     
+    compact()
+
+    archive_before(before: int, compression: str = "lzma") : int
+
+    flush() : int
+    
     validate_habit(habit_data: dict[str, any]) : Boolean or ValidationError
 
+    validate_many(habits: list[dict[str, any]]) : dict[str, list[str]]
+
     save_habit(habit_data: dict[str, any])
+
+    save_habits(habits: list[dict[str, any]]) : dict[str, list[str]]
+
+    retry_on_conflict(operation: Callable) : any
+
+    transaction() : context manager
     
     last_id() : int last_id OR -1
     
     get_habit_by_name(name: str) : dict[str, any] OR LookUpError
+
+    sorted_ordinals(habit_id: int, since: int = None, until: int = None) : array
     
     delete_habit(id: str)
+
+    rollups : dict[str, dict]
     """
 
     #def __init__(self, filename= (dir_path + "\\MylifeData.json")):
-    def __init__(self, filename= "mylife\\MylifeData.json"):
+    def __init__(self, filename= "mylife\\MylifeData.json", journal= False, compact_every= 100, layout= None, shard_size= 64, date_format= None,
+                 read_only= False):
         self.filename = filename
+        self.read_only = read_only
+        self.journal = journal
+        self.journal_filename = filename + ".journal"
+        self.compact_every = compact_every
+        self.history_filename = filename + ".cols"
+        self.shard_dirname = filename + ".shards"
+        self.shard_size = shard_size
+        self.layout = layout or self._stored_layout()
+        self.date_format = date_format
+        self.history = None
+        self.archive_dirname = filename + ".archive"
+        self.archive = None
+        self.rollups_filename = filename + ".rollups"
+        self.lock_filename = filename + ".lock"
+        self._lock = None
+        self._version = 0
+        self._journal_records = 0
+        self.defer_writes = False
+        self._pending_lines = []
+        self._dirty = None
+        self._dirty_snapshot = False
+        self._name_index = {}
+        self._last_id = -1
+        self._valid_fields = {}
+        self._rollups = None
+        self._rollup_keys = set()
+        self._ordinals = {}
         self.db_schema = {"database": self.filename, "habit": {}}  # Dictionary-based storage
         self.db = self.load_db()
 
     def save_db(self):
-        """Save database to JSON file."""
-        with open(self.filename, "w") as f:
-            json.dump(self.db, f, indent=4)
+        """
+        Save database to JSON file, the snapshot then contains every journal record so the journal is dropped.
+        Inside a transaction the snapshot is written when the transaction ends.
+        """
+        if self._dirty is not None:
+            self._dirty_snapshot = True
+            return
+        with self._locked():
+            self._check_version()
+            if self.archive is not None and self.layout != "inline":
+                self._load_archive()  # only the inline layout keeps an archive
+            if self.history is not None and self._stored_layout() != self.layout:
+                self._inline_history()  # switching layout, decode everything from the old store first
+            if self.layout == "columnar":
+                snapshot = self._write_history()
+            elif self.layout == "sharded":
+                snapshot = self._write_shards()
+            else:
+                snapshot = self._inline_history()
+                if self.archive is not None:
+                    snapshot = dict(snapshot, habit={key: self._tiered(habit) for key, habit in snapshot["habit"].items()})
+            if self.date_format == "ordinal":
+                snapshot = dict(snapshot, habit={key: self._encode_dates(habit) for key, habit in snapshot["habit"].items()})
+                snapshot["date format"] = "ordinal"
+            snapshot = dict(snapshot, version=self._version + 1)
+            # readers and crashed writers only ever see the old or the new file, never a truncated one
+            with open(self.filename + ".tmp", "w") as f, trace.phase("json dump"):
+                json.dump(snapshot, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            if trace.enabled:
+                trace.count("bytes written", os.path.getsize(self.filename + ".tmp"))
+            os.replace(self.filename + ".tmp", self.filename)
+            self._write_rollups(self._version, snapshot["version"], whole=True)
+            self._pending_lines = []  # records held back by defer_writes are part of the snapshot as well
+            self._clear_journal()
+            if self.layout != "columnar" and os.path.exists(self.history_filename):
+                os.remove(self.history_filename)
+            if self.layout != "sharded" and os.path.exists(self.shard_dirname):
+                import shutil
+                shutil.rmtree(self.shard_dirname)
+            if self.archive is not None:
+                self.archive.prune({number for habit in snapshot["habit"].values() for number in habit.get("archived", {}).get("segments", ())})
+            elif os.path.exists(self.archive_dirname):
+                import shutil
+                shutil.rmtree(self.archive_dirname)
+            self._set_version(snapshot["version"])
+
+    @contextmanager
+    def _locked(self):
+        """ Holds the advisory lock of the database files, nested uses within this instance share it."""
+        if self.read_only:
+            raise ValueError(f"'{self.filename}' was opened read only")
+        if self._lock is not None:
+            yield self._lock
+            return
+        with FileLock(self.lock_filename) as lock:
+            self._lock = lock
+            try:
+                yield lock
+            finally:
+                self._lock = None
+
+    def _check_version(self):
+        """ Raises VersionConflict if another process wrote since this instance loaded or wrote, the lock must be held."""
+        stored = self._lock.version()
+        if stored is not None and stored != self._version:
+            raise VersionConflict(f"'{self.filename}' changed from version {self._version} to {stored}")
+
+    def _set_version(self, version: int):
+        self._version = version
+        self._lock.set_version(version)
+
+    def _stored_layout(self) -> str:
+        """ Detects the completion date layout of the files on disk."""
+        if os.path.exists(self.history_filename):
+            return "columnar"
+        if os.path.exists(self.shard_dirname):
+            return "sharded"
+        return "inline"
+
+    def load_db(self, keep_pending: bool = False):
+        """
+        Load database, initialize if missing. Records left in the journal are replayed on top of the snapshot.
+        Records held back by defer_writes are written first, or with keep_pending=True kept back and replayed after the journal.
+        A read only database is loaded without the lock: snapshots are replaced atomically and journal records appended whole.
+        """
+        if not keep_pending:
+            self.flush()  # held back records would otherwise be lost when re-reading the files
+        with nullcontext() if self.read_only else self._locked():
+            try:
+                with open(self.filename, "r") as f, trace.phase("read"):
+                    content = f.read().strip()
+                trace.count("bytes read", len(content))
+            except FileNotFoundError:
+                content = ""
+            if content:
+                try:
+                    with trace.phase("json parse"):
+                        self.db = json.loads(content)
+                except json.JSONDecodeError as e:  # never replace a damaged file with an empty database
+                    raise ValueError(f"'{self.filename}' is not a valid database ({e}), restore or remove it")
+            else:
+                self.db = self.db_schema
+            stored_format = self.db.pop("date format", "text")
+            self.date_format = self.date_format or stored_format
+            pending = set()
+            with trace.phase("journal replay"):
+                self._replay_journal(self.db)
+                if keep_pending:
+                    self._apply_records(self.db, self._pending_lines, pending)
+            for habit in self.db["habit"].values():
+                dates = habit.get("completion dates")
+                if type(dates) is list and dates and type(dates[0]) is int:
+                    habit["completion dates"] = decode_dates(dates)
+            self._attach_archive(self.db)
+            self._version = self.db.pop("version", 0) + self._journal_records
+            if not self.read_only and self._lock.version() != self._version:
+                self._set_version(self._version)
+            if content:
+                self._attach_history(self.db)
+            elif not self.read_only:
+                if os.path.exists(self.rollups_filename):
+                    os.remove(self.rollups_filename)  # left by a removed database
+                self.save_db()
+            self._build_index()
+            self._rollup_keys.update(pending)  # not written yet, like changes made after the load
+            return self.db
+
+    def _attach_history(self, db: dict[str, any]):
+        """ Gives habits stored without inline completion dates a LazyDates list backed by the sidecar or the shards."""
+        stored = self._stored_layout()
+        if stored == "inline":
+            return
+        if self.history is not None:
+            self.history.close()
+        if stored == "columnar":
+            self.history = ColumnStore(self.history_filename)
+        else:
+            from mylife.shards import ShardStore
+            self.history = ShardStore(self.shard_dirname, self.shard_size)
+        for habit in db["habit"].values():
+            count = habit.pop("completion count", 0)
+            if "completion dates" not in habit:
+                habit["completion dates"] = LazyDates(self.history, int(habit["id"]))
+                if stored == "sharded":
+                    self.history.counts[int(habit["id"])] = count
+
+    def _attach_archive(self, db: dict[str, any]):
+        """ Gives habits with archived completion dates a TieredDates list, the segments are only read when needed."""
+        self.archive = None
+        for habit in db["habit"].values():
+            marker = habit.pop("archived", None)
+            if marker is None:
+                continue
+            if self.archive is None:
+                self.archive = ArchiveStore(self.archive_dirname)
+            habit["completion dates"] = TieredDates(self.archive, int(habit["id"]), habit.get("completion dates", []),
+                                                    marker["count"], marker["segments"], marker["until"], marker.get("rollup"))
+
+    def _load_archive(self):
+        """ Decompresses every archived completion date back into its habit's list."""
+        for habit in self.db["habit"].values():
+            if isinstance(habit.get("completion dates"), TieredDates):
+                habit["completion dates"].load()
+        self.archive = None
 
-    def load_db(self):
-        """Load database, initialize if missing."""
+    @staticmethod
+    def _tiered(habit_data: dict[str, any]) -> dict[str, any]:
+        """ Copy of a habit with only its recent completion dates and an 'archived' marker, the habit itself when none are archived."""
+        dates = habit_data.get("completion dates")
+        if isinstance(dates, TieredDates) and not dates.loaded:
+            return dict(habit_data, **{"completion dates": dates.recent(), "archived": dates.marker()})
+        return habit_data
+
+    def _write_history(self) -> dict[str, any]:
+        """
+        Writes every completion date that can be encoded as a day ordinal into the history sidecar.
+        Returns the JSON snapshot to dump: habits without their completion dates, except those holding unparseable dates.
+        """
+        rows = []
+        snapshot = dict(self.db, habit={})
+        for key, habit in self.db["habit"].items():
+            try:
+                rows.append((int(habit["id"]), encode_dates(habit.get("completion dates", []))))
+                snapshot["habit"][key] = {k: v for k, v in habit.items() if k != "completion dates"}
+            except ValueError:  # keep dates that are not 'DD/MM/YYYY' inline
+                snapshot["habit"][key] = habit
+        if self.history is not None:
+            self.history.close()  # the file cannot be replaced while it is mapped on every platform
+        ColumnStore.write(self.history_filename, rows)
+        if self.history is None:
+            self.history = ColumnStore(self.history_filename)
+        else:
+            self.history.reopen()
+        return snapshot
+
+    def _write_shards(self) -> dict[str, any]:
+        """
+        Rewrites the shards holding changed or deleted habits, shards whose habits were never decoded are left alone.
+        Returns the JSON snapshot to dump: the metadata index with a completion count per habit.
+        """
+        if self.history is None:
+            from mylife.shards import ShardStore
+            self.history = ShardStore(self.shard_dirname, self.shard_size)
+        store = self.history
+        os.makedirs(self.shard_dirname, exist_ok=True)
+        shards = {}
+        dirty = {store.shard_of(habit_id) for habit_id in store.counts if str(habit_id) not in self.db["habit"]}
+        snapshot = dict(self.db, habit={})
+        for key, habit in self.db["habit"].items():
+            habit_id = int(habit["id"])
+            dates = habit.get("completion dates", [])
+            shards.setdefault(store.shard_of(habit_id), {})[habit_id] = dates
+            if not (isinstance(dates, LazyDates) and not dates.loaded):
+                dirty.add(store.shard_of(habit_id))
+            snapshot["habit"][key] = {k: v for k, v in habit.items() if k != "completion dates"}
+            snapshot["habit"][key]["completion count"] = len(dates)
+        for shard in dirty:
+            store.write_shard(shard, shards.get(shard, {}))
+        store.counts = {int(habit["id"]): len(habit.get("completion dates", [])) for habit in self.db["habit"].values()}
+        return snapshot
+
+    def _inline_history(self) -> dict[str, any]:
+        """ Decodes every lazily loaded completion list so the snapshot holds all dates inline."""
+        if self.history is not None:
+            for habit in self.db["habit"].values():
+                if isinstance(habit.get("completion dates"), LazyDates):
+                    habit["completion dates"].load()
+            self.history.close()
+            self.history = None
+        return self.db
+
+    @staticmethod
+    def _encode_dates(habit_data: dict[str, any]) -> dict[str, any]:
+        """ Copy of a habit with its completion dates as day ordinals, the habit itself if a date does not parse."""
+        dates = habit_data.get("completion dates")
+        if not dates:
+            return habit_data
+        try:
+            return dict(habit_data, **{"completion dates": [parse_date(day) for day in dates]})
+        except (ValueError, TypeError):  # keep what validation let through untouched
+            return habit_data
+
+    def _build_index(self):
+        """ Rebuilds the name index and id counter from the loaded habits, the rollups and sorted ordinals are read on their next use."""
+        self._name_index = {}
+        self._last_id = -1
+        self._valid_fields = {}
+        self._rollups = None
+        self._ordinals = {}
+        for key, habit in self.db["habit"].items():
+            self._index_habit(key, habit)
+        self._rollup_keys = set()
+
+    def _index_habit(self, key: str, habit_data: dict[str, any]):
+        """ Adds a stored habit to the name index and the rollups, and moves the id counter forward."""
+        self._name_index.setdefault(habit_data["name"], []).append(key)
+        self._last_id = max(self._last_id, int(key))
+        self._valid_fields[key] = (habit_data["name"], habit_data.get("desc"), habit_data.get("frequency"))
+        self._rollup_keys.add(key)
+        if self._rollups is not None:
+            self._rollups[key] = habit_rollup(habit_data.get("completion dates", []))
+
+    def _unindex_habit(self, key: str, habit_data: dict[str, any]):
+        """ Removes a stored habit from the name index, the rollups and the sorted ordinals, by the name it was indexed under."""
+        name = self._valid_fields[key][0] if key in self._valid_fields else habit_data["name"]
+        keys = self._name_index.get(name, [])
+        if key in keys:
+            keys.remove(key)
+        if not keys:
+            self._name_index.pop(name, None)
+        self._valid_fields.pop(key, None)
+        self._ordinals.pop(key, None)
+        self._rollup_keys.add(key)
+        if self._rollups is not None:
+            self._rollups.pop(key, None)
+
+    @staticmethod
+    def _store_streak(habit_data: dict[str, any]):
+        """
+        Recomputes the streak summary a habit about to be stored came with, its dates may have changed without its count.
+        Dates that do not parse drop the summary. A TieredDates that is not loaded keeps a summary counting its dates:
+        archive_before wrote it and recomputing it would read the archive back.
+        """
+        streak = habit_data.get("streak")
+        if not streak:
+            return
+        dates = habit_data.get("completion dates", [])
+        if isinstance(dates, TieredDates) and not dates.loaded \
+                and streak.get("frequency") == habit_data["frequency"] and streak.get("total") == len(dates):
+            return
+        try:
+            habit_data["streak"] = new_state(dates, habit_data["frequency"])
+        except (ValueError, TypeError):  # validation only requires strings
+            del habit_data["streak"]
+
+    @property
+    def rollups(self) -> dict[str, dict]:
+        """
+        Days completed per ISO week and per month of every habit (see mylife.rollups.habit_rollup), read by 'mla anal --heatmap'.
+        Read from the rollup side file on first use, only the habits changed since the last load or write are counted again.
+        A side file another writer left behind (or none at all) is rebuilt from the day ordinals and written back,
+        archived dates are read from the rollup of their archive marker. Later saves and deletes only update the habits they touch.
+        """
+        if self._rollups is None:
+            version, rollups, lines = self._read_rollups()
+            stale = version != self._version or rollups.keys() - self._rollup_keys != self.db["habit"].keys() - self._rollup_keys
+            if stale:
+                rollups = {}
+            for key, habit in self.db["habit"].items():
+                if stale or key in self._rollup_keys:
+                    rollups[key] = habit_rollup(habit.get("completion dates", []))
+            for key in self._rollup_keys - self.db["habit"].keys():
+                rollups.pop(key, None)
+            self._rollups = rollups
+            if not self.read_only and not self._rollup_keys and (stale or lines > 2 * len(rollups) + 100):
+                self._rewrite_rollups()  # only what is on disk, unwritten changes are appended by the write that persists them
+        return self._rollups
+
+    def _read_rollups(self) -> tuple[int, dict[str, dict], int]:
+        """
+        Reads the rollup side file. The lines after its last version line were left by an interrupted write and are ignored,
+        writers never append after them so every line before it is whole and they are decoded at once.
+
+        :return: tuple(database version it describes or None, rollup per habit id, number of lines)
+        :rtype: tuple[int, dict[str, dict], int]
+        """
+        try:
+            with open(self.rollups_filename, "rb") as f, trace.phase("rollups read"):
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None, {}, 0
+        while lines and not lines[-1].startswith(b'{"version"'):
+            lines.pop()
+        try:
+            records = json.loads(b"[" + b",".join(lines) + b"]")
+            version = records[-1]["version"] if records else None
+        except (json.JSONDecodeError, KeyError):
+            return None, {}, len(lines)
+        rollups = {}
+        for record in records:
+            if "id" not in record:
+                continue
+            if record["rollup"] is None:
+                rollups.pop(record["id"], None)
+            else:
+                rollups[record["id"]] = record["rollup"]
+        return version, rollups, len(lines)
+
+    def _rollups_version(self) -> int:
+        """ Database version the rollup side file describes, read from its last line, None without a complete one."""
         try:
-            with open(self.filename, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    self.db = self.db_schema
-                    self.save_db()
-                    return self.db
-                return json.loads(content)
-        except (FileNotFoundError, json.JSONDecodeError): # json Decoder Error sometimes rises because File not found error was caught so both must be expected.
-            self.db = self.db_schema
+            with open(self.rollups_filename, "rb") as f:
+                end = f.seek(0, os.SEEK_END)
+                f.seek(max(0, end - 4096))
+                tail = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            return json.loads(tail[tail.rstrip(b"\n").rfind(b"\n") + 1:]).get("version")
+        except (json.JSONDecodeError, AttributeError):
+            return None
+
+    def _write_rollups(self, before: int, after: int, whole: bool = False):
+        """
+        Brings the rollup side file from version before to version after, the lock must be held. With whole=True and every
+        rollup in memory the file is rewritten, otherwise the rollups of the habits changed since the last write are appended.
+        A side file that does not describe version before is left alone, the next use of rollups rebuilds it.
+        """
+        keys, self._rollup_keys = self._rollup_keys, set()
+        if whole and self._rollups is not None:
+            self._rewrite_rollups(after)
+            return
+        if self._rollups_version() != before:
+            return
+        lines = []
+        for key in sorted(keys):
+            habit = self.db["habit"].get(key)
+            if habit is None:
+                rollup = None
+            elif self._rollups is not None:
+                rollup = self._rollups[key]
+            else:
+                rollup = habit_rollup(habit.get("completion dates", []))
+            lines.append(json.dumps({"id": key, "rollup": rollup}, separators=(",", ":")) + "\n")
+        lines.append(json.dumps({"version": after}) + "\n")
+        with open(self.rollups_filename, "ab") as f:
+            f.writelines(line.encode() for line in lines)
+
+    def _rewrite_rollups(self, version: int = None):
+        """ Replaces the rollup side file with every rollup in memory, outside of a write it is skipped when another process wrote."""
+        with self._locked():
+            if version is None:
+                if self._lock.version() not in (None, self._version):
+                    return
+                version = self._version
+            with open(self.rollups_filename + ".tmp", "w") as f:
+                for key, rollup in self._rollups.items():
+                    f.write(json.dumps({"id": key, "rollup": rollup}, separators=(",", ":")) + "\n")
+                f.write(json.dumps({"version": version}) + "\n")
+            os.replace(self.rollups_filename + ".tmp", self.rollups_filename)
+
+    def compact(self):
+        """Fold the journal into a fresh JSON snapshot."""
+        self.save_db()
+
+    def archive_before(self, before: int, compression: str = "lzma") -> int:
+        """
+        Moves the completion dates older than a day out of the JSON file into a new compressed archive segment, then saves.
+        Each habit first gets an up to date streak summary, its completion list keeps counting the archived dates and its
+        archive marker keeps their rollup, so totals, streaks and heatmaps stay right without reading the archive back.
+
+        Parameters
+        ----------
+        before : int
+            day ordinal, completions before this day are archived.
+        compression : ["lzma", "gzip"]
+            compression of the segment file.
+
+        :return: number of archived completion dates
+        :rtype: int
+
+        Raises
+        ------
+        ValueError
+            If the database does not use the inline layout or compression is unknown
+        """
+        if self.layout != "inline":
+            raise ValueError(f"archiving needs the inline layout, '{self.filename}' uses the {self.layout} layout")
+        with self._locked():
+            self._check_version()
+            rows = []
+            tiers = {}
+            for key, habit in self.db["habit"].items():
+                dates = habit.get("completion dates", [])
+                tiered = isinstance(dates, TieredDates) and not dates.loaded
+                recent, old = [], []
+                for day in (dates.recent() if tiered else dates):
+                    try:
+                        ordinal = parse_date(day)
+                    except (ValueError, TypeError):  # dates that do not parse stay in the JSON file
+                        ordinal = None
+                    if ordinal is not None and ordinal < before:
+                        old.append(ordinal)
+                    else:
+                        recent.append(day)
+                if not old:
+                    continue
+                streak = habit.get("streak")
+                if not (streak and streak["frequency"] == habit["frequency"] and streak["total"] == len(dates)):
+                    habit["streak"] = new_state(dates, habit["frequency"])
+                rows.append((int(habit["id"]), old))
+                tiers[key] = (recent, old, dates if tiered else None)
+            if not rows:
+                return 0
+            if self.archive is None:
+                self.archive = ArchiveStore(self.archive_dirname)
+            number = self.archive.write_segment(rows, compression)
+            for key, (recent, old, previous) in tiers.items():
+                archived, segments, until, rollup = (previous.archived, previous.segments, previous.archived_until, previous.rollup) \
+                    if previous is not None else (0, [], 0, ordinals_rollup([]))
+                rollup = merge_rollups(rollup, ordinals_rollup(old)) if rollup is not None else None
+                self.db["habit"][key]["completion dates"] = TieredDates(self.archive, int(key), recent, archived + len(old),
+                                                                        segments + [number], max(until, before - 1), rollup)
             self.save_db()
-            return self.db
+            return sum(len(old) for _, old, _ in tiers.values())
+
+    def _append_journal(self, *records: dict[str, any]):
+        """ Appends mutation records to the journal in one write, compacting once it grows past compact_every records."""
+        lines = []
+        for record in records:
+            if "habit" in record:
+                record = dict(record, habit=self._tiered(record["habit"]))
+            if "habit" in record and isinstance(record["habit"].get("completion dates"), LazyDates):
+                record["habit"]["completion dates"].load()  # json.dumps reads list storage directly
+            if "habit" in record and self.date_format == "ordinal":
+                record = dict(record, habit=self._encode_dates(record["habit"]))
+            lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if self.defer_writes:
+            self._pending_lines.extend(lines)
+            return
+        self._write_journal(lines)
+
+    def flush(self) -> int:
+        """ Writes the journal records held back by defer_writes in one append, returns how many were written."""
+        if not self._pending_lines:
+            return 0
+        lines = self._pending_lines
+        self._write_journal(lines)
+        self._pending_lines = []
+        return len(lines)
+
+    def _write_journal(self, lines: list[str]):
+        with self._locked():
+            self._check_version()
+            with open(self.journal_filename, "a+b") as f:
+                start = f.seek(0, os.SEEK_END)
+                if start:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":  # a record torn by an interrupted append stays on a line of its own
+                        f.write(b"\n")
+                f.writelines(line.encode() for line in lines)  # line by line, a large import is not copied into one buffer
+                if trace.enabled:
+                    trace.count("bytes written", f.tell() - start)
+            trace.count("journal records", len(lines))
+            self._journal_records += len(lines)
+            self._write_rollups(self._version, self._version + len(lines))
+            self._set_version(self._version + len(lines))
+            if self._journal_records >= self.compact_every:
+                self.compact()
+
+    def _replay_journal(self, db: dict[str, any]):
+        """ Applies journal records in order onto a loaded snapshot. Records are idempotent so replaying twice is harmless."""
+        self._journal_records = 0
+        try:
+            with open(self.journal_filename, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content) and not self.read_only:  # a torn last line from an interrupted append, cut it off before anything is appended to it
+            with open(self.journal_filename, "r+b") as f:
+                f.truncate(complete)
+        self._journal_records = self._apply_records(db, content[:complete].decode().splitlines())
+
+    @staticmethod
+    def _apply_records(db: dict[str, any], lines: list[str], touched: set[str] = None) -> int:
+        """ Applies journal lines in order, returns how many were applied. The ids of the habits they change are added to touched."""
+        applied = 0
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError: # a record torn by an interrupted append, the ones after it were appended on new lines
+                continue
+            if record["op"] == "save":
+                db["habit"][str(record["habit"]["id"])] = record["habit"]
+            elif record["op"] == "delete":
+                db["habit"].pop(str(record["id"]), None)
+            if touched is not None:
+                touched.add(str(record["habit"]["id"]) if record["op"] == "save" else str(record["id"]))
+            applied += 1
+        return applied
+
+    def _clear_journal(self):
+        """ Removes the journal once its records are part of the snapshot."""
+        self._journal_records = 0
+        try:
+            os.remove(self.journal_filename)
+        except FileNotFoundError:
+            pass
         
     def inject_seed_data(self, seed_filename="mylife\\seed_dict.json"):
         """Injects a predefined seed database into the current database."""
@@ -75,8 +772,20 @@ class Database:
             with open(seed_filename, "r") as f:
                 seed_data = json.load(f)
 
+            errors = self.validate_many(list(seed_data["habit"].values()))
+            if errors:
+                for habit_id, messages in errors.items():
+                    for message in messages:
+                        print(f"Validation Error in habit {habit_id}: {message}")
+                return False
+
             # Merge seed data with the existing database
-            self.db["habit"].update(seed_data["habit"])
+            for key, habit in seed_data["habit"].items():
+                self._store_streak(habit)
+                if key in self.db["habit"]:
+                    self._unindex_habit(key, self.db["habit"][key])
+                self.db["habit"][key] = habit
+                self._index_habit(key, habit)
             self.save_db()
             print("Seed database injected successfully!")
             return True
@@ -99,39 +808,203 @@ class Database:
         ValidationError
             If the data has any ellegal element detected by JSON schema     
         """
-        try:
-            validate(instance=habit_data, schema=schema)  # Validate using JSON Schema
-            return True
-        except ValidationError as e:
-            print(f"Validation Error: {e.message}")  # Print validation error message
+        trace.count("validations")
+        with trace.phase("validation"):
+            error = first_error(get_validator(), self._tiered(habit_data))  # Validate using the compiled JSON Schema
+        if error is not None:
+            print(f"Validation Error: {error}")  # Print validation error message
             return False
+        return True
+
+    def validate_many(self, habits: list[dict[str, any]]) -> dict[str, list[str]]:
+        """
+        Validate many habits in one pass, collecting every error instead of stopping at the first one.
+
+        Parameters
+        ----------
+        habits : list[dict[str, any]]
+            The habit dictionaries.
+
+        :return: error messages per habit id (or '#<list position>' when a habit has no id), empty if all are valid
+        :rtype: dict[str, list[str]]
+        """
+        validator = get_validator()
+        errors = {}
+        trace.count("validations", len(habits))
+        for position, habit_data in enumerate(habits):
+            with trace.phase("validation"):
+                messages = [error.message for error in validator.iter_errors(self._tiered(habit_data) if isinstance(habit_data, dict) else habit_data)]
+            if messages:
+                errors[self._error_key(habit_data, position)] = messages
+        return errors
+
+    @staticmethod
+    def _error_key(habit_data: dict[str, any], position: int) -> str:
+        if isinstance(habit_data, dict) and "id" in habit_data:
+            return str(habit_data["id"])
+        return f"#{position}"
+
+    def _validate_changed_fields(self, habit_data: dict[str, any]) -> bool:
+        """
+        Validates a habit whose name, desc and frequency match the stored ones, only the remaining fields are checked.
+        Completion dates that were never decoded from the history store are already known to be valid.
+        """
+        trace.count("field validations")
+        for field in ("completion dates", "streak"):
+            value = habit_data.get(field)
+            if isinstance(value, TieredDates) and not value.loaded:
+                value = value.recent()  # the archived dates were valid when they were archived
+            if value is None or (isinstance(value, LazyDates) and not value.loaded):
+                continue
+            with trace.phase("validation"):
+                error = first_error(get_validator(field), value)
+            if error is not None:
+                print(f"Validation Error: {error}")
+                return False
+        return True
     
     def save_habit(self, habit_data: dict[str, any]):
-        """Save or update a habit in the database with validation."""
-        if not self.validate_habit(habit_data):  # Validate habit before saving
+        """
+        Save or update a habit in the database with validation.
+        When only completion dates or the streak summary changed, the unchanged fields are not revalidated.
+        A streak summary that comes with the habit is recomputed from its completion dates.
+        """
+        key = str(habit_data["id"])
+        unchanged = self._valid_fields.get(key) == (habit_data.get("name"), habit_data.get("desc"), habit_data.get("frequency"))
+        if not (self._validate_changed_fields(habit_data) if unchanged else self.validate_habit(habit_data)):
             print("Error: Habit data is not valid!")
             return False
 
-        self.db["habit"][str(habit_data["id"])] = habit_data  # Store Habit Using ID as Key
-        self.save_db()
+        self._store_streak(habit_data)
+        if key in self.db["habit"]:
+            self._unindex_habit(key, self.db["habit"][key])
+        self.db["habit"][key] = habit_data  # Store Habit Using ID as Key
+        self._index_habit(key, habit_data)
+        self._persist({"op": "save", "habit": habit_data})
         return True
     
+    def save_habits(self, habits: list[dict[str, any]]) -> dict[str, list[str]]:
+        """
+        Save or update many habits with a single write, used by bulk operations.
+        Every habit is validated in one validate_many pass, invalid habits are skipped and reported.
+        Streak summaries are recomputed like in save_habit.
+
+        :return: error messages per skipped habit id (or '#<list position>' when a habit has no id)
+        :rtype: dict[str, list[str]]
+        """
+        errors = self.validate_many(habits)
+        saved = []
+        for position, habit_data in enumerate(habits):
+            key = self._error_key(habit_data, position)
+            if key.startswith("#"):
+                errors.setdefault(key, []).append("'id' is a required property")
+            elif key not in errors:
+                saved.append(habit_data)
+        for habit_data in saved:
+            key = str(habit_data["id"])
+            self._store_streak(habit_data)
+            if key in self.db["habit"]:
+                self._unindex_habit(key, self.db["habit"][key])
+            self.db["habit"][key] = habit_data
+            self._index_habit(key, habit_data)
+        if saved:
+            self._persist(*({"op": "save", "habit": habit_data} for habit_data in saved))
+        return errors
+
     def delete_habit(self, habit_id):
         """ Delete an entry based on id primary key """
-        del self.db["habit"][str(habit_id)]  
-        self.save_db()
+        habit_data = self.db["habit"].pop(str(habit_id))
+        self._unindex_habit(str(habit_id), habit_data)
+        self._persist({"op": "delete", "id": str(habit_id)})
     
+    def _persist(self, *records: dict[str, any]):
+        """ Writes mutation records to the journal, or a snapshot without journal, or marks them dirty in an open transaction."""
+        if self._dirty is not None:
+            for record in records:
+                self._dirty[str(record["habit"]["id"]) if record["op"] == "save" else record["id"]] = record["op"]
+        elif self.journal:
+            self._append_journal(*records)
+        else:
+            self.save_db()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work over the in-memory database:
+
+            with database.transaction():
+                database.save_habit(...)
+                database.delete_habit(...)
+
+        Saves and deletes inside the block only change memory and mark their habits dirty. Leaving the block writes
+        every dirty habit at once (one journal append, or one snapshot) and writes nothing when nothing changed.
+        When the block saved or deleted anything, an exception inside it or from the write reloads the database from
+        disk, which still holds the state from before the block, and is raised again. Records held back by
+        defer_writes stay held back. A transaction opened inside another one joins it.
+
+        Raises
+        ------
+        VersionConflict
+            If another process wrote since the database was loaded, the block's changes are discarded
+        """
+        if self._dirty is not None:
+            yield self
+            return
+        self._dirty = {}
+        self._dirty_snapshot = False
+        try:
+            yield self
+        except BaseException:
+            changed = bool(self._dirty) or self._dirty_snapshot
+            self._dirty = None
+            if changed:
+                self.load_db(keep_pending=True)
+            raise
+        dirty, snapshot = self._dirty, self._dirty_snapshot
+        self._dirty = None
+        try:
+            if snapshot:
+                self.save_db()
+            elif dirty:
+                self._persist(*({"op": "save", "habit": self.db["habit"][key]} if op == "save" else {"op": "delete", "id": key}
+                                for key, op in dirty.items()))
+        except BaseException:
+            self.load_db(keep_pending=True)
+            raise
+
+    def retry_on_conflict(self, operation, attempts: int = 10):
+        """
+        Runs a read-modify-write operation (a function without arguments that reads and saves habits).
+        When another process wrote first, the database is reloaded and the operation runs again on the fresh data.
+        Records held back by defer_writes are kept and replayed on top of the fresh data, the next flush writes them.
+
+        :return: the result of operation
+
+        Raises
+        ------
+        VersionConflict
+            If every attempt conflicted with another writer
+        """
+        for attempt in range(attempts):
+            try:
+                return operation()
+            except VersionConflict:
+                if attempt == attempts - 1:
+                    raise
+                import random
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))  # back off so the writers do not collide again
+                self.load_db(keep_pending=True)
+
     def last_id(self) -> int:
         """ takes the last id as an int, or returns -1 if there is no data.
+        Deleting the newest habit does not lower it so ids are never reused within a session.
         :return: Last ID | -1
         :rtype: int"""
-        if not self.db["habit"]:
-            return -1
-        return max(int(id) for id in self.db["habit"])
+        return self._last_id
 
     def get_habit_by_name(self, name) -> dict[str, any]:
         """ 
-        looks up the database and tries to find the habit then returns it, else throws a Lookup Error
+        looks up the name index and returns the habit, else throws a Lookup Error
         
         :return: habit 
         :rtype: dict[str, any]
@@ -141,7 +1014,22 @@ class Database:
         LookUpError
             If there is no habit under the name parameter
         """
-        for habit in self.db["habit"].values():
-            if habit["name"] == name:
-                return habit
-        raise LookupError(f"name {name} was not found in database!")
\ No newline at end of file
+        keys = self._name_index.get(name)
+        if keys:
+            return self.db["habit"][keys[0]]
+        raise LookupError(f"name {name} was not found in database!")
+
+    def sorted_ordinals(self, habit_id: int, since: int = None, until: int = None) -> array:
+        """
+        Sorted day ordinals of a stored habit's completion dates, searched with bisect by the date range queries.
+        Kept until the habit is saved or deleted, so every view of the habit (and every command run by 'mla serve') shares them.
+        since allows leaving archived dates out like Habit.sorted_ordinals, until is only used by the SQLite backend.
+
+        Raises
+        ------
+        KeyError
+            If there is no habit with this id
+        """
+        key = str(habit_id)
+        entry = self._ordinals[key] = sorted_ordinals(self.db["habit"][key].get("completion dates", []), since, self._ordinals.get(key))
+        return entry[2]
@@ -1,5 +1,27 @@
-from datetime import datetime
+import heapq
+from datetime import date
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
 from mylife.habit import Habit
+from mylife.streak import unique_periods, streak_from_periods, period_of_ordinal
+from mylife.dates import parse_date, today
+from mylife.rollups import KINDS, start_of, periods_between, completion_rates
+from mylife.completions import CompletionBitset
+from mylife.columnar import LazyDates
+from mylife import trace
+
+_UNLOADED = object()
+np = _UNLOADED  # NumPy is optional (pip install mylife[fast]) and only imported by the first batch_streaks call
+
+def _numpy():
+    """ Returns the numpy module, or None when it is not installed."""
+    global np
+    if np is _UNLOADED:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    return np
 
 # Collectio of analysis methods
 
@@ -26,7 +48,7 @@ def calculate_streak(completion_dates: list[str], frequency: str) -> tuple[int,
     
     Parameters
     ------------
-    completion_dates : list[str]
+    completion_dates : list[str] | CompletionBitset
         Completion dates list which will be used to calculate streak | format: %d/%m/%Y
         
     frequency : ["daily", "weekly"]
@@ -37,46 +59,170 @@ def calculate_streak(completion_dates: list[str], frequency: str) -> tuple[int,
     """
     if not completion_dates:
         return 0, 0
+    if trace.enabled:
+        trace.count("streak computations")
+    if isinstance(completion_dates, CompletionBitset):
+        return completion_dates.streak(frequency)
 
-    # Convert completion_dates (list of strings) into a list of datetime objects
-    dates = [datetime.strptime(day, "%d/%m/%Y") for day in completion_dates]
-    dates.sort()  # Sort dates for easier computing
-
-    # Group completion dates day for daily, week for weekly
-    unique_periods = [] 
-    for day in dates:
-        period = day.date() if frequency == "daily" else day.isocalendar()[:2] 
-        if period not in unique_periods:  # Prevent multiple increments per week
-            unique_periods.append(period)
-
-    # Calculate the longest streak
-    longest_streak = current_streak = 1
-    for i in range(1, len(unique_periods)):
-        if (frequency == "daily" and (unique_periods[i] - unique_periods[i - 1]).days == 1) or \
-           (frequency == "weekly" and unique_periods[i][1] == unique_periods[i - 1][1] + 1):
-            current_streak += 1
-            longest_streak = max(longest_streak, current_streak)
-        else:
-            current_streak = 1
-    return longest_streak, current_streak
+    # Group completion dates into day or ISO week periods, the set prevents multiple increments per period
+    return streak_from_periods(unique_periods(completion_dates, frequency))
+
+def batch_streaks(habits: list[Habit]) -> list[tuple[int, int]]:
+    """
+    Calculate (longest, current) streaks of many habits at once, same results as calculate_streak per habit.
+    With NumPy installed the periods of all habits are gathered into one sorted key array and the streaks are
+    found with diff / run-length operations over it, otherwise it loops over calculate_streak.
+
+    Parameters
+    ----------
+    habits : list[Habit]
+        A list of habit objects used as base for calculation.
+
+    :return: list of tuple(Longest Streak, Current Streak), in the order of habits
+    :rtype: list[tuple[int, int]]
+    """
+    if _numpy() is None:
+        return [calculate_streak(h.completion_dates, h.frequency) for h in habits]
+    trace.count("streak computations", len(habits))
+    result = [(0, 0)] * len(habits)
+    counts = np.array([len(h.completion_dates) for h in habits], dtype=np.int64)
+    total = int(counts.sum())
+    if not total:
+        return result
+
+    # one day ordinal array in habit order: dates still in the history sidecar are copied from their ordinal slice,
+    # the others go through the memoized parse_date, so every distinct string is parsed once and the text is not copied
+    ordinals = np.empty(total, dtype=np.int32)
+    position = 0
+    for h, count in zip(habits, counts.tolist()):
+        if isinstance(h.completion_dates, LazyDates) and not h.completion_dates.loaded:
+            ordinals[position:position + count] = np.frombuffer(h.completion_dates.ordinals(), dtype=np.int32)
+        elif count:
+            ordinals[position:position + count] = np.fromiter(map(parse_date, h.completion_dates), dtype=np.int32, count=count)
+        position += count
+    weekly = np.repeat(np.array([h.frequency == "weekly" for h in habits]), counts)
+    ordinals[weekly] = (ordinals[weekly] - 1) // 7
+    del weekly
+
+    # one key per completion, habit index in the high bits and period in the low ones:
+    # sorting the keys orders every habit's periods and repeated periods of the same habit become equal neighbours
+    keys = np.repeat(np.arange(len(habits), dtype=np.int64) << 32, counts)
+    keys |= ordinals
+    del ordinals
+    keys.sort()
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+
+    # a run starts at every habit boundary and at every gap between periods, both break key + 1
+    run_starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1] + 1])
+    run_lengths = np.diff(np.append(run_starts, len(keys)))
+    run_owners = keys[run_starts] >> 32
+
+    # runs are grouped per habit, reduce each group to its longest and last run
+    first_runs = np.flatnonzero(np.r_[True, run_owners[1:] != run_owners[:-1]])
+    last_runs = np.append(first_runs[1:], len(run_owners)) - 1
+    longest = np.maximum.reduceat(run_lengths, first_runs)
+    current = run_lengths[last_runs]
+    for i, l, c in zip(run_owners[first_runs].tolist(), longest.tolist(), current.tolist()):
+        result[i] = (l, c)
+    return result
 
 def streaks_for_all(habits: list[Habit]) -> list:
-    """Shorthand method for longest streak across all habits."""
-    streaks = []
-    for h in habits:
-        s = calculate_streak(h.completion_dates, h.frequency)
-        streaks.append(s)
+    """
+    Shorthand method for longest streak across all habits.
+    Up to date streak summaries are reused, every other habit is calculated in a single batch_streaks call.
+    """
+    streaks = [None] * len(habits)
+    stale = []
+    for i, h in enumerate(habits):
+        if h.streak_is_current():
+            streaks[i] = (h.streak["longest"], h.streak["current"])
+        else:
+            stale.append(i)
+    for i, s in zip(stale, batch_streaks([habits[i] for i in stale])):
+        streaks[i] = s
     return streaks if streaks else 0
 
+def top_habits(habits: list[Habit], k: int, by: str = "current") -> list[tuple[Habit, int]]:
+    """
+    Leaderboard of the k habits with the highest streak or completion count, without sorting every habit.
+    Streaks come from streaks_for_all (cached summaries, one batch for the rest) and are selected with a bounded heap.
+
+    Parameters
+    ----------
+    habits : list[Habit]
+        A list of habit objects used as base for calculation.
+    k : int
+        number of habits to return.
+    by : ["current", "longest", "total"]
+        current streak, longest streak or number of completion dates.
+
+    :return: (habit, value) pairs, highest first, ties in list order
+    :rtype: list[tuple[Habit, int]]
+    """
+    if by == "total":
+        values = [len(h.completion_dates) for h in habits]
+    elif by in ("current", "longest"):
+        values = [streak[1] if by == "current" else streak[0] for streak in (streaks_for_all(habits) or [])]
+    else:
+        raise ValueError(f"cannot rank habits by '{by}', use current, longest or total")
+    return [(habits[i], values[i]) for i in heapq.nlargest(k, range(len(habits)), key=values.__getitem__)]
+
+def parse_window(start: str = None, end: str = None) -> tuple[int, int]:
+    """
+    Converts an optional date range into day ordinals, a missing bound leaves that side open.
+
+    Raises
+    ------
+    ValueError
+        If a date is not formatted as 'DD/MM/YYYY' or end is before start
+    """
+    first = parse_date(start) if start else None
+    last = parse_date(end) if end else None
+    if first is not None and last is not None and last < first:
+        raise ValueError(f"{end} is before {start}")
+    return first, last
+
+def _window_slice(habit: Habit, first: int = None, last: int = None) -> tuple[list[int], int, int]:
+    """ habit.sorted_ordinals() and the bounds of the completions between first and last (day ordinals, both included) in it."""
+    ordinals = habit.sorted_ordinals(first, last)
+    lo = 0 if first is None else bisect_left(ordinals, first)
+    hi = len(ordinals) if last is None else bisect_right(ordinals, last)
+    return ordinals, lo, max(lo, hi)
+
+def count_in_range(habit: Habit, first: int = None, last: int = None) -> int:
+    """ Number of completions between two day ordinals (see parse_window), two binary searches once the habit's ordinals are cached."""
+    _, lo, hi = _window_slice(habit, first, last)
+    return hi - lo
+
+def completed_in_range(habits: list[Habit], first: int = None, last: int = None) -> list[Habit]:
+    """ Habits completed at least once between two day ordinals."""
+    return [h for h in habits if count_in_range(h, first, last)]
+
+def streak_in_range(habit: Habit, first: int = None, last: int = None) -> tuple[int, int]:
+    """
+    Longest and current streak counting only the completions between two day ordinals.
+    The window is found with bisect, only the completions inside it are scanned.
+
+    :return: tuple(Longest Streak, Current Streak)
+    :rtype: tuple[int, int]
+    """
+    ordinals, lo, hi = _window_slice(habit, first, last)
+    periods = []
+    for ordinal in ordinals[lo:hi]:
+        period = period_of_ordinal(ordinal, habit.frequency)
+        if not periods or periods[-1] != period:
+            periods.append(period)
+    if trace.enabled:
+        trace.count("streak computations")
+    return streak_from_periods(periods)
+
 def longest_streak_habit(habit: Habit) -> int:
-    """ Shorthand method for calculating the longest streak for a specific habit."""
-    l,c = calculate_streak(habit.completion_dates, habit.frequency)
-    return l if l else 0
+    """ Shorthand method for the longest streak of a specific habit, read from its streak summary."""
+    return habit.streak_state()["longest"]
 
 def current_streak(habit: Habit) -> int:
-    """ Shorthand method for calculating the current streak for a specific habit."""
-    l, c = calculate_streak(habit.completion_dates, habit.frequency)
-    return c if c else 0
+    """ Shorthand method for the current streak of a specific habit, read from its streak summary."""
+    return habit.streak_state()["current"]
 
 def get_filtered_habits(filter, habits: list[Habit]) -> list[Habit]:
     """ 
@@ -101,18 +247,24 @@ def get_filtered_habits(filter, habits: list[Habit]) -> list[Habit]:
         result = filter_by_frequency(habits, "weekly")
     return result
 
-def get_sorted_habits(sorter, habits: list[Habit]) -> list[Habit]:
+def get_sorted_habits(sorter, habits: list[Habit], limit: int = None) -> list[Habit]:
     """ Shorthand method to return a sorted list of Habit objects based of a pre-selected sorter methods
     Parameters
     ----------
     sorter : str
         The sorting option to be used, can be 'ascending', 'descending', or 'streak'
     habits : list[Habit]
-        A list of habit objects used as base for calculation.
+        A list of habit objects used as base for calculation, any iterable when limit is given.
+    limit : int
+        only the first limit habits are needed, they are selected with a bounded heap instead of sorting everything.
         
     :return: Sorted list of habits 
     :rtype: list[Habit]
     """
+    if limit is not None and sorter in ("ascending", "descending", "streak"):
+        key = (lambda item: current_streak(item)) if sorter == "streak" else (lambda item: item.name.lower())
+        select = heapq.nsmallest if sorter == "ascending" else heapq.nlargest  # same order as the stable sorts below
+        return select(limit, habits, key=key)
     # sort decider
     if(sorter == "ascending"):
         habits.sort(key=lambda item: item.name.lower())
@@ -122,6 +274,117 @@ def get_sorted_habits(sorter, habits: list[Habit]) -> list[Habit]:
         habits.sort(reverse=True, key=lambda item: current_streak(item))
     return habits
 
+TABLE_COLUMNS = {
+    # column name -> (header, value of a habit)
+    "id": ("ID", lambda h: str(h.id)),
+    "name": ("Name", lambda h: h.name),
+    "desc": ("Desc", lambda h: h.desc),
+    "frequency": ("Frequency", lambda h: h.frequency),
+    "current": ("Current", lambda h: str(current_streak(h))),
+    "longest": ("Longest", lambda h: str(longest_streak_habit(h))),
+    "total": ("Total", lambda h: str(len(h.completion_dates)))
+}
+DEFAULT_COLUMNS = ("id", "name", "desc", "frequency")
+
+def render_table(habits, columns=DEFAULT_COLUMNS, sample: int = 256):
+    """
+    Yields the habit table line by line (without line ends), so the first rows can be printed before the rest is read.
+
+    Parameters
+    ----------
+    habits : Iterable[Habit]
+        habits to display, a generator is consumed lazily.
+    columns : Iterable[str]
+        keys of TABLE_COLUMNS in display order.
+    sample : int
+        number of leading habits the column widths are computed from. Only this many habits are held at once,
+        later values that are wider than their column are printed in full.
+
+    :return: header, separator and one line per habit
+    :rtype: Iterator[str]
+
+    Raises
+    ------
+    ValueError
+        If a column is unknown
+    """
+    unknown = [column for column in columns if column not in TABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown column(s) {', '.join(unknown)}, use {', '.join(TABLE_COLUMNS)}")
+    habits = iter(habits)
+    head = list(islice(habits, sample))
+    getters = [TABLE_COLUMNS[column][1] for column in columns]
+    widths = []
+    for column, getter in zip(columns, getters):
+        widest = max((len(getter(h)) for h in head), default=0)
+        widths.append(max(3 if column == "id" else 0, len(TABLE_COLUMNS[column][0]), widest))
+
+    header = " | ".join(TABLE_COLUMNS[column][0].ljust(width) for column, width in zip(columns, widths))
+    yield header
+    yield "-" * len(header)
+    for habit in chain(head, habits):
+        yield " | ".join(getter(habit).ljust(width) for getter, width in zip(getters, widths))
+
+HEATMAP_LEGEND = ". none, - under 50%, + under 100%, # all"
+
+def _shade(rate: float) -> str:
+    """ Heatmap cell of a completion rate, see HEATMAP_LEGEND."""
+    if rate <= 0:
+        return "."
+    if rate < 0.5:
+        return "-"
+    return "+" if rate < 1 else "#"
+
+def render_heatmap(habits, rollups: dict[str, dict], kind: str = "week", first: int = None, last: int = None, periods: int = 12):
+    """
+    Yields a completion rate heatmap line by line: one row per habit, one cell per ISO week or month.
+    Only the habits' rollups are read (Database.rollups), never their completion dates.
+
+    Parameters
+    ----------
+    habits : Iterable[Habit]
+        habits to display, only id, name and frequency are used.
+    rollups : dict[str, dict]
+        habit id -> rollup, see mylife.rollups.habit_rollup.
+    kind : ["week", "month"]
+        period of a cell.
+    first, last : int
+        day ordinals of the first and last day to show. last defaults to the latest period any habit was completed in,
+        first to periods periods before last.
+    periods : int
+        number of cells when first is not given.
+
+    :return: header, one line per habit with its average rate, legend
+    :rtype: Iterator[str]
+
+    Raises
+    ------
+    ValueError
+        If kind is not week or month
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown period '{kind}', use {' or '.join(KINDS)}")
+    habits = list(habits)
+    if last is None:
+        keys = [key for h in habits for key in rollups.get(str(h.id), {}).get(kind, {})]
+        last = start_of(max(keys), kind) if keys else parse_date(today())
+        last = last if first is None else max(last, first)
+    if first is None:
+        if kind == "week":
+            first = last - 7 * (periods - 1)
+        else:
+            day = date.fromordinal(last)
+            year, month = divmod(day.year * 12 + day.month - 1 - (periods - 1), 12)
+            first = date(year, month + 1, 1).toordinal()
+    window = periods_between(kind, first, last)
+    width = max([len("Habit")] + [len(h.name) for h in habits])
+    yield f"{'Habit'.ljust(width)} | {window[0][0]} to {window[-1][0]} | rate" if window else f"{'Habit'.ljust(width)} | rate"
+    for habit in habits:
+        rates = completion_rates(rollups.get(str(habit.id), {}), kind, window, habit.frequency)
+        average = sum(rates) / len(rates) if rates else 0.0
+        yield f"{habit.name.ljust(width)} | {''.join(_shade(rate) for rate in rates)} | {average:.0%}"
+    yield HEATMAP_LEGEND
+
 def list_habits(habits: list[Habit]):
     """lists a list of habits in  structured tabular.
     
@@ -133,24 +396,5 @@ def list_habits(habits: list[Habit]):
     :return: Formatted Tabular String of list
     :rtype: str
     """
-    # for column width
-    col_widths = {
-        "ID": 3,
-        "Name": max(len(h.name) for h in habits) if habits else 5,
-        "Desc": max(len(h.desc) for h in habits) if habits else 5,
-        "Frequency": max(len(h.frequency) for h in habits) if habits else 6
-    }
-
-    result= ""
-    # Header Row
-    header = f"{'ID'.ljust(col_widths['ID'])} | {'Name'.ljust(col_widths['Name'])} | {'Desc'.ljust(col_widths['Desc'])} | {'Frequency'.ljust(col_widths['Frequency'])}"
-    separator = "-" * len(header)
-    result += header + "\n"
-    result += separator + "\n"
-
-    # Habits lister
-    for habit in habits:
-        row = f"{str(habit.id).ljust(col_widths['ID'])} | {habit.name.ljust(col_widths['Name'])} | {habit.desc.ljust(col_widths['Desc'])} | {habit.frequency.ljust(col_widths['Frequency'])}"
-        result += row + "\n"
-    
-    return result
+    # widths from every habit, render_table streams with a bounded sample instead
+    return "".join(line + "\n" for line in render_table(habits, sample=max(len(habits), 1)))
@@ -0,0 +1,206 @@
+import os
+from importlib import import_module
+import struct
+from array import array
+from itertools import accumulate
+from mylife.columnar import LazyDates
+from mylife.dates import parse_date, format_date
+from mylife import trace
+
+# Cold completion history moved out of the JSON file by 'mla archive', one compressed segment per archive run:
+#   <database>.archive/<segment number>.xz (lzma) or .gz (gzip)
+# Decompressed, a segment is MAGIC | habit count | row count (uint32 little-endian) | habit id column | count column | delta column.
+# The day ordinals of every habit are sorted and stored as the difference to the previous one (the first one to 0),
+# the small numbers this leaves compress far better than the ordinals themselves.
+MAGIC = b"MYLIFEA1"
+HEADER = struct.Struct("<8sII")
+# compression name: (file extension, module), the module is imported by the first segment written or read
+COMPRESSIONS = {"lzma": (".xz", "lzma"), "gzip": (".gz", "gzip")}
+
+
+def encode_segment(rows: list[tuple[int, list[int]]]) -> bytes:
+    """ Uncompressed segment of (habit id, day ordinals) pairs."""
+    habit_ids = array("i")
+    counts = array("i")
+    deltas = array("i")
+    for habit_id, ordinals in sorted(rows, key=lambda row: row[0]):
+        ordinals = sorted(ordinals)
+        habit_ids.append(habit_id)
+        counts.append(len(ordinals))
+        deltas.extend(day - previous for previous, day in zip([0] + ordinals, ordinals))
+    return HEADER.pack(MAGIC, len(habit_ids), len(deltas)) + habit_ids.tobytes() + counts.tobytes() + deltas.tobytes()
+
+def decode_segment(data: bytes) -> dict[int, list[int]]:
+    """ habit id -> sorted day ordinals of an uncompressed segment, raises ValueError for anything else."""
+    magic, habits, rows = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a completion archive segment")
+    columns = array("i")
+    columns.frombytes(data[HEADER.size:HEADER.size + (2 * habits + rows) * 4])
+    habit_ids, counts, deltas = columns[:habits], columns[habits:2 * habits], columns[2 * habits:]
+    segment = {}
+    start = 0
+    for habit_id, count in zip(habit_ids, counts):
+        segment[habit_id] = list(accumulate(deltas[start:start + count]))
+        start += count
+    return segment
+
+
+class ArchiveStore:
+    """
+    ArchiveStore Class
+    ==================
+    completion dates archived into compressed segment files. A segment is only read and decompressed
+    the first time a habit stored in it is needed, and then kept in memory.
+
+    Attributes
+    ----------
+    dirname : str
+        folder holding the segment files, kept next to the JSON file.
+
+    Methods
+    -------
+    ordinals(habit_id: int, segments: list[int]) -> list[int]
+
+    dates(habit_id: int, segments: list[int]) -> list[str]
+
+    write_segment(rows: list[tuple[int, list[int]]], compression: str = "lzma") -> int
+
+    prune(referenced: set[int])
+    """
+
+    def __init__(self, dirname: str):
+        self.dirname = dirname
+        self._segments = {}  # segment number -> {habit id: day ordinals}
+
+    def segment_files(self) -> dict[int, str]:
+        """ segment number -> path of every segment file on disk."""
+        found = {}
+        if os.path.isdir(self.dirname):
+            for name in os.listdir(self.dirname):
+                number, extension = os.path.splitext(name)
+                if number.isdigit() and extension in (".xz", ".gz"):
+                    found[int(number)] = os.path.join(self.dirname, name)
+        return found
+
+    def _segment(self, number: int) -> dict[int, list[int]]:
+        segment = self._segments.get(number)
+        if segment is None:
+            path = self.segment_files().get(number)
+            if path is None:
+                raise FileNotFoundError(f"archive segment {number} is missing from '{self.dirname}'")
+            with trace.phase("archive decompress"):
+                with open(path, "rb") as f:
+                    data = import_module("lzma" if path.endswith(".xz") else "gzip").decompress(f.read())
+                segment = self._segments[number] = decode_segment(data)
+            trace.count("archive segments decompressed")
+        return segment
+
+    def ordinals(self, habit_id: int, segments: list[int]) -> list[int]:
+        """ Sorted day ordinals of one habit over the given segments."""
+        ordinals = []
+        for number in segments:
+            ordinals.extend(self._segment(number).get(habit_id, ()))
+        ordinals.sort()  # a back-dated completion archived by a later run can predate an older segment
+        return ordinals
+
+    def dates(self, habit_id: int, segments: list[int]) -> list[str]:
+        """ Decodes the archived completion dates of one habit | format: %d/%m/%Y"""
+        return [format_date(day) for day in self.ordinals(habit_id, segments)]
+
+    def write_segment(self, rows: list[tuple[int, list[int]]], compression: str = "lzma") -> int:
+        """
+        Writes (habit id, day ordinals) pairs as a new segment.
+
+        :return: number of the new segment
+        :rtype: int
+
+        Raises
+        ------
+        ValueError
+            If compression is not lzma or gzip
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression '{compression}', use {' or '.join(COMPRESSIONS)}")
+        extension, module = COMPRESSIONS[compression]
+        number = max(self.segment_files(), default=0) + 1
+        os.makedirs(self.dirname, exist_ok=True)
+        path = os.path.join(self.dirname, f"{number:05d}{extension}")
+        with open(path + ".tmp", "wb") as f:
+            f.write(import_module(module).compress(encode_segment(rows)))
+        os.replace(path + ".tmp", path)
+        trace.count("archive segments written")
+        return number
+
+    def prune(self, referenced: set[int]):
+        """ Removes the segments no habit refers to anymore."""
+        for number, path in self.segment_files().items():
+            if number not in referenced:
+                os.remove(path)
+                self._segments.pop(number, None)
+
+
+class TieredDates(LazyDates):
+    """
+    list of completion dates whose older part lives in archive segments. The recent dates are held as a normal list,
+    the archived ones are decompressed and put in front of them the first time the whole content is used.
+    The length, appending a new completion and the recent dates never touch the archive.
+
+    Attributes
+    ----------
+    archived : int
+        number of archived completion dates.
+    segments : list[int]
+        archive segments holding them.
+    archived_until : int
+        day ordinal of the last day an archive run covered, later completions are all recent.
+    rollup : dict | None
+        days completed per ISO week and per month of the archived dates (see mylife.rollups), None for archives written
+        before it was kept, which are then read to count them.
+    """
+
+    def __init__(self, store: ArchiveStore, habit_id: int, recent: list[str], archived: int, segments: list[int], archived_until: int,
+                 rollup: dict[str, any] = None):
+        super().__init__(store, habit_id)
+        list.extend(self, recent)
+        self.archived = archived
+        self.segments = list(segments)
+        self.archived_until = archived_until
+        self.rollup = rollup
+
+    def load(self):
+        if not self.loaded:
+            self.loaded = True
+            list.__setitem__(self, slice(0, 0), self.store.dates(self.habit_id, self.segments))
+
+    def append(self, day: str):
+        list.append(self, day)  # a new completion joins the recent dates
+
+    def sort(self, *, key=None, reverse: bool = False):
+        """ Chronological sort, only the recent dates are sorted while none of them reaches back into the archive."""
+        if any(parse_date(day) <= self.archived_until for day in self.recent()):
+            self.load()
+        list.sort(self, key=key, reverse=reverse)
+
+    def recent(self) -> list[str]:
+        """ Completion dates that are not archived, every date once loaded."""
+        return list.__getitem__(self, slice(None))
+
+    def recent_ordinals(self) -> list[int]:
+        return [parse_date(day) for day in self.recent()]
+
+    def ordinals(self) -> array:
+        """ Day ordinals of the archived dates followed by the recent ones, only meaningful while the list is not loaded."""
+        return array("i", self.store.ordinals(self.habit_id, self.segments) + self.recent_ordinals())
+
+    def marker(self) -> dict[str, any]:
+        """ What the JSON file stores in place of the archived dates."""
+        marker = {"count": self.archived, "segments": self.segments, "until": self.archived_until}
+        if self.rollup is not None:
+            marker["rollup"] = self.rollup
+        return marker
+
+    def __len__(self) -> int:
+        if not self.loaded:
+            return self.archived + list.__len__(self)
+        return list.__len__(self)
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from mylife import mla
+from mylife.DB import Database
+from mylife.habit import Habit
+from mylife import analytics
+from mylife.analytics import calculate_streak, batch_streaks, streaks_for_all, get_sorted_habits
+from mylife.synthetic import generate_habits, habit_name, write_database
+
+# Benchmark suite over a synthetic database.
+#   python -m mylife.benchmarks [--habits N] [--completions M] [--save-baseline]
+# Every case reports its best wall time and its peak traced memory, and is compared with the stored baseline.
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+# case -> the case it replaces, which it must beat in the same run
+FASTER_THAN = {"batch_streaks": "calculate_streak loop"}
+FASTER_FROM = 50000  # completions in the database, below that the fixed cost of a NumPy batch can outweigh the loop
+
+
+def _cases(filename: str, habits: list[dict[str, any]]) -> dict[str, tuple]:
+    """ name -> (setup, run): setup() builds fresh state outside the measurement, run(state) is measured."""
+    names = [habit["name"] for habit in habits[::max(1, len(habits) // 1000)]]
+
+    def fresh_habits(_=None):
+        return [Habit.from_dict(dict(habit, **{"completion dates": list(habit["completion dates"])})) for habit in habits]
+
+    def cli(*args):
+        from click.testing import CliRunner
+
+        def run(_):
+            mla._database = None  # every invocation opens the database like a new process would
+            result = CliRunner().invoke(mla.main, list(args), env={"MYLIFE_DB": filename})
+            if result.exit_code != 0:
+                raise RuntimeError(f"'mla {' '.join(args)}' failed: {result.output}")
+        return lambda: None, run
+
+    return {
+        "load_db": (lambda: Database(filename), lambda db: db.load_db()),
+        "save_db": (lambda: Database(filename), lambda db: db.save_db()),
+        "save_habit (journal)": (lambda: Database(filename, journal=True),
+                                 lambda db: [db.save_habit(dict(db.db["habit"][str(i)])) for i in range(min(100, len(habits)))]),
+        "get_habit_by_name x1000": (lambda: Database(filename),
+                                    lambda db: [db.get_habit_by_name(name) for name in names * (1000 // len(names) + 1)][:1000]),
+        "calculate_streak (all)": (lambda: habits, lambda data: [calculate_streak(h["completion dates"], h["frequency"]) for h in data]),
+        "streaks_for_all": (fresh_habits, streaks_for_all),
+        "calculate_streak loop": (fresh_habits, lambda data: [calculate_streak(h.completion_dates, h.frequency) for h in data]),
+        "batch_streaks": (fresh_habits, batch_streaks),
+        "get_sorted_habits streak": (fresh_habits, lambda data: get_sorted_habits("streak", data)),
+        "cli lsh": cli("lsh"),
+        "cli anal": cli("anal"),
+        "cli anal --heatmap": cli("anal", "--heatmap"),
+        "cli top": cli("top", "-k", "10"),
+        "cli check": cli("check", "-n", habit_name(0), "-cd", "01/01/2030"),
+    }
+
+def measure(setup, run, repeat: int = 3) -> dict[str, float]:
+    """ Best wall time of repeat runs, then one traced run for the peak memory allocated during run."""
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    state = setup()
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_kib": peak / 1024}
+
+def run_suite(count: int = 10000, completions: int = 30, repeat: int = 3, only: list[str] = None) -> dict[str, dict[str, float]]:
+    """
+    Generates a database of count habits in a temporary directory and measures every benchmark case.
+
+    :return: {case name: {"seconds", "peak_kib"}}
+    :rtype: dict[str, dict[str, float]]
+    """
+    habits = generate_habits(count, completions)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "MylifeData.json")
+        for name, (setup, run) in _cases(filename, habits).items():
+            if only and name not in only:
+                continue
+            write_database(filename, habits)  # every case starts from the same files
+            for leftover in (filename + ".journal", filename + ".rollups"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            results[name] = measure(setup, run, repeat)
+    mla._database = None
+    return results
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float = 1.5) -> list[str]:
+    """ Names of the cases that got slower than tolerance times their baseline."""
+    return [name for name, result in results.items()
+            if name in baseline and result["seconds"] > baseline[name]["seconds"] * tolerance]
+
+def not_faster(results: dict[str, dict[str, float]]) -> list[str]:
+    """
+    Names of the cases that are not faster than the case they replace (see FASTER_THAN).
+    batch_streaks is only checked with NumPy installed, without it the batch is the loop.
+    """
+    return [name for name, reference in FASTER_THAN.items()
+            if name in results and reference in results and results[name]["seconds"] >= results[reference]["seconds"]
+            and not (name == "batch_streaks" and analytics._numpy() is None)]
+
+def report(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]] = None) -> str:
+    """ Formats the results as a table, with the time ratio against the baseline when one is given."""
+    baseline = baseline or {}
+    width = max(len(name) for name in results) if results else 4
+    lines = [f"{'case'.ljust(width)} | {'time ms':>9} | {'peak KiB':>9} | {'baseline':>9} | ratio", "-" * (width + 47)]
+    for name, result in results.items():
+        base = baseline.get(name)
+        ratio = f"{result['seconds'] / base['seconds']:.2f}x" if base and base["seconds"] else "-"
+        base_ms = f"{base['seconds'] * 1000:9.1f}" if base else f"{'-':>9}"
+        lines.append(f"{name.ljust(width)} | {result['seconds'] * 1000:9.1f} | {result['peak_kib']:9.0f} | {base_ms} | {ratio}")
+    return "\n".join(lines)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mylife.benchmarks", description="Benchmarks mylife on a synthetic database.")
+    parser.add_argument("--habits", type=int, default=10000, help="number of generated habits")
+    parser.add_argument("--completions", type=int, default=30, help="average completion dates per habit")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best one counts")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="slowdown factor against the baseline that fails the run")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.habits, args.completions, args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if (stored.get("habits"), stored.get("completions")) == (args.habits, args.completions):
+            baseline = stored["results"]
+        else:
+            print(f"Baseline was measured with {stored.get('habits')} habits x {stored.get('completions')} completions, not compared")
+    print(report(results, baseline))
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"habits": args.habits, "completions": args.completions, "results": results}, f, indent=4)
+        print(f"Baseline saved to '{args.baseline}'")
+        return 0
+    slower = compare(results, baseline, args.tolerance)
+    if slower:
+        print(f"Slower than {args.tolerance}x the baseline: {', '.join(slower)}")
+    behind = not_faster(results) if args.habits * args.completions >= FASTER_FROM else []
+    for name in behind:
+        print(f"'{name}' is not faster than '{FASTER_THAN[name]}'")
+    return 1 if slower or behind else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
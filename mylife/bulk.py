@@ -0,0 +1,184 @@
+import csv
+import io
+import json
+from mylife.dates import parse_date, format_date
+from itertools import islice
+from mylife.DB import Database
+from mylife.habit import Habit
+
+# Streaming bulk import and export, every step works on one habit or one batch at a time
+
+CSV_FIELDS = ["id", "name", "desc", "frequency", "date"]
+
+def export_lines(database: Database, fmt: str = "ndjson"):
+    """
+    Yields the database as text lines, one habit at a time.
+
+    Parameters
+    ----------
+    database : Database
+        the database to export.
+    fmt : ["ndjson", "csv"]
+        'ndjson' writes one habit dictionary per line, 'csv' writes a header then one row per completion date
+        (a habit without completions gets a single row with an empty date).
+
+    :return: generator of lines ending with a newline
+    :rtype: Iterator[str]
+    """
+    if fmt == "ndjson":
+        for habit in database.db["habit"].values():
+            yield json.dumps(dict(habit, **{"completion dates": list(habit.get("completion dates", []))})) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_FIELDS)
+    for habit in database.db["habit"].values():
+        for day in habit.get("completion dates", []) or [""]:
+            writer.writerow([habit["id"], habit["name"], habit["desc"], habit["frequency"], day])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def read_records(lines, fmt: str = "ndjson"):
+    """
+    Yields habit dictionaries parsed from an iterable of lines (an open file works), one habit at a time.
+    CSV rows of the same habit must be consecutive, as written by export_lines.
+
+    Raises
+    ------
+    ValueError
+        If a line is not valid JSON or the CSV header is missing a column
+    """
+    if fmt == "ndjson":
+        for number, line in enumerate(lines, start=1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {number}: {e}")
+        return
+    reader = csv.DictReader(lines)
+    missing = set(CSV_FIELDS) - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+    habit = None
+    for row in reader:
+        habit_id = int(row["id"])
+        if habit is None or habit["id"] != habit_id:
+            if habit is not None:
+                yield habit
+            habit = {"id": habit_id, "name": row["name"], "desc": row["desc"], "frequency": row["frequency"], "completion dates": []}
+        if row["date"]:
+            habit["completion dates"].append(row["date"])
+    if habit is not None:
+        yield habit
+
+def import_records(database: Database, records, batch_size: int = 500) -> tuple[int, dict[str, list[str]]]:
+    """
+    Validates habits in batches and saves them all in one transaction, so the whole import costs a single write
+    (one journal append, compacted at most once, or one snapshot). Either every valid habit is imported or none is:
+    a line that does not parse discards the habits read before it. When another process wrote in the meantime,
+    the habits read so far are saved again on the fresh data and the import goes on, so every record read is held
+    in memory until the import commits.
+
+    Parameters
+    ----------
+    database : Database
+        the database to import into, habits with an existing id are replaced.
+    records : Iterable[dict]
+        habit dictionaries, typically read_records().
+    batch_size : int
+        number of habits validated at once.
+
+    :return: tuple(number of imported habits, error messages per skipped habit)
+    :rtype: tuple[int, dict[str, list[str]]]
+    """
+    records = iter(records)
+    read = []  # records consumed so far, replayed when the write conflicts with another process
+
+    def replayed():
+        yield from list(read)
+        for record in records:
+            read.append(record)
+            yield record
+
+    def import_all():
+        imported = 0
+        offset = 0
+        errors = {}
+        stream = replayed()
+        with database.transaction():
+            while True:
+                batch = list(islice(stream, batch_size))
+                if not batch:
+                    return imported, errors
+                batch_errors = database.save_habits(batch)
+                imported += len(batch) - len(batch_errors)
+                for key, messages in batch_errors.items():  # positions of habits without id count from the first record
+                    errors[f"#{offset + int(key[1:])}" if key.startswith("#") else key] = messages
+                offset += len(batch)
+    return database.retry_on_conflict(import_all)
+
+def date_range(start: str, end: str) -> list[str]:
+    """
+    Every day from start to end, both included | format: %d/%m/%Y
+
+    Raises
+    ------
+    ValueError
+        If a date is not formatted as 'DD/MM/YYYY' or end is before start
+    """
+    first = parse_date(start)
+    last = parse_date(end)
+    if last < first:
+        raise ValueError(f"{end} is before {start}")
+    return [format_date(day) for day in range(first, last + 1)]
+
+def read_check_pairs(lines) -> list[tuple[str, str]]:
+    """ Parses 'name,date' lines (an open file works), blank lines are ignored."""
+    return [(row[0].strip(), row[1].strip()) for row in csv.reader(lines) if row]
+
+def check_many(database: Database, pairs) -> tuple[dict[str, int], dict[str, list[str]]]:
+    """
+    Marks many habits as completed on many dates with a single database write.
+    Dates are applied through Habit.check in chronological order per habit, dates a habit was already checked on are skipped.
+    Dates are compared as days, so '1/3/2025' is the same completion as '01/03/2025'.
+    Each touched habit is validated once by save_habits.
+
+    Parameters
+    ----------
+    database : Database
+        the database holding the habits.
+    pairs : Iterable[tuple[str, str]]
+        (habit name, completion date) pairs | format: %d/%m/%Y
+
+    :return: tuple(new completions per habit name, error messages per habit name or id)
+    :rtype: tuple[dict[str, int], dict[str, list[str]]]
+    """
+    dates_of = {}
+    for name, day in pairs:
+        dates_of.setdefault(name, []).append(day)
+    checked = {}
+    errors = {}
+    habits = []
+    for name, dates in dates_of.items():
+        try:
+            habit = Habit.from_dict(database.get_habit_by_name(name))
+            day_of = {parse_date(day): day for day in dates}  # one completion per day however it is written
+            known = set(habit.sorted_ordinals())
+        except (LookupError, ValueError) as e:
+            errors[name] = [str(e)]
+            continue
+        new_dates = [day_of[ordinal] for ordinal in sorted(day_of) if ordinal not in known]
+        for day in new_dates:
+            habit.check(day)
+        if new_dates:
+            checked[name] = len(new_dates)
+            habits.append(habit.to_dict())
+    if habits:
+        save_errors = database.save_habits(habits)
+        errors.update(save_errors)
+        for habit_data in habits:
+            if str(habit_data["id"]) in save_errors:
+                checked.pop(habit_data["name"], None)
+    return checked, errors
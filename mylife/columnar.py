@@ -0,0 +1,182 @@
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from mylife.dates import parse_date, format_date
+
+# Binary sidecar holding completion history as two fixed-width int32 columns:
+#   MAGIC (8 bytes) | row count (uint64 little-endian) | habit id column | day ordinal column
+# Rows are grouped by ascending habit id, within a habit they keep the order of the completion dates list.
+MAGIC = b"MYLIFEC1"
+HEADER = struct.Struct("<8sQ")
+
+
+class ColumnStore:
+    """
+    ColumnStore Class
+    =================
+    read-only view of a completion history sidecar. The file is opened with mmap and both columns are
+    exposed as memoryviews, a habit's day ordinals are returned as a slice of the mapping without copying.
+
+    Attributes
+    ----------
+    path : str
+        location of the sidecar file.
+    habit_ids : memoryview
+        habit id column, sorted so a habit's rows are found with bisect.
+    days : memoryview
+        day ordinal column (datetime.date.toordinal()).
+
+    Methods
+    -------
+    ordinals(habit_id: int) -> memoryview
+
+    dates(habit_id: int) -> list[str]
+
+    count(habit_id: int) -> int
+
+    reopen()
+
+    close()
+
+    write(path: str, rows: list[tuple[int, list[int]]])
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._open()
+
+    def _open(self):
+        import mmap
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"'{self.path}' is not a completion history file")
+        body = memoryview(self._map)[HEADER.size:]
+        self.habit_ids = body[:rows * 4].cast("i")
+        self.days = body[rows * 4:rows * 8].cast("i")
+
+    def _bounds(self, habit_id: int) -> tuple[int, int]:
+        return bisect_left(self.habit_ids, habit_id), bisect_right(self.habit_ids, habit_id)
+
+    def ordinals(self, habit_id: int) -> memoryview:
+        """ Zero-copy slice of the day ordinals of one habit, it keeps the mapping it was taken from alive until released."""
+        lo, hi = self._bounds(habit_id)
+        return self.days[lo:hi]
+
+    def count(self, habit_id: int) -> int:
+        """ Number of completion dates stored for one habit."""
+        lo, hi = self._bounds(habit_id)
+        return hi - lo
+
+    def dates(self, habit_id: int) -> list[str]:
+        """ Decodes the completion dates of one habit | format: %d/%m/%Y"""
+        return [format_date(day) for day in self.ordinals(habit_id)]
+
+    def reopen(self):
+        """ Maps the file again after it was replaced on disk."""
+        self.close()
+        self._open()
+
+    def close(self):
+        """
+        Releases the memoryviews and the mapping. Slices returned by ordinals() stay readable: while a caller holds one
+        the mapping cannot be closed, so it is dropped instead and unmapped once the last slice is released.
+        """
+        for view in ("days", "habit_ids"):
+            if hasattr(self, view):
+                try:
+                    getattr(self, view).release()
+                except BufferError:  # the column itself is exported, for instance to a NumPy array
+                    pass
+                delattr(self, view)
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:  # an ordinals() slice is still held
+                pass
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def write(path: str, rows: list[tuple[int, list[int]]]):
+        """
+        Writes a sidecar file, replacing any previous one.
+
+        Parameters
+        ----------
+        path : str
+            location of the sidecar file.
+        rows : list[tuple[int, list[int]]]
+            (habit id, day ordinals) pairs.
+        """
+        habit_ids = array("i")
+        days = array("i")
+        for habit_id, ordinals in sorted(rows, key=lambda row: row[0]):
+            habit_ids.extend([habit_id] * len(ordinals))
+            days.extend(ordinals)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(days)))
+            f.write(habit_ids.tobytes())
+            f.write(days.tobytes())
+        os.replace(temp, path)
+
+
+def encode_dates(completion_dates: list[str]) -> list[int]:
+    """ Converts completion dates into day ordinals, raises ValueError for dates not formatted as 'DD/MM/YYYY'."""
+    if isinstance(completion_dates, LazyDates) and not completion_dates.loaded:
+        return completion_dates.ordinals().tolist()
+    return [parse_date(day) for day in completion_dates]
+
+
+class LazyDates(list):
+    """
+    list of completion dates that is only decoded from its store (ColumnStore or ShardStore) when its content is first used.
+    The length and the raw day ordinals are available without decoding anything.
+    """
+
+    def __init__(self, store, habit_id: int):
+        super().__init__()
+        self.store = store
+        self.habit_id = habit_id
+        self.loaded = False
+
+    def load(self):
+        if not self.loaded:
+            self.loaded = True
+            list.extend(self, self.store.dates(self.habit_id))
+
+    def ordinals(self) -> memoryview:
+        """ Zero-copy day ordinals, only meaningful while the list is not loaded."""
+        return self.store.ordinals(self.habit_id)
+
+    def __len__(self) -> int:
+        if not self.loaded:
+            return self.store.count(self.habit_id)
+        return list.__len__(self)
+
+    def __repr__(self) -> str:
+        self.load()
+        return list.__repr__(self)
+
+
+def _loading(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ("__iter__", "__reversed__", "__getitem__", "__setitem__", "__delitem__", "__contains__",
+              "__eq__", "__ne__", "__add__", "__iadd__", "__mul__", "append", "extend", "insert",
+              "remove", "pop", "clear", "sort", "reverse", "index", "count", "copy"):
+    setattr(LazyDates, _name, _loading(_name))
@@ -0,0 +1,162 @@
+from mylife.dates import parse_date, format_date
+from mylife import trace
+
+
+class CompletionBitset:
+    """
+    CompletionBitset Class
+    ======================
+    Completion store that keeps one bit per day, bit i stands for the day ordinal base + i.
+    Checking and unchecking a day are O(1), repeated completions of a day are ignored, iteration
+    is always chronological and streaks are found by scanning runs of set bits.
+
+    Attributes
+    ----------
+    base : int | None
+        day ordinal of bit 0, a multiple of 8 so every byte covers 8 whole days. None while empty.
+
+    Methods
+    -------
+    add(day: str) -> bool
+
+    discard(day: str) -> bool
+
+    ordinals() -> list[int]
+
+    streak(frequency: str) -> tuple[int, int]
+
+    streak_state(frequency: str) -> dict
+    """
+
+    def __init__(self, dates= None):
+        self.base = None
+        self._bits = bytearray()
+        self._count = 0
+        for day in dates or []:
+            self.add(day)
+
+    @staticmethod
+    def _ordinal(day: str) -> int:
+        return parse_date(day)
+
+    def _grow(self, ordinal: int):
+        """ Makes room for ordinal, shifting the bitset when a date before base is added."""
+        if self.base is None:
+            self.base = ordinal - ordinal % 8
+        if ordinal < self.base:
+            new_base = ordinal - ordinal % 8
+            self._bits[0:0] = bytes((self.base - new_base) // 8)
+            self.base = new_base
+        index = (ordinal - self.base) // 8
+        if index >= len(self._bits):
+            self._bits.extend(bytes(index + 1 - len(self._bits)))
+
+    def add(self, day: str) -> bool:
+        """ Marks a day as completed, returns False if it already was."""
+        ordinal = self._ordinal(day)
+        self._grow(ordinal)
+        index, mask = divmod(ordinal - self.base, 8)
+        if self._bits[index] & (1 << mask):
+            return False
+        self._bits[index] |= 1 << mask
+        self._count += 1
+        return True
+
+    append = add  # list compatibility for code written against completion date lists
+
+    def discard(self, day: str) -> bool:
+        """ Unmarks a day, returns False if it was not completed."""
+        if day not in self:
+            return False
+        index, mask = divmod(self._ordinal(day) - self.base, 8)
+        self._bits[index] &= ~(1 << mask)
+        self._count -= 1
+        return True
+
+    def __contains__(self, day: str) -> bool:
+        if self.base is None:
+            return False
+        offset = self._ordinal(day) - self.base
+        if offset < 0 or offset >= len(self._bits) * 8:
+            return False
+        return bool(self._bits[offset // 8] & (1 << offset % 8))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for ordinal in self.ordinals():
+            yield format_date(ordinal)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompletionBitset):
+            return self.ordinals() == other.ordinals()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompletionBitset({list(self)})"
+
+    def ordinals(self) -> list[int]:
+        """ Completed day ordinals in chronological order."""
+        result = []
+        for index, byte in enumerate(self._bits):
+            while byte:
+                low = byte & -byte
+                result.append(self.base + index * 8 + low.bit_length() - 1)
+                byte ^= low
+        return result
+
+    def _period_bits(self, frequency: str) -> tuple[int, int]:
+        """ Returns the completions as an int bitset of periods and the period number of bit 0."""
+        bits = int.from_bytes(self._bits, "little")
+        if frequency == "daily":
+            return bits, self.base
+        first_week = (self.base - 1) // 7  # same ISO week numbering as mylife.streak.period_of
+        bits <<= (self.base - 1) - first_week * 7  # bit 0 is now the monday of the first week
+        weeks = 0
+        week = 0
+        while bits:
+            if bits & 0x7F:
+                weeks |= 1 << week
+            bits >>= 7
+            week += 1
+        return weeks, first_week
+
+    def streak(self, frequency: str) -> tuple[int, int]:
+        """
+        Calculate the longest and current streak by scanning runs of set bits.
+
+        :return: tuple(Longest Streak, Current Streak)
+        :rtype: tuple[int, int]
+        """
+        if not self._count:
+            return 0, 0
+        bits, _ = self._period_bits(frequency)
+        # every step shortens all runs by one bit, the number of steps is the longest run
+        longest = 0
+        runs = bits
+        while runs:
+            runs &= runs >> 1
+            longest += 1
+        # the current streak is the run ending at the highest set bit
+        top = bits.bit_length()
+        gaps = ~bits & ((1 << top) - 1)
+        current = top - gaps.bit_length()
+        return longest, current
+
+    def streak_state(self, frequency: str) -> dict[str, any]:
+        """ Builds the same streak summary as mylife.streak.new_state from the bitset."""
+        if trace.enabled:
+            trace.count("streak computations")
+        longest, current = self.streak(frequency)
+        last_period = None
+        if self._count:
+            bits, first_period = self._period_bits(frequency)
+            last_period = first_period + bits.bit_length() - 1
+        return {
+            "frequency": frequency,
+            "last period": last_period,
+            "current": current,
+            "longest": longest,
+            "total": self._count
+        }
@@ -0,0 +1,197 @@
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+
+# Resident 'mla serve' daemon and the client side used by the CLI commands.
+# The daemon keeps one Database loaded and runs forwarded commands in its own process, one at a time.
+# Protocol, one JSON line each way over a Unix domain socket:
+#   request {"command": name, "params": {...}, "files": [param names holding the text of a read file]}
+#   reply   {"code": exit code, "output": text printed by the command}
+
+def socket_path(db_filename: str) -> str:
+    """ Location of the daemon socket serving a database file, kept next to it."""
+    return os.path.abspath(db_filename) + ".sock"
+
+def _connect(path: str, timeout: float):
+    """ Connects to a daemon socket, returns None when no daemon is listening on it."""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(path)
+    except OSError:  # stale socket file left by a daemon that did not shut down cleanly
+        client.close()
+        return None
+    return client
+
+def is_running(path: str) -> bool:
+    """ True if a daemon accepts connections on the socket."""
+    client = _connect(path, 1.0)
+    if client is None:
+        return False
+    client.close()
+    return True
+
+def forward(path: str, command: str, params: dict[str, any], timeout: float = 30.0) -> dict[str, any]:
+    """
+    Runs a command in the daemon listening on path.
+
+    Parameters
+    ----------
+    path : str
+        daemon socket, see socket_path().
+    command : str
+        name of the click command.
+    params : dict[str, any]
+        parsed parameters of the command, open files are sent as their text.
+
+    :return: reply {"code", "output"}, None when no daemon is running so the caller runs the command itself
+    :rtype: dict[str, any] | None
+
+    Raises
+    ------
+    ConnectionError
+        If the daemon accepted the request but did not answer, the command may have run so it must not be retried locally
+    """
+    client = _connect(path, timeout)
+    if client is None:
+        return None
+    files = [name for name, value in params.items() if hasattr(value, "read")]
+    params = {name: value.read() if name in files else value for name, value in params.items()}
+    request = json.dumps({"command": command, "params": params, "files": files}) + "\n"
+    try:
+        with client:
+            client.sendall(request.encode("utf-8"))
+            with client.makefile("r", encoding="utf-8") as f:
+                line = f.readline()
+    except OSError as e:
+        raise ConnectionError(f"daemon on '{path}' did not answer: {e}")
+    if not line:
+        raise ConnectionError(f"daemon on '{path}' closed the connection")
+    return json.loads(line)
+
+def run_command(group, request: dict[str, any]) -> dict[str, any]:
+    """ Runs one forwarded request against the commands of a click group and captures what it prints."""
+    import click
+    command = group.get_command(None, request.get("command", ""))
+    if command is None:
+        return {"code": 2, "output": f"Error: no such command '{request.get('command')}'\n"}
+    params = dict(request.get("params", {}))
+    for name in request.get("files", []):
+        params[name] = io.StringIO(params[name])
+    output = io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            with click.Context(command, info_name=command.name) as ctx:
+                ctx.invoke(command.callback, **params)
+        except click.exceptions.Exit as e:
+            code = e.exit_code
+        except click.ClickException as e:
+            click.echo(f"Error: {e.format_message()}")
+            code = e.exit_code
+        except Exception as e:  # a failing command must not take the daemon down
+            click.echo(f"Error: {e}")
+            code = 1
+    return {"code": code, "output": output.getvalue()}
+
+def flush_pending(database) -> bool:
+    """
+    Writes the journal records held back by the daemon. When another process wrote in between, the database is
+    reloaded with the records replayed on top and written again. A failure is reported on stderr and the records
+    stay held back for the next attempt.
+
+    :return: True when nothing is held back anymore
+    :rtype: bool
+    """
+    try:
+        database.retry_on_conflict(database.flush)
+        return True
+    except Exception as e:  # the daemon keeps serving, the next flush tries again
+        print(f"Error: could not write pending changes of '{database.filename}': {e}", file=sys.stderr, flush=True)
+        return False
+
+def serve(database, group, path: str, flush_interval: float = 1.0):
+    """
+    Serves a loaded database on a Unix domain socket until SIGINT or SIGTERM.
+
+    Journal writes are held back and flushed every flush_interval seconds in one append, a crash loses at most
+    the commands of the last interval. Pending writes are flushed and the socket is removed on shutdown.
+
+    Raises
+    ------
+    RuntimeError
+        If another daemon serves path, or if the pending writes could not be written on shutdown
+
+    Parameters
+    ----------
+    database : Database
+        the database kept in memory, JSON databases in journal mode get batched flushes.
+    group : click.Group
+        the commands clients may run.
+    path : str
+        socket location, see socket_path().
+    flush_interval : float
+        seconds between two journal flushes.
+    """
+    import asyncio
+    import signal
+
+    batched = getattr(database, "journal", False)
+    if batched:
+        database.defer_writes = True
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = run_command(group, json.loads(line))
+                except (ValueError, TypeError, KeyError) as e:
+                    reply = {"code": 2, "output": f"Error: bad request: {e}\n"}
+                writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(flush_interval)
+            flush_pending(database)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = await asyncio.start_unix_server(handle, path=path)
+        flusher = asyncio.create_task(flush_periodically()) if batched else None
+        try:
+            await stop.wait()
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+            server.close()
+            await server.wait_closed()
+
+    if os.path.exists(path):
+        if is_running(path):
+            raise RuntimeError(f"a daemon is already serving '{path}'")
+        os.remove(path)
+    flushed = True
+    try:
+        asyncio.run(main())
+    finally:
+        if batched:
+            flushed = flush_pending(database)
+            database.defer_writes = False
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    if not flushed:
+        raise RuntimeError(f"the pending changes of '{database.filename}' could not be written and are lost")
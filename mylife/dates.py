@@ -0,0 +1,61 @@
+from datetime import date
+from mylife import trace
+
+# Codec for the 'DD/MM/YYYY' completion date format, used instead of datetime.strptime/strftime.
+# Dates are converted to and from day ordinals (datetime.date.toordinal()) and both directions are memoized,
+# a database holds few distinct days compared to its number of completions.
+
+MEMO_SIZE = 1 << 16  # entries per memo table before it is cleared
+
+_ordinal_of = {}
+_text_of = {}
+
+def parse_date(day: str) -> int:
+    """
+    Converts a completion date into its day ordinal. Accepts what datetime.strptime(day, "%d/%m/%Y") accepts:
+    one or two digit day and month, four digit year.
+
+    Raises
+    ------
+    ValueError
+        If day is not formatted as 'DD/MM/YYYY' or is not a real date
+    TypeError
+        If day is not a string
+    """
+    ordinal = _ordinal_of.get(day)
+    if ordinal is not None:
+        return ordinal
+    if trace.enabled:
+        trace.count("date parses")  # memo hits are not counted, they cost a dictionary lookup
+    if not isinstance(day, str):
+        raise TypeError(f"completion date must be str, not {type(day).__name__}")
+    parts = day.split("/")
+    if len(parts) != 3 or not all(part.isascii() and part.isdigit() for part in parts) \
+            or not (len(parts[0]) <= 2 and len(parts[1]) <= 2 and len(parts[2]) == 4):
+        raise ValueError(f"time data {day!r} does not match format '%d/%m/%Y'")
+    ordinal = date(int(parts[2]), int(parts[1]), int(parts[0])).toordinal()  # ValueError for 31/02 and the like
+    if len(_ordinal_of) >= MEMO_SIZE:
+        _ordinal_of.clear()
+    _ordinal_of[day] = ordinal
+    return ordinal
+
+def format_date(ordinal: int) -> str:
+    """ Converts a day ordinal into a completion date | format: %d/%m/%Y"""
+    text = _text_of.get(ordinal)
+    if text is None:
+        if trace.enabled:
+            trace.count("date formats")
+        day = date.fromordinal(ordinal)
+        text = f"{day.day:02d}/{day.month:02d}/{day.year:04d}"
+        if len(_text_of) >= MEMO_SIZE:
+            _text_of.clear()
+        _text_of[ordinal] = text
+    return text
+
+def today() -> str:
+    """ Today's date | format: %d/%m/%Y"""
+    return format_date(date.today().toordinal())
+
+def decode_dates(completion_dates: list) -> list[str]:
+    """ Completion dates stored as day ordinals back to 'DD/MM/YYYY' strings, strings are kept as they are."""
+    return [format_date(day) if type(day) is int else day for day in completion_dates]
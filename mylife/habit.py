@@ -1,5 +1,9 @@
-from datetime import datetime
-from mylife.DB import Database
+from array import array
+from mylife.DB import Database, sorted_ordinals
+from mylife.dates import parse_date, today, decode_dates
+from mylife.streak import period_of, new_state, advance_state
+from mylife.completions import CompletionBitset
+from mylife.archive import TieredDates
 
 class Habit:
     """
@@ -20,73 +24,252 @@ class Habit:
         A short description of the habit.
     frequency : str
         The frequency of the habit ("daily" or "weekly").
-    completion_dates : list[str]
-        A list of dates (formatted as "DD/MM/YYYY") when the habit was marked as completed.
+    completion_dates : list[str] | CompletionBitset
+        A list of dates (formatted as "DD/MM/YYYY") when the habit was marked as completed,
+        or a CompletionBitset when loaded with from_dict(..., store="bitset").
+    streak : dict | None
+        persisted streak summary ("last period", "current", "longest", "total"), kept up to date by check().
 
     Methods
     -------
-    check(completion_date: str = datetime.now().strftime("%d/%m/%Y"))
+    check(completion_date: str = today)
 
-    update(new_data: dict) -> Habit
+    uncheck(completion_date: str)
+
+    streak_state() -> dict
+
+    streak_is_current() -> bool
+
+    sorted_ordinals(since: int = None, until: int = None) -> array
+
+    update(new_data: dict, database: Database = None) -> Habit
 
     to_dict() -> dict
 
-    from_dict(dict1: dict) -> Habit
+    from_dict(dict1: dict, store: str = "list") -> Habit
         
     __str__() -> str
         
     """
+    __slots__ = ("id", "name", "desc", "frequency", "completion_dates", "streak", "_ordinals")
 
-    def __init__(self, id: int, name: str, desc: str, frequency: str, completion_dates= None):
+    def __init__(self, id: int, name: str, desc: str, frequency: str, completion_dates= None, streak= None):
         self.id = id
         self.name = name
         self.desc = desc
         self.frequency = frequency
-        self.completion_dates= completion_dates or []
+        self.completion_dates= completion_dates if completion_dates is not None else []
+        self.streak = streak
+        self._ordinals = None  # (completion list, its length, sorted day ordinals, recent only) cached by sorted_ordinals()
+
+    def check(self, completion_date: str = None):
+        """
+        Mark the habit as completed at a specific time (today by default).
+        Completions in or after the latest period update the streak summary in O(1), back-dated ones recompute it.
+        A date before the last stored one re-sorts the dates chronologically, even inside the latest period.
+        A CompletionBitset ignores days that are already checked.
 
-    def check(self, completion_date: str = datetime.now().strftime("%d/%m/%Y")):
-        """Mark the habit as completed at a specific time."""
-        self.completion_dates.append(completion_date)
-        self.completion_dates.sort()
+        Raises
+        ------
+        ValueError
+            If completion_date is not formatted as "DD/MM/YYYY"
+        """
+        completion_date = completion_date or today()
+        state = self.streak_state()
+        period = period_of(completion_date, self.frequency)
+        if isinstance(self.completion_dates, CompletionBitset):
+            if not self.completion_dates.add(completion_date):
+                return
+        else:
+            dates = self.completion_dates
+            last = dates.recent()[-1:] if isinstance(dates, TieredDates) and not dates.loaded else dates[-1:]
+            dates.append(completion_date)
+            if last and parse_date(completion_date) < parse_date(last[0]):
+                dates.sort(key=parse_date)
+        self._ordinals = None
+        if state["last period"] is None or period >= state["last period"]:
+            advance_state(state, period)
+        else:
+            self.streak = None
+            self.streak_state()
+
+    def uncheck(self, completion_date: str):
+        """
+        Removes a completion date, unchecking may split a streak so the summary is recomputed.
 
+        Raises
+        ------
+        ValueError
+            If the habit was not completed on completion_date
+        """
+        if isinstance(self.completion_dates, CompletionBitset):
+            if not self.completion_dates.discard(completion_date):
+                raise ValueError(f"habit was not completed on {completion_date}")
+        else:
+            self.completion_dates.remove(completion_date)
+        self._ordinals = None
+        self.streak = None
+
+    def streak_state(self) -> dict[str, any]:
+        """ Returns the streak summary, recomputing it when missing or out of sync with the habit."""
+        if not self.streak_is_current():
+            if isinstance(self.completion_dates, CompletionBitset):
+                self.streak = self.completion_dates.streak_state(self.frequency)
+            else:
+                self.streak = new_state(self.completion_dates, self.frequency)
+        return self.streak
 
-    def update(self, new_data: dict[str, any]):
+    def sorted_ordinals(self, since: int = None, until: int = None) -> array:
+        """
+        Sorted day ordinals of the completion dates, searched with bisect by the date range queries.
+        Built once and reused until check, uncheck or update change the completions, dates still in a history store are not decoded.
+        When no date before the day ordinal since is needed and none of the later ones are archived, only the
+        recent dates are returned and the archive is not read. until is a hint for database backed views, later dates are kept.
+        """
+        self._ordinals = sorted_ordinals(self.completion_dates, since, self._ordinals)
+        return self._ordinals[2]
+
+    def streak_is_current(self) -> bool:
+        """
+        True when the stored streak summary still describes the habit's frequency and completions.
+        Only the frequency and the count are compared: Database recomputes the summary of every habit it stores.
+        """
+        return bool(self.streak) and self.streak["frequency"] == self.frequency \
+            and self.streak["total"] == len(self.completion_dates)
+
+
+    def update(self, new_data: dict[str, any], database: Database = None):
         """ 
-        Updates the habit's attributes based on a dictionary of new values. 
-        Saves changes to the database.
+        Updates the habit's attributes based on a dictionary of new values, empty or missing values are left as they are.
+        Saves changes to the database in one write, an already open database is reused instead of loading the file again.
+
+        Raises
+        ------
+        ValueError
+            If the database refused the new data (validation failed), nothing was written
         """
-        if (new_data["name"]): self.name = new_data["name"]
-        if (new_data["desc"]): self.desc = new_data["desc"]
-        if (new_data["frequency"]): self.frequency = new_data["frequency"]
-        if (new_data["completion dates"]): self.completion_dates = new_data.get("completion dates", [])
-        database = Database()
-        database.save_habit(self.to_dict())
-        database.save_db()
+        if new_data.get("name"): self.name = new_data["name"]
+        if new_data.get("desc"): self.desc = new_data["desc"]
+        if new_data.get("frequency"): self.frequency = new_data["frequency"]
+        if new_data.get("completion dates"):
+            self.completion_dates = new_data["completion dates"]
+            self._ordinals = None
+            self.streak = None
+        if database is None:
+            database = Database()
+        with database.transaction():
+            if not database.save_habit(self.to_dict()):
+                raise ValueError(f"habit {self.id} was not saved, its new data is not valid")
         return self
 
     def to_dict(self) -> dict[str, any]:
-        """ Converts the Habit object into a dictionary for JSON storage. """
+        """ Converts the Habit object into a dictionary for JSON storage, the Database picks how completion dates are stored."""
+        completion_dates = list(self.completion_dates) if isinstance(self.completion_dates, CompletionBitset) else self.completion_dates
         habit_dict = {
             "id": self.id,
             "name": self.name,
             "desc": self.desc,
             "frequency": self.frequency,
-            "completion dates": self.completion_dates
+            "completion dates": completion_dates
         }
+        if self.streak:
+            habit_dict["streak"] = self.streak
         return habit_dict
     
     @staticmethod
-    def from_dict(dict1: dict[str: any]):
-        """Convert dictionary back to Habit object."""
+    def from_dict(dict1: dict[str: any], store: str = "list"):
+        """
+        Convert dictionary back to Habit object. store="bitset" keeps the completion dates in a CompletionBitset.
+        Completion dates stored as day ordinals are converted back to 'DD/MM/YYYY' strings.
+        """
+        completion_dates = dict1.get("completion dates", [])
+        if type(completion_dates) is list and completion_dates and type(completion_dates[0]) is int:  # a LazyDates stays undecoded
+            completion_dates = decode_dates(completion_dates)
+        if store == "bitset":
+            completion_dates = CompletionBitset(completion_dates)
         return Habit(
             id=int(dict1["id"]),
             name=dict1["name"],
             desc=dict1["desc"],
             frequency=dict1["frequency"],
-            completion_dates=dict1.get("completion dates", [])
+            completion_dates=completion_dates,
+            streak=dict1.get("streak")
         )
     
     def __str__(self):
         return f"{self.name} | {self.desc} | frequency: {self.frequency}"
 
-        
+
+class HabitView:
+    """
+    HabitView Class
+    ===============
+
+    Read-only Habit over a stored habit dictionary. Fields are read from the record when they are used
+    instead of being copied, so listing or analysing many habits allocates one small object per habit.
+    Anything that changes a habit needs Habit.from_dict.
+
+    Attributes
+    ----------
+    record : dict
+        the stored habit dictionary, never modified.
+    id, name, desc, frequency, completion_dates
+        read from record.
+    streak : dict | None
+        the record's streak summary, a recomputed one replaces it on this view only.
+    database : Database | None
+        database the record is stored in, its sorted ordinals are then cached by the database instead of the view.
+
+    Methods
+    -------
+    streak_state() -> dict
+
+    streak_is_current() -> bool
+
+    sorted_ordinals(since: int = None, until: int = None) -> array
+
+    to_habit() -> Habit
+
+    __str__() -> str
+    """
+    __slots__ = ("record", "streak", "database", "_ordinals")
+
+    def __init__(self, record: dict[str, any], database: Database = None):
+        self.record = record
+        self.streak = record.get("streak")
+        self.database = database
+        self._ordinals = None
+
+    @property
+    def id(self) -> int:
+        return int(self.record["id"])
+
+    @property
+    def name(self) -> str:
+        return self.record["name"]
+
+    @property
+    def desc(self) -> str:
+        return self.record["desc"]
+
+    @property
+    def frequency(self) -> str:
+        return self.record["frequency"]
+
+    @property
+    def completion_dates(self) -> list[str]:
+        return self.record.get("completion dates", [])
+
+    streak_state = Habit.streak_state
+    streak_is_current = Habit.streak_is_current
+    __str__ = Habit.__str__
+
+    def sorted_ordinals(self, since: int = None, until: int = None) -> array:
+        """ Habit.sorted_ordinals, read from the database when the view has one so they outlive the view."""
+        if self.database is not None:
+            return self.database.sorted_ordinals(self.id, since, until)
+        return Habit.sorted_ordinals(self, since, until)
+
+    def to_habit(self) -> Habit:
+        """ Copies the record into a Habit that can be changed and saved."""
+        return Habit.from_dict(self.record)
@@ -0,0 +1,70 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    FileLock Class
+    ==============
+    advisory, exclusive lock on a small file next to the database. Every process reading or writing the database
+    files takes it first. The locked file also holds the version counter of the database, so a writer can check
+    for changes made by other processes without parsing the database itself.
+
+    Attributes
+    ----------
+    path : str
+        location of the lock file, created on first use.
+
+    Methods
+    -------
+    version() -> int | None
+
+    set_version(version: int)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 seconds, keep waiting
+                    time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    def version(self) -> int:
+        """ Version counter stored in the lock file, None if it was never written."""
+        self._file.seek(0)
+        content = self._file.read().strip()
+        return int(content) if content.isdigit() else None
+
+    def set_version(self, version: int):
+        """ Replaces the version counter, the lock must be held."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(version))
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -1,12 +1,71 @@
+import os
 import click
-from mylife.habit import Habit
-from mylife.DB import Database
-from mylife.analytics import *
+from mylife.dates import today
+from itertools import islice
+from mylife.habit import Habit, HabitView
+from mylife import trace
 
-database = Database()
+# Heavy modules (analytics, jsonschema, numpy, sqlite3, socket) are imported by the commands that use them
+# and the database is opened on first use, so 'mla --help' never touches them.
+_database = None
+
+def database_filename() -> str:
+    """
+    Database file used by the CLI, MYLIFE_DB overrides the default of the selected backend.
+    MYLIFE_TENANT selects the JSON database of one user below MYLIFE_TENANT_ROOT (see mylife.tenants).
+    """
+    if os.environ.get("MYLIFE_BACKEND", "json").lower() == "sqlite":
+        return os.environ.get("MYLIFE_DB", "mylife\\MylifeData.db")
+    if os.environ.get("MYLIFE_TENANT"):
+        from mylife.tenants import TenantStore
+        return TenantStore(os.environ.get("MYLIFE_TENANT_ROOT", "mylife\\tenants")).path_of(os.environ["MYLIFE_TENANT"], create=True)
+    return os.environ.get("MYLIFE_DB", "mylife\\MylifeData.json")
+
+def get_database():
+    """
+    Opens the CLI database on first use and returns the same instance afterwards.
+    MYLIFE_DB overrides the database file and MYLIFE_BACKEND=sqlite switches to the SQLite backend created by 'mla migrate'.
+    Commands that are not forwarded refuse to open the files while 'mla serve' holds them in memory.
+    A database file that cannot be loaded (a damaged JSON file for instance) ends the command with its error message.
+    """
+    global _database
+    if _database is None:
+        from mylife.daemon import socket_path, is_running
+        if is_running(socket_path(database_filename())):
+            raise click.ClickException(f"'mla serve' is running on '{database_filename()}', stop it before running this command")
+        try:
+            if os.environ.get("MYLIFE_BACKEND", "json").lower() == "sqlite":
+                from mylife.sqlite_db import SQLiteDatabase
+                _database = SQLiteDatabase(database_filename())
+            else:
+                from mylife.DB import Database
+                _database = Database(database_filename(), journal=True)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    return _database
+
+class ServedCommand(click.Command):
+    """ Command that runs inside the 'mla serve' daemon when one serves the database, and in this process otherwise."""
+
+    def invoke(self, ctx):
+        if _database is None:  # inside the daemon the database is already open
+            from mylife.daemon import socket_path, forward
+            try:
+                reply = forward(socket_path(database_filename()), self.name, ctx.params)
+            except ConnectionError as e:
+                raise click.ClickException(str(e))
+            if reply is not None:
+                click.echo(reply["output"], nl=False)
+                if reply["code"]:
+                    ctx.exit(reply["code"])
+                return
+        return super().invoke(ctx)
 
 @click.group()
-def main():
+@click.option("--profile", is_flag=True, help="Print per phase timings and counters of the command as a JSON line on stderr.")
+@click.option("--profile-out", type=click.Path(dir_okay=False), default=None, help="Also run the command under cProfile and dump its statistics to this file.")
+@click.pass_context
+def main(ctx, profile=False, profile_out=None):
     """
     Mylife CLI Application
 
@@ -19,88 +78,218 @@ def main():
           Run the script in a terminal and interact using command-line options. 
     USGE: mla [--help] <command> [<args>, -[P], --[options], (value)]
     Note: If 'mla' is not recogmnized, call file directly using 'python -m mla'
+
+    \b
+    MYLIFE_TRACE=1 traces every command like --profile, any other value is a file the JSON lines are appended to.
     """
-    pass
+    target = os.environ.get("MYLIFE_TRACE", "").strip()
+    if target.lower() in ("", "0", "false", "no"):
+        target = None
+    if profile or profile_out or target:
+        start_tracing(ctx, target if target and target.lower() not in ("1", "true", "yes", "stderr") else None, profile_out)
+
+def start_tracing(ctx, trace_file: str = None, profile_out: str = None):
+    """ Traces the command about to run, its report is written when the click context closes."""
+    import json
+    import time
+    from mylife import trace
+    started = time.perf_counter()
+    trace.start(profile=profile_out is not None)
+
+    def report():
+        line = json.dumps(dict({"command": ctx.invoked_subcommand, "total ms": round((time.perf_counter() - started) * 1000, 3)},
+                               **trace.finish(profile_out)), separators=(",", ":"))
+        if trace_file:
+            with open(trace_file, "a") as f:
+                f.write(line + "\n")
+        else:
+            click.echo(line, err=True)
+    ctx.call_on_close(report)
     
 
-@main.command()
+@main.command(cls=ServedCommand)
 @click.option('-n', '--name', prompt='Habit name', help='The name of the habit to be marked')
 @click.option('-cd', default=None, help="Used for specifying a completion date rather than automatic current date selection | format 'DD/MM/YYY'.")
 def check(name: str, cd: str):
     """
     Marks a habit as completed, either for today or a specified date.
     """
+    database = get_database()
+
+    def check_habit():  # runs again on fresh data if another process saved in between
+        with database.transaction():
+            habit = Habit.from_dict(database.get_habit_by_name(name))
+            habit.check(cd)
+            return database.save_habit(habit.to_dict())
     try:
-        habit = Habit.from_dict(database.get_habit_by_name(name))
-    except LookupError as e:
-        if e:
-            click.echo(f'Error: {e}')
-            return
-    if cd:
-        habit.check(cd)
-    else:
-        habit.check()
-    if database.save_habit(habit.to_dict()):
+        saved = database.retry_on_conflict(check_habit)
+    except (LookupError, ValueError) as e:
+        click.echo(f"Error: {e}")
+        return
+    if saved:
         click.echo(f'Habit "{name}" checked off!')
         return True
     click.echo(f'Habit "{name}" not found!')
 
-@main.command()
+@main.command(name="bulk-check", cls=ServedCommand)
+@click.option('-n', '--name', 'names', multiple=True, help='Name of a habit to mark, repeat for more habits.')
+@click.option('-cd', 'dates', multiple=True, help="Completion date to mark, repeat for more dates | format 'DD/MM/YYYY'.")
+@click.option('--from', 'start', default=None, help="First day of a range of completion dates | format 'DD/MM/YYYY'.")
+@click.option('--to', 'end', default=None, help="Last day of the range (default: today) | format 'DD/MM/YYYY'.")
+@click.option('--file', type=click.File('r'), default=None, help="File of 'name,date' lines to mark as well.")
+def bulk_check(names, dates, start, end, file):
+    """
+    Marks many habits as completed on many dates (today by default) with a single database write.
+    Dates a habit was already checked on are skipped.
+    """
+    database = get_database()
+    from mylife.bulk import date_range, read_check_pairs, check_many
+    try:
+        days = list(dates)
+        if start:
+            days += date_range(start, end or today())
+        pairs = [(name, day) for name in names for day in (days or [today()])]
+        if file:
+            pairs += read_check_pairs(file)
+    except (ValueError, IndexError) as e:
+        click.echo(f"Error: {e}")
+        return
+    if not pairs:
+        click.echo("Error: nothing to check, use -n or --file")
+        return
+    checked, errors = database.retry_on_conflict(lambda: check_many(database, pairs))
+    for name, count in checked.items():
+        click.echo(f'Habit "{name}" checked off {count} time(s)!')
+    for name, messages in errors.items():
+        click.echo(f"Error: {name}: {'; '.join(messages)}")
+
+@main.command(cls=ServedCommand)
 @click.option('-s', '--sort', type=click.Choice(['ascending', 'descending', 'streak'], case_sensitive=False), default=None, help="sort the result by name ('ascending', 'descending') or streak ('streak').")
 @click.option('-f', '--filter', type=click.Choice(['daily', 'weekly'], case_sensitive=False), default=None, help="filters by frequency value: 'daily' or 'weekly'")
-def lsh(filter=None, sort=None):
+@click.option('--limit', type=click.IntRange(min=0), default=None, help="show at most this many habits.")
+@click.option('--offset', type=click.IntRange(min=0), default=0, help="skip this many habits first.")
+@click.option('--columns', default="id,name,desc,frequency", show_default=True, help="comma separated columns out of id, name, desc, frequency, current, longest, total.")
+@click.option('--from', 'start', default=None, help="only habits completed on or after this day | format 'DD/MM/YYYY'.")
+@click.option('--to', 'end', default=None, help="only habits completed on or before this day | format 'DD/MM/YYYY'.")
+def lsh(filter=None, sort=None, limit=None, offset=0, columns="id,name,desc,frequency", start=None, end=None):
     """  
-    Lists all habits, with optional filtering (daily/weekly) and sorting 
+    Lists all habits, with optional filtering (daily/weekly, completed between --from and --to) and sorting 
         (ascending, descending, or by streak). 
+    Rows are printed as they are rendered, --limit and --offset page through the list.
     """
-    data_dict = database.load_db()["habit"]
+    from mylife.analytics import get_sorted_habits, render_table, parse_window, count_in_range
+    try:
+        first, last = parse_window(start, end)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    database = get_database()
+    data_dict = database.db["habit"]
     if not data_dict:
         click.echo("No habits found in the database.")
         return
-    habits = []
-    for x in data_dict:
-        habits.append(Habit.from_dict(data_dict[x]))
-    
-    
-    #Quick list
-    if (not filter and not sort):
-        click.echo(list_habits(habits))
-        return True
+    # Read-only views are made one at a time while the table is printed
+    habits = (HabitView(data, database) for data in data_dict.values())
     
     # Filter Logic
-    filtered_list = get_filtered_habits(filter, habits)
+    if filter:
+        habits = (h for h in habits if h.frequency == filter)
+    if start or end:
+        habits = (h for h in habits if count_in_range(h, first, last))
     
-    # Sorter Logic
-    sorted_list = get_sorted_habits(sort, filtered_list)
-    click.echo(list_habits(sorted_list))
+    # Sorter Logic, a page only needs its first offset + limit habits
+    if sort:
+        habits = get_sorted_habits(sort, list(habits) if limit is None else habits, None if limit is None else offset + limit)
+    habits = islice(habits, offset, None if limit is None else offset + limit)
+
+    lines = render_table(habits, [column.strip().lower() for column in columns.split(",") if column.strip()])
+    try:
+        with trace.phase("render"):
+            while True:  # echo flushes on every call, so rows are written in small batches
+                batch = list(islice(lines, 100))
+                if not batch:
+                    return True
+                click.echo("\n".join(batch))
+    except ValueError as e:
+        click.echo(f"Error: {e}")
          
-@main.command()
+@main.command(cls=ServedCommand)
 @click.option('--name', prompt='Habit name', type=str, help='Name of the habit. Only text!')
 @click.option('--desc', prompt='Habit description',type=str, help='Short description of the habit you want to create (no longer than 50 chr!).')
 @click.option('--frequency', prompt='frequency', type=click.Choice(['daily', 'weekly']), help="Habit's frequency: write either 'daily' or 'weekly'.")
 def create(name, desc, frequency):
     """ Creates a new habit with the specified name, description, and frequency.""" 
-    try:
-        database.get_habit_by_name(name)
-    except LookupError as e:
-        if e:
-            id = database.last_id() + 1
-            habit = Habit(id=id, name=name, desc=desc, frequency=frequency)
-            if database.save_habit(habit.to_dict()):
-                click.echo(f'Habit: "{name}" successfully created!')
-            return
-        else: 
-            click.echo(f'Habit with the name "{name}" already exists')
+    database = get_database()
+
+    def create_habit():  # the id and the name check are redone if another process saved in between
+        try:
+            database.get_habit_by_name(name)
+        except LookupError:
+            habit = Habit(id=database.last_id() + 1, name=name, desc=desc, frequency=frequency)
+            with database.transaction():
+                return database.save_habit(habit.to_dict())
+        return None
+    created = database.retry_on_conflict(create_habit)
+    if created is None:
+        click.echo(f'Habit with the name "{name}" already exists')
+    elif created:
+        click.echo(f'Habit: "{name}" successfully created!')
     
-@main.command()
+@main.command(cls=ServedCommand)
 @click.option("-n","--name", default=None, help="name of a habit for a single targetted analysis")
-def anal(name=None):
-    """Displays analytics for a single habit or all habits in the database."""
-    data = database.load_db()["habit"]
+@click.option("--all-tenants", "tenant_root", type=click.Path(exists=True, file_okay=False, resolve_path=True), default=None, help="Report over every tenant database below this directory instead.")
+@click.option("--workers", type=int, default=None, help="Worker processes used by --all-tenants (default: one per CPU).")
+@click.option('--from', 'start', default=None, help="only count completions on or after this day | format 'DD/MM/YYYY'.")
+@click.option('--to', 'end', default=None, help="only count completions on or before this day | format 'DD/MM/YYYY'.")
+@click.option("--heatmap", type=click.Choice(["week", "month"]), is_flag=False, flag_value="week", default=None, help="Show completion rates per week (default) or month instead, read from the stored rollups.")
+@click.option("--periods", type=click.IntRange(min=1), default=12, show_default=True, help="number of heatmap cells when --from is not given.")
+def anal(name=None, tenant_root=None, workers=None, start=None, end=None, heatmap=None, periods=12):
+    """
+    Displays analytics for a single habit or all habits in the database, or a report over many tenants.
+    --from and --to limit completion counts and streaks to a date range.
+    --heatmap shows a completion rate heatmap that only reads the per week and per month rollups.
+    """
+    if tenant_root:
+        from mylife.tenants import fleet_report
+        report = fleet_report(tenant_root, workers)
+        click.echo(f'Tenants: {report["tenants"]}')
+        click.echo(f'- Habits: {report["habits"]} ({report["daily"]} daily, {report["weekly"]} weekly)')
+        click.echo(f'- Total Completions: {report["completions"]}')
+        click.echo(f'- Habits on a streak: {report["active"]}')
+        if report["longest tenant"] is not None:
+            click.echo(f'- Longest streak: {report["longest"]} ("{report["longest habit"]}" of {report["longest tenant"]})')
+        for tenant, error in report["errors"].items():
+            click.echo(f"Error: {tenant}: {error}")
+        return
+    from mylife.analytics import filter_by_frequency, streaks_for_all, current_streak, longest_streak_habit, \
+        parse_window, count_in_range, streak_in_range
+    try:
+        first, last = parse_window(start, end)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    ranged = bool(start or end)
+    span = f" from {start or 'the first day'} to {end or 'the last day'}"
+    database = get_database()
+
+    if heatmap:
+        from mylife.analytics import render_heatmap
+        if name:
+            try:
+                habits = [HabitView(database.get_habit_by_name(name), database)]
+            except LookupError as e:
+                click.echo(f'Error: {e}')
+                return
+        else:
+            habits = [HabitView(x, database) for x in database.db["habit"].values()]
+        with trace.phase("render"):
+            for line in render_heatmap(habits, database.rollups, heatmap, first, last, periods):
+                click.echo(line)
+        return
     
     if name:
         try:
-            habit = Habit.from_dict(database.get_habit_by_name(name))
+            habit = HabitView(database.get_habit_by_name(name), database)
         except LookupError as e:
             click.echo(f'Error: {e}')
             return
@@ -109,73 +298,107 @@ def anal(name=None):
             freq = "day(s)"
         else:
             freq = "week(s)"
-        click.echo(f'Analytics for Habit: "{name}"')
+        click.echo(f'Analytics for Habit: "{name}"' + (span if ranged else ""))
         click.echo(f'- Frequency: {habit.frequency}')
+        if ranged:
+            longest, current = streak_in_range(habit, first, last)
+            click.echo(f'- Completions: {count_in_range(habit, first, last)}')
+            click.echo(f'- Current Streak: {current} {freq}')
+            click.echo(f'- Longest Streak: {longest} {freq}')
+            return
         click.echo(f'- Total Completions: {len(habit.completion_dates)}')
         click.echo(f'- Current Streak: {current_streak(habit)} {freq}')
         click.echo(f'- Longest Streak: {longest_streak_habit(habit)} {freq}')
         return
             
-    habits = [Habit.from_dict(x) for x in data.values()]      
-    streaks = streaks_for_all(habits)  
+    habits = [HabitView(x, database) for x in database.db["habit"].values()]
+    with trace.phase("analytics"):
+        streaks = [streak_in_range(h, first, last) for h in habits] if ranged else streaks_for_all(habits)
     if streaks:
-        click.echo(f'Longest streak overall: {max(streaks, key=lambda x: x[0])[0]}')
+        click.echo(f'Longest streak overall: {max(streaks, key=lambda x: x[0])[0]}' + (span if ranged else ""))
         
+        streak_of = {h.id: s for h, s in zip(habits, streaks)}
         daily = filter_by_frequency(habits, 'daily')
         click.echo(f'Daily habits (current streaks):')
-        for h, s in zip(daily, streaks):  
-            click.echo(f' - {h.name}: {s[1]}')
+        for h in daily:  
+            click.echo(f' - {h.name}: {streak_of[h.id][1]}')
 
         weekly = filter_by_frequency(habits, 'weekly')
         click.echo(f'Weekly habits (current streaks):')
-        for h, s in zip(weekly, streaks): 
-            click.echo(f' - {h.name}: {s[1]}')
+        for h in weekly: 
+            click.echo(f' - {h.name}: {streak_of[h.id][1]}')
     return
 
-@main.command()
+@main.command(cls=ServedCommand)
+@click.option("-k", "count", type=click.IntRange(min=1), default=5, show_default=True, help="number of habits to show.")
+@click.option("--by", type=click.Choice(["current", "longest", "total"]), default="current", show_default=True, help="rank by current streak, longest streak or total completions.")
+def top(count, by):
+    """ Shows the habits with the highest streaks or the most completions."""
+    from mylife.analytics import top_habits
+    database = get_database()
+    habits = [HabitView(data) for data in database.db["habit"].values()]
+    if not habits:
+        click.echo("No habits found in the database.")
+        return
+    label = {"current": "current streak", "longest": "longest streak", "total": "total completions"}[by]
+    click.echo(f"Top {min(count, len(habits))} habit(s) by {label}:")
+    with trace.phase("analytics"):
+        leaders = top_habits(habits, count, by)
+    for rank, (habit, value) in enumerate(leaders, start=1):
+        unit = "completion(s)" if by == "total" else ("day(s)" if habit.frequency == "daily" else "week(s)")
+        click.echo(f" {rank}. {habit.name}: {value} {unit}")
+
+@main.command(cls=ServedCommand)
 @click.argument("habit_name", type=str)
 @click.option('--name', help='Name of the habit. Only text!')
 @click.option('--desc', help='Short description of the habit you want to create (no longer than 50 chr!).')
 @click.option('--frequency', type=click.Choice(['daily', 'weekly']), help="Habit's frequency: write either 'daily' or 'weekly'.")
-@click.option('--completion_dates',default=None, help="Habit's completion dates | format 'DD/MM/YYY'.")
+@click.option('--completion_dates',default=None, help="Habit's completion dates, comma separated | format 'DD/MM/YYY'.")
 def update( habit_name, name=None, desc=None, frequency=None, completion_dates=None):
     """ Updates an existing habit's details. """
-    old_habit = database.get_habit_by_name(habit_name)
-    habit_id = int(old_habit["id"])
-    name = str(name) or old_habit["name"]
-    desc = str(desc) or old_habit["desc"]
-    frequency = frequency or old_habit["frequency"]
-    completion_dates = completion_dates or old_habit.get("completion dates", [])
-    
-    new_habit= {
-        "id": habit_id,
-        "name": name,
-        "desc": desc,
-        "frequency": frequency,
-        "completion dates": completion_dates
-    }
-        
-    #old_habit = Habit.update(Habit.from_dict(old_habit), new_habit)
-    if database.save_habit(new_habit):
-        click.echo(f'Habit: "{new_habit["name"]}" successfully changed!')
-        click.echo(str(new_habit))
+    from mylife.dates import parse_date
+    if completion_dates:
+        completion_dates = [day.strip() for day in completion_dates.split(",")]
+        try:
+            completion_dates.sort(key=parse_date)
+        except ValueError as e:
+            click.echo(f"Error: {e}")
+            return
+    database = get_database()
+
+    def update_habit():  # runs again on fresh data if another process saved in between
+        habit = Habit.from_dict(database.get_habit_by_name(habit_name))
+        return habit.update({"name": name, "desc": desc, "frequency": frequency, "completion dates": completion_dates}, database).to_dict()
+    try:
+        new_habit = database.retry_on_conflict(update_habit)
+    except LookupError as e:
+        click.echo(f"Error: {e}")
         return
-    click.echo(f'Error: Failed to updated!')
-    return
+    except ValueError:  # save_habit already printed why the data is not valid
+        click.echo(f'Error: Failed to updated!')
+        return
+    click.echo(f'Habit: "{new_habit["name"]}" successfully changed!')
+    click.echo(str(new_habit))
     
     
-@main.command()
+@main.command(cls=ServedCommand)
 @click.argument("habit_name", type= str)
 @click.confirmation_option( prompt="Are you sure you want to delete?")
 def delete(habit_name):
     """ Deletes a habit based on its name after confirmation."""
-    try:
+    database = get_database()
+
+    def delete_habit():  # runs again on fresh data if another process saved in between
         habit = database.get_habit_by_name(habit_name)
+        with database.transaction():
+            database.delete_habit(habit["id"])
+        return habit
+    try:
+        habit = database.retry_on_conflict(delete_habit)
     except LookupError as e:
         click.echo(f"Error: {e}")
         return
-    database.delete_habit(habit["id"])
-    click.echo(f"habit '{habit["name"]}' deleted")
+    click.echo(f"habit '{habit['name']}' deleted")
     return
     
 @main.command(hidden=True)
@@ -183,11 +406,115 @@ def delete(habit_name):
 @click.option("--file", default="mylife\\seed_dict.json", help="Path to seed data file")
 def seed_db(file):
     """Injects the seed database (hidden command)."""
-    if database.inject_seed_data(file):
+    database = get_database()
+    if database.retry_on_conflict(lambda: database.inject_seed_data(file)):
         click.echo("Seed database has been successfully injected!")
     else:
         click.echo("Failed to inject the seed database.")
         
+@main.command()
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default="ndjson", help="'ndjson': one habit per line, 'csv': one row per completion date.")
+@click.option("--file", type=click.File("w"), default="-", help="Path of the export file (default: standard output).")
+def export(fmt, file):
+    """ Streams every habit and its completion dates to a NDJSON or CSV file."""
+    database = get_database()
+    from mylife.bulk import export_lines
+    for line in export_lines(database, fmt):
+        file.write(line)
+
+@main.command(name="import")
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default="ndjson", help="'ndjson': one habit per line, 'csv': one row per completion date.")
+@click.option("--file", type=click.File("r"), default="-", help="Path of the file to import (default: standard input).")
+@click.option("--batch-size", default=500, show_default=True, help="Number of habits validated at once, all of them are written together.")
+def import_(fmt, file, batch_size):
+    """ Streams habits from a NDJSON or CSV export into the database, replacing habits with the same id."""
+    database = get_database()
+    from mylife.bulk import read_records, import_records
+    try:
+        imported, errors = import_records(database, read_records(file, fmt), batch_size)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    for habit_id, messages in errors.items():
+        click.echo(f"Skipped habit {habit_id}: {'; '.join(messages)}")
+    click.echo(f"Imported {imported} habit(s)")
+
+@main.command(cls=ServedCommand)
+@click.option("--layout", type=click.Choice(["inline", "columnar", "sharded"]), default=None, help="Store completion dates inside the JSON file ('inline'), in the binary history sidecar ('columnar') or in per habit shards ('sharded').")
+@click.option("--date-format", type=click.Choice(["text", "ordinal"]), default=None, help="Store completion dates as 'DD/MM/YYYY' text or as integer day ordinals.")
+def compact(layout, date_format):
+    """ Folds the journal into a fresh snapshot, optionally switching the completion history layout or date format."""
+    database = get_database()
+    if layout:
+        database.layout = layout
+    if date_format:
+        database.date_format = date_format
+    try:
+        database.retry_on_conflict(database.compact)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    click.echo("Database compacted!")
+
+@main.command(cls=ServedCommand)
+@click.option("--older-than", "days", type=click.IntRange(min=0), required=True, help="Archive the completion dates older than this many days.")
+@click.option("--compression", type=click.Choice(["lzma", "gzip"]), default="lzma", show_default=True, help="Compression of the archive segment.")
+def archive(days, compression):
+    """
+    Moves old completion dates out of the database file into a compressed archive segment.
+    Totals and streaks stay the same, archived dates are only read back when a command needs them.
+    """
+    from mylife.dates import parse_date, format_date
+    database = get_database()
+    before = parse_date(today()) - days
+    try:
+        archived = database.retry_on_conflict(lambda: database.archive_before(before, compression))
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+    if archived:
+        click.echo(f"Archived {archived} completion date(s) before {format_date(before)}")
+    else:
+        click.echo(f"No completion dates before {format_date(before)} to archive")
+
+@main.command()
+@click.option("--source", default="mylife\\MylifeData.json", help="Path of the JSON database to convert")
+@click.option("--target", default="mylife\\MylifeData.db", help="Path of the SQLite database to create or update")
+def migrate(source, target):
+    """ Converts a JSON database into an SQLite database (use with MYLIFE_BACKEND=sqlite)."""
+    from mylife.sqlite_db import SQLiteDatabase
+    sqlite_db = SQLiteDatabase(filename=target)
+    try:
+        count = sqlite_db.migrate_from_json(source)
+    except FileNotFoundError as e:
+        click.echo(f"Error: {e}")
+        return
+    finally:
+        sqlite_db.close()
+    click.echo(f"Migrated {count} habit(s) from '{source}' to '{target}'")
+        
+@main.command()
+@click.option("--flush-interval", default=1.0, show_default=True, help="Seconds between two batched journal writes.")
+def serve(flush_interval):
+    """
+    Keeps the database in memory and runs check, bulk-check, lsh, anal, create, update, delete, compact and archive
+    for other 'mla' calls over a local socket, until interrupted (Ctrl+C).
+    """
+    import socket
+    from mylife.daemon import socket_path, serve as serve_database
+    if not hasattr(socket, "AF_UNIX"):
+        click.echo("Error: 'mla serve' needs Unix domain sockets, which this platform does not provide")
+        return
+    database = get_database()
+    path = socket_path(database_filename())
+    click.echo(f"Serving '{database_filename()}' on '{path}'")
+    try:
+        serve_database(database, main, path, flush_interval)
+    except RuntimeError as e:
+        click.echo(f"Error: {e}")
+        return
+    click.echo("Daemon stopped, pending changes written.")
+
 #Used to call the function once the file is called in main
 if __name__ == '__main__':
     main()     
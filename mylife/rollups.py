@@ -0,0 +1,124 @@
+from datetime import date
+from mylife.columnar import LazyDates
+from mylife.archive import TieredDates
+from mylife.dates import parse_date, MEMO_SIZE
+from mylife import trace
+
+# Completion rollups of a habit: days completed per ISO week ("2024-W09") and per month ("2024-03").
+# Database keeps one rollup per habit in a side file next to the JSON file (never in the records), every write appends
+# the rollups of the habits it saved or deleted. Archive markers store the rollup of their archived dates.
+# Heatmaps and completion rates are then read from the rollups without touching any completion date.
+
+KINDS = ("week", "month")
+
+_keys_of = {}
+
+def period_keys(ordinal: int) -> tuple[str, str]:
+    """ (ISO week key, month key) of a day ordinal, memoized like the date codec."""
+    keys = _keys_of.get(ordinal)
+    if keys is None:
+        day = date.fromordinal(ordinal)
+        year, week, _ = day.isocalendar()
+        keys = (f"{year:04d}-W{week:02d}", f"{day.year:04d}-{day.month:02d}")
+        if len(_keys_of) >= MEMO_SIZE:
+            _keys_of.clear()
+        _keys_of[ordinal] = keys
+    return keys
+
+def habit_rollup(completion_dates: list[str]) -> dict[str, any]:
+    """
+    Counts the days one habit was completed on per ISO week and per month.
+    A LazyDates that is not decoded yet is counted from its day ordinals, and a TieredDates whose archive marker holds
+    a rollup only counts its recent dates. Dates that do not parse are left out.
+
+    :return: {"total": number of completion dates, "week": {week key: days}, "month": {month key: days}}
+    :rtype: dict[str, any]
+    """
+    trace.count("rollup computations")
+    dates, archived = completion_dates, None
+    if isinstance(dates, TieredDates) and not dates.loaded and dates.rollup is not None:
+        dates, archived = dates.recent(), dates.rollup
+    if isinstance(dates, LazyDates) and not dates.loaded:
+        ordinals = dates.ordinals()
+    else:
+        ordinals = []
+        for day in dates:
+            try:
+                ordinals.append(parse_date(day))
+            except (ValueError, TypeError):  # validation only requires strings
+                continue
+    rollup = ordinals_rollup(ordinals)
+    if archived is not None:
+        rollup = merge_rollups(archived, rollup)
+    rollup["total"] = len(completion_dates)
+    return rollup
+
+def ordinals_rollup(ordinals: list[int]) -> dict[str, any]:
+    """ Rollup of day ordinals, a day completed more than once counts once in its week and month."""
+    weeks = {}
+    months = {}
+    for ordinal in set(ordinals):
+        week, month = period_keys(ordinal)
+        weeks[week] = weeks.get(week, 0) + 1
+        months[month] = months.get(month, 0) + 1
+    return {"total": len(ordinals), "week": weeks, "month": months}
+
+def merge_rollups(*rollups: dict[str, any]) -> dict[str, any]:
+    """ Sum of rollups of different days (the archived and the recent dates of a habit), as a new rollup."""
+    merged = {"total": 0, "week": {}, "month": {}}
+    for rollup in rollups:
+        merged["total"] += rollup["total"]
+        for kind in KINDS:
+            counts = merged[kind]
+            for key, count in rollup[kind].items():
+                counts[key] = counts.get(key, 0) + count
+    return merged
+
+def start_of(key: str, kind: str) -> int:
+    """ Day ordinal of the first day of a week or month key."""
+    year, number = key.split("-W") if kind == "week" else key.split("-")
+    if kind == "week":
+        return date.fromisocalendar(int(year), int(number), 1).toordinal()
+    return date(int(year), int(number), 1).toordinal()
+
+def periods_between(kind: str, first: int, last: int) -> list[tuple[str, int]]:
+    """
+    Weeks or months overlapping the days first to last (day ordinals, both included), oldest first.
+
+    :return: (period key, number of days in the period)
+    :rtype: list[tuple[str, int]]
+    """
+    periods = []
+    if kind == "week":
+        day = first - (first - 1) % 7  # back to monday, ordinal 1 is a monday
+        while day <= last:
+            periods.append((period_keys(day)[0], 7))
+            day += 7
+        return periods
+    from calendar import monthrange
+    current = date.fromordinal(first).replace(day=1)
+    while current.toordinal() <= last:
+        days = monthrange(current.year, current.month)[1]
+        periods.append((period_keys(current.toordinal())[1], days))
+        current = date.fromordinal(current.toordinal() + days)
+    return periods
+
+def weeks_in_month(key: str, days: int) -> int:
+    """ Number of ISO weeks belonging to a month of days, a week belongs to the month holding its thursday."""
+    first_thursday = (3 - date.fromordinal(start_of(key, "month")).weekday()) % 7
+    return (days - 1 - first_thursday) // 7 + 1
+
+def completion_rates(rollup: dict[str, any], kind: str, window: list[tuple[str, int]], frequency: str) -> list[float]:
+    """
+    Share of the expected completions done in every period of window (see periods_between): every day for daily habits,
+    every ISO week for weekly ones. A day or a week completed more than once counts once.
+    The weeks of a weekly habit are counted in the month holding their thursday (see weeks_in_month).
+    """
+    if frequency == "weekly" and kind == "month":
+        counts = {}
+        for key in rollup.get("week", {}):
+            month = period_keys(start_of(key, "week") + 3)[1]
+            counts[month] = counts.get(month, 0) + 1
+        return [min(1.0, counts.get(key, 0) / weeks_in_month(key, days)) for key, days in window]
+    counts = rollup.get(kind, {})
+    return [min(1.0, counts.get(key, 0) / (days if frequency == "daily" else 1)) for key, days in window]
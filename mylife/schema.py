@@ -22,6 +22,17 @@ schema = {
             "items": {"type": "string"},  # Ensures all items are strings (dates)
             "minItems": 0,
             "additionalItems": True
+        },
+        "streak": {
+            "type": "object",  # Persisted streak summary maintained by Habit.check()
+            "properties": {
+                "frequency": {"type": "string", "enum": ["daily", "weekly"]},
+                "last period": {"type": ["integer", "null"]},
+                "current": {"type": "integer", "minimum": 0},
+                "longest": {"type": "integer", "minimum": 0},
+                "total": {"type": "integer", "minimum": 0}
+            },
+            "required": ["frequency", "last period", "current", "longest", "total"]
         }
     },
     "required": ["name", "desc", "frequency"]  # These fields must always be present
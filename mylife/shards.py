@@ -0,0 +1,91 @@
+import json
+import os
+from array import array
+from mylife.dates import parse_date
+
+
+class ShardStore:
+    """
+    ShardStore Class
+    ================
+    completion history split into small JSON shard files, one per range of habit ids, next to a metadata index.
+    A shard is only read when one of its habits' completion dates is first used and is then kept in memory.
+
+    Attributes
+    ----------
+    directory : str
+        folder holding the shard files.
+    shard_size : int
+        number of consecutive habit ids stored in one shard.
+    counts : dict[int, int]
+        completion count per habit id, taken from the metadata index so len() never reads a shard.
+
+    Methods
+    -------
+    shard_of(habit_id: int) -> int
+
+    dates(habit_id: int) -> list[str]
+
+    ordinals(habit_id: int) -> array
+
+    count(habit_id: int) -> int
+
+    write_shard(shard: int, habits: dict[int, list[str]])
+
+    close()
+    """
+
+    def __init__(self, directory: str, shard_size: int = 64, counts: dict[int, int] = None):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.counts = counts or {}
+        self._cache = {}
+
+    def shard_of(self, habit_id: int) -> int:
+        return habit_id // self.shard_size
+
+    def _path(self, shard: int) -> str:
+        return os.path.join(self.directory, f"{shard}.json")
+
+    def _read(self, shard: int) -> dict[str, list[str]]:
+        if shard not in self._cache:
+            try:
+                with open(self._path(shard), "r") as f:
+                    self._cache[shard] = json.load(f)
+            except FileNotFoundError:
+                self._cache[shard] = {}
+        return self._cache[shard]
+
+    def dates(self, habit_id: int) -> list[str]:
+        """ Completion dates of one habit, reading its shard on first use | format: %d/%m/%Y"""
+        return list(self._read(self.shard_of(habit_id)).get(str(habit_id), []))
+
+    def ordinals(self, habit_id: int) -> array:
+        """ Day ordinals of one habit."""
+        return array("i", [parse_date(day) for day in self._read(self.shard_of(habit_id)).get(str(habit_id), [])])
+
+    def count(self, habit_id: int) -> int:
+        """ Number of completion dates of one habit, known from the metadata index."""
+        return self.counts.get(habit_id, 0)
+
+    def write_shard(self, shard: int, habits: dict[int, list[str]]):
+        """ Replaces one shard file with the completion dates of its habits, an empty shard removes the file."""
+        content = {str(habit_id): list(dates) for habit_id, dates in sorted(habits.items())}
+        path = self._path(shard)
+        if not content:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                json.dump(content, f)
+            os.replace(path + ".tmp", path)
+        self._cache[shard] = content
+
+    def close(self):
+        """ Forgets the shards read so far."""
+        self._cache = {}
+
+    def reopen(self):
+        """ Drops cached shards so they are read again from disk."""
+        self._cache = {}
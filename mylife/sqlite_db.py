@@ -0,0 +1,385 @@
+import json
+import os
+import sqlite3
+from array import array
+from contextlib import contextmanager
+from datetime import date as Date
+from mylife.DB import Database
+from mylife.dates import parse_date
+from mylife.rollups import period_keys
+
+
+def to_iso(date: str) -> str:
+    """
+    Converts a 'DD/MM/YYYY' completion date into sortable 'YYYY-MM-DD', one digit days and months are zero padded.
+    Dates that do not parse are stored untouched.
+    """
+    try:
+        return Date.fromordinal(parse_date(date)).isoformat()
+    except (ValueError, TypeError):
+        return date
+
+def from_iso(date: str) -> str:
+    """ Converts a stored 'YYYY-MM-DD' date back into the 'DD/MM/YYYY' format used by the app."""
+    parts = date.split("-")
+    if len(parts) != 3:
+        return date
+    return f"{parts[2]}/{parts[1]}/{parts[0]}"
+
+
+class SQLiteDatabase(Database):
+    """
+    SQLiteDatabase Class
+    ====================
+    drop-in replacement for Database that keeps habits in an SQLite file instead of one JSON document.
+    Habits live in the 'habits' table and every completion date is a row of the 'completions' table,
+    indexed on (habit_id, date) so single habit reads, writes and date range queries never scan the whole database.
+    Database.__init__ is not run, the JSON file state (journal, lock, layouts, archive) does not exist here:
+    every Database method relying on it is overridden, and the JSON only ones raise ValueError.
+
+    Attributes
+    ----------
+    filename : str
+        location of the SQLite database file.
+    conn : sqlite3.Connection
+        open connection to the database file.
+    db : dict
+        The whole database in the JSON layout, built on access. Prefer the single habit methods.
+    rollups : dict[str, dict]
+        days completed per ISO week and per month of every habit, aggregated by SQLite on access (see Database.rollups).
+    layout, date_format : None
+        JSON backend storage options, compact() refuses to run when one is set.
+
+    Methods
+    -------
+
+    load_db() : dict[str, any]
+
+    save_habit(habit_data: dict[str, any])
+
+    save_habits(habits: list[dict[str, any]]) : dict[str, list[str]]
+
+    delete_habit(id: str)
+
+    last_id() : int last_id OR -1
+
+    get_habit_by_name(name: str) : dict[str, any] OR LookUpError
+
+    get_completion_dates(habit_id: int, start: str, end: str) : list[str]
+
+    sorted_ordinals(habit_id: int, since: int = None, until: int = None) : array
+
+    transaction() : context manager
+
+    compact()
+
+    flush() : int
+
+    archive_before(before: int, compression: str = "lzma") : ValueError
+
+    migrate_from_json(json_filename: str) : int
+    """
+
+    def __init__(self, filename= "mylife\\MylifeData.db"):
+        self.filename = filename
+        self.db_schema = {"database": self.filename, "habit": {}}
+        self.conn = sqlite3.connect(self.filename)
+        self._in_transaction = False
+        self.layout = None
+        self.date_format = None
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS habits (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                desc TEXT NOT NULL,
+                frequency TEXT NOT NULL,
+                streak TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_habits_name ON habits (name);
+            CREATE TABLE IF NOT EXISTS completions (
+                habit_id INTEGER NOT NULL REFERENCES habits (id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                PRIMARY KEY (habit_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_completions_habit_date ON completions (habit_id, date);
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(habits)")]
+        if "streak" not in columns:  # files created before streak summaries were persisted
+            self.conn.execute("ALTER TABLE habits ADD COLUMN streak TEXT")
+        self.conn.commit()
+
+    @property
+    def db(self) -> dict[str, any]:
+        return self.load_db()
+
+    @property
+    def rollups(self) -> dict[str, dict]:
+        rollups = {str(habit_id): {"total": 0, "week": {}, "month": {}} for (habit_id,) in self.conn.execute("SELECT id FROM habits")}
+        for habit_id, date, count in self.conn.execute("SELECT habit_id, date, COUNT(*) FROM completions GROUP BY habit_id, date"):
+            rollup = rollups[str(habit_id)]
+            rollup["total"] += count
+            try:
+                week, month = period_keys(parse_date(from_iso(date)))
+            except (ValueError, TypeError):  # dates stored untouched by to_iso
+                continue
+            rollup["week"][week] = rollup["week"].get(week, 0) + 1  # days, not completions, see habit_rollup
+            rollup["month"][month] = rollup["month"].get(month, 0) + 1
+        return rollups
+
+    def close(self):
+        """ Closes the connection to the database file."""
+        self.conn.close()
+
+    def save_db(self):
+        """Every write is committed immediately (at the end of an open transaction), kept for interface compatibility."""
+        if not self._in_transaction:
+            self.conn.commit()
+
+    def compact(self):
+        """
+        Rebuilds the database file without its free pages (VACUUM), skipped inside a transaction.
+
+        Raises
+        ------
+        ValueError
+            If layout or date_format was set, completion dates always live in the completions table
+        """
+        if self.layout or self.date_format:
+            self.layout = self.date_format = None  # a later compact() of the same instance runs again
+            raise ValueError(f"completion date layouts and formats need the JSON backend, '{self.filename}' is an SQLite database")
+        if not self._in_transaction:
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+
+    def flush(self) -> int:
+        """ Every write is committed when it happens, so nothing is ever held back. Always returns 0."""
+        return 0
+
+    @contextmanager
+    def transaction(self):
+        """ Runs the block in one SQLite transaction, committed when it ends and rolled back on an exception. Nested blocks join it."""
+        if self._in_transaction:
+            yield self
+            return
+        self._in_transaction = True
+        try:
+            with self.conn:
+                yield self
+        finally:
+            self._in_transaction = False
+
+    @contextmanager
+    def _unit(self):
+        """ Transaction of a single write method, the open transaction() when there is one."""
+        if self._in_transaction:
+            yield
+            return
+        with self.conn:
+            yield
+
+    def load_db(self) -> dict[str, any]:
+        """ Builds the full database dictionary in the same layout as the JSON Database."""
+        db = {"database": self.filename, "habit": {}}
+        for row in self.conn.execute("SELECT id, name, desc, frequency, streak FROM habits ORDER BY id"):
+            db["habit"][str(row[0])] = self._row_to_habit(row, [])
+        for habit_id, date in self.conn.execute("SELECT habit_id, date FROM completions ORDER BY habit_id, seq"):
+            db["habit"][str(habit_id)]["completion dates"].append(from_iso(date))
+        return db
+
+    def inject_seed_data(self, seed_filename="mylife\\seed_dict.json"):
+        """Injects a predefined seed database into the current database, nothing is injected when a seed habit is invalid."""
+        try:
+            with open(seed_filename, "r") as f:
+                seed_data = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: Seed file '{seed_filename}' not found!")
+            return False
+        except json.JSONDecodeError as e:
+            print(f"Error loading seed data: {e}")
+            return False
+
+        try:
+            errors = self.validate_many(list(seed_data["habit"].values()))
+            if errors:
+                for habit_id, messages in errors.items():
+                    for message in messages:
+                        print(f"Validation Error in habit {habit_id}: {message}")
+                return False
+
+            with self._unit():
+                for habit_data in seed_data["habit"].values():
+                    self._store_streak(habit_data)
+                    self._write_habit(habit_data)
+        except KeyError as e:
+            print(f"Error loading seed data: {e}")
+            return False
+        print("Seed database injected successfully!")
+        return True
+
+    def save_habit(self, habit_data: dict[str, any]):
+        """Save or update a habit in the database with validation, a streak summary that comes with it is recomputed."""
+        if not self.validate_habit(habit_data):
+            print("Error: Habit data is not valid!")
+            return False
+
+        self._store_streak(habit_data)
+        with self._unit():
+            self._write_habit(habit_data)
+        return True
+
+    def save_habits(self, habits: list[dict[str, any]]) -> dict[str, list[str]]:
+        """
+        Save or update many habits in a single transaction, invalid habits are skipped and reported.
+
+        :return: error messages per skipped habit id (or '#<list position>' when a habit has no id)
+        :rtype: dict[str, list[str]]
+        """
+        errors = self.validate_many(habits)
+        with self._unit():
+            for position, habit_data in enumerate(habits):
+                key = self._error_key(habit_data, position)
+                if key.startswith("#"):
+                    errors.setdefault(key, []).append("'id' is a required property")
+                elif key not in errors:
+                    self._store_streak(habit_data)
+                    self._write_habit(habit_data)
+        return errors
+
+    def _write_habit(self, habit_data: dict[str, any]):
+        """
+        Inserts or updates a habit row and writes only the completion rows that changed, caller is responsible for the transaction.
+        Rows up to the first date that differs from the stored list are kept, so a check in date order inserts one row.
+        """
+        habit_id = int(habit_data["id"])
+        self.conn.execute(
+            "INSERT INTO habits (id, name, desc, frequency, streak) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, desc = excluded.desc, frequency = excluded.frequency, streak = excluded.streak",
+            (habit_id, habit_data["name"], habit_data["desc"], habit_data["frequency"],
+             json.dumps(habit_data["streak"]) if habit_data.get("streak") else None))
+        dates = [to_iso(date) for date in habit_data.get("completion dates", [])]
+        stored = [date for (date,) in self.conn.execute("SELECT date FROM completions WHERE habit_id = ? ORDER BY seq", (habit_id,))]
+        kept = 0
+        while kept < min(len(dates), len(stored)) and dates[kept] == stored[kept]:
+            kept += 1
+        if kept < len(stored):
+            self.conn.execute("DELETE FROM completions WHERE habit_id = ? AND seq >= ?", (habit_id, kept))
+        self.conn.executemany(
+            "INSERT INTO completions (habit_id, seq, date) VALUES (?, ?, ?)",
+            ((habit_id, seq, date) for seq, date in enumerate(dates[kept:], start=kept)))
+
+    def delete_habit(self, habit_id):
+        """ Delete an entry based on id primary key """
+        with self._unit():
+            cursor = self.conn.execute("DELETE FROM habits WHERE id = ?", (int(habit_id),))
+        if not cursor.rowcount:
+            raise KeyError(str(habit_id))
+
+    def last_id(self) -> int:
+        """ takes the last id as an int, or returns -1 if there is no data.
+        :return: Last ID | -1
+        :rtype: int"""
+        (last,) = self.conn.execute("SELECT MAX(id) FROM habits").fetchone()
+        return -1 if last is None else last
+
+    def get_habit_by_name(self, name) -> dict[str, any]:
+        """
+        looks up the name index and returns the habit, else throws a Lookup Error
+
+        :return: habit
+        :rtype: dict[str, any]
+
+        Raises
+        ------
+        LookUpError
+            If there is no habit under the name parameter
+        """
+        row = self.conn.execute("SELECT id, name, desc, frequency, streak FROM habits WHERE name = ? LIMIT 1", (name,)).fetchone()
+        if row is None:
+            raise LookupError(f"name {name} was not found in database!")
+        return self._row_to_habit(row, self.get_completion_dates(row[0]))
+
+    def _row_to_habit(self, row: tuple, completion_dates: list[str]) -> dict[str, any]:
+        """ Converts a habits table row into the habit dictionary layout."""
+        id, name, desc, frequency, streak = row
+        habit = {"id": id, "name": name, "desc": desc, "frequency": frequency, "completion dates": completion_dates}
+        if streak:
+            habit["streak"] = json.loads(streak)
+        return habit
+
+    def get_completion_dates(self, habit_id: int, start: str = None, end: str = None) -> list[str]:
+        """
+        Returns the completion dates of one habit, optionally limited to an inclusive date range.
+        The range is filtered by SQLite using the (habit_id, date) index.
+
+        Parameters
+        ----------
+        habit_id : int
+            id of the habit.
+        start : str
+            first date of the range, format 'DD/MM/YYYY'.
+        end : str
+            last date of the range, format 'DD/MM/YYYY'.
+
+        :return: completion dates | format: %d/%m/%Y
+        :rtype: list[str]
+        """
+        query = "SELECT date FROM completions WHERE habit_id = ?"
+        params = [int(habit_id)]
+        if start:
+            query += " AND date >= ?"
+            params.append(to_iso(start))
+        if end:
+            query += " AND date <= ?"
+            params.append(to_iso(end))
+        query += " ORDER BY seq" if not (start or end) else " ORDER BY date"
+        return [from_iso(date) for (date,) in self.conn.execute(query, params)]
+
+    def sorted_ordinals(self, habit_id: int, since: int = None, until: int = None) -> array:
+        """
+        Sorted day ordinals of one habit's completion dates between two day ordinals (both included, None leaves that side open).
+        The range is filtered by SQLite using the (habit_id, date) index, see Database.sorted_ordinals.
+
+        Raises
+        ------
+        ValueError
+            If a completion date in the range does not parse
+        """
+        query = "SELECT date FROM completions WHERE habit_id = ?"
+        params = [int(habit_id)]
+        if since is not None:
+            query += " AND date >= ?"
+            params.append(Date.fromordinal(since).isoformat())
+        if until is not None:
+            query += " AND date <= ?"
+            params.append(Date.fromordinal(until).isoformat())
+        return array("i", sorted(parse_date(from_iso(date)) for (date,) in self.conn.execute(query, params)))
+
+    def archive_before(self, before: int, compression: str = "lzma") -> int:
+        """
+        Archive segments are a JSON backend feature, SQLite already reads completion dates per habit and date range.
+
+        Raises
+        ------
+        ValueError
+            Always, the database is left untouched
+        """
+        raise ValueError(f"archiving needs the JSON backend, '{self.filename}' is an SQLite database")
+
+    def migrate_from_json(self, json_filename= "mylife\\MylifeData.json") -> int:
+        """
+        Copies every habit of a JSON database file into this database in a single transaction.
+        The JSON file is opened read only, the migration leaves it (and its folder) untouched.
+
+        :return: number of migrated habits
+        :rtype: int
+        """
+        if not os.path.exists(json_filename):
+            raise FileNotFoundError(f"JSON database '{json_filename}' not found!")
+        source = Database(filename=json_filename, read_only=True)
+        habits = source.db["habit"].values()
+        with self._unit():
+            for habit_data in habits:
+                self._write_habit(habit_data)
+        return len(habits)
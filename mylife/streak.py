@@ -0,0 +1,78 @@
+from mylife.columnar import LazyDates
+from mylife.dates import parse_date
+from mylife import trace
+
+# Streak bookkeeping shared by Habit and analytics
+
+def period_of(day: str, frequency: str) -> int:
+    """
+    Converts a completion date into an integer period, consecutive periods differ by exactly 1.
+
+    Parameters
+    ----------
+    day : str
+        completion date | format: %d/%m/%Y
+    frequency : ["daily", "weekly"]
+        daily periods are day ordinals, weekly periods count ISO weeks (monday to sunday) so streaks carry over new year.
+
+    :return: period number
+    :rtype: int
+    """
+    return period_of_ordinal(parse_date(day), frequency)
+
+def period_of_ordinal(ordinal: int, frequency: str) -> int:
+    """ Same as period_of for a day ordinal (datetime.date.toordinal())."""
+    return ordinal if frequency == "daily" else (ordinal - 1) // 7  # ordinal 1 (01/01/0001) is a monday
+
+def unique_periods(completion_dates: list[str], frequency: str) -> list[int]:
+    """ Sorted, de-duplicated periods of completion dates, read straight from the day ordinals of a LazyDates that is not decoded yet."""
+    if isinstance(completion_dates, LazyDates) and not completion_dates.loaded:
+        return sorted({period_of_ordinal(day, frequency) for day in completion_dates.ordinals()})
+    return sorted({period_of(day, frequency) for day in completion_dates})
+
+def streak_from_periods(periods: list[int]) -> tuple[int, int]:
+    """
+    Calculate the longest and current streak of sorted, de-duplicated periods.
+
+    :return: tuple(Longest Streak, Current Streak)
+    :rtype: tuple[int, int]
+    """
+    if not periods:
+        return 0, 0
+    longest_streak = current_streak = 1
+    for i in range(1, len(periods)):
+        if periods[i] == periods[i - 1] + 1:
+            current_streak += 1
+            longest_streak = max(longest_streak, current_streak)
+        else:
+            current_streak = 1
+    return longest_streak, current_streak
+
+def new_state(completion_dates: list[str], frequency: str) -> dict[str, any]:
+    """
+    Builds a streak summary from scratch, this is the full recompute used for unknown or out of order histories.
+
+    :return: {"frequency", "last period", "current", "longest", "total"}
+    :rtype: dict[str, any]
+    """
+    if trace.enabled:
+        trace.count("streak computations")
+    periods = unique_periods(completion_dates, frequency)
+    longest, current = streak_from_periods(periods)
+    return {
+        "frequency": frequency,
+        "last period": periods[-1] if periods else None,
+        "current": current,
+        "longest": longest,
+        "total": len(completion_dates)
+    }
+
+def advance_state(state: dict[str, any], period: int) -> dict[str, any]:
+    """ Updates a streak summary in place for a completion in the last known period or after it."""
+    last = state["last period"]
+    if last is None or period > last:
+        state["current"] = state["current"] + 1 if last is not None and period == last + 1 else 1
+        state["longest"] = max(state["longest"], state["current"])
+        state["last period"] = period
+    state["total"] += 1
+    return state
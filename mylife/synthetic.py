@@ -0,0 +1,66 @@
+import json
+import random
+from mylife.dates import parse_date, format_date
+
+# Synthetic habit databases of any size for tests and benchmarks, reproducible from a seed.
+
+def habit_name(index: int) -> str:
+    """ Unique name for the index-th habit that passes the schema (letters and spaces, at most 25 characters)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(97 + rest) + letters
+    return f"Habit {letters.capitalize()}"
+
+def generate_habits(count: int, completions: int = 30, daily_ratio: float = 0.7, gap_rate: float = 0.1,
+                    backdated_rate: float = 0.02, start: str = "01/01/2020", seed: int = 0) -> list[dict[str, any]]:
+    """
+    Generates habit dictionaries in the database format.
+
+    Parameters
+    ----------
+    count : int
+        number of habits, ids run from 0 to count - 1.
+    completions : int
+        average number of completion dates per habit, the actual number varies between half and one and a half times it.
+    daily_ratio : float
+        share of daily habits, the rest are weekly.
+    gap_rate : float
+        probability that a completion skips one or more periods, which breaks the streak.
+    backdated_rate : float
+        probability that a completion is recorded after the following one, so the list is not chronological.
+    start : str
+        first possible completion date | format: %d/%m/%Y
+    seed : int
+        seed of the random generator, the same arguments always give the same habits.
+
+    :return: list of habit dictionaries without streak summaries
+    :rtype: list[dict[str, any]]
+    """
+    rng = random.Random(seed)
+    first = parse_date(start)
+    habits = []
+    for habit_id in range(count):
+        frequency = "daily" if rng.random() < daily_ratio else "weekly"
+        step = 1 if frequency == "daily" else 7
+        day = first + rng.randrange(30)
+        dates = []
+        for _ in range(rng.randint(completions // 2, completions + completions // 2)):
+            dates.append(format_date(day))
+            if len(dates) > 1 and rng.random() < backdated_rate:
+                dates[-1], dates[-2] = dates[-2], dates[-1]
+            day += step * (rng.randint(2, 5) if rng.random() < gap_rate else 1)
+        habits.append({
+            "id": habit_id,
+            "name": habit_name(habit_id),
+            "desc": f"Synthetic {frequency} habit",
+            "frequency": frequency,
+            "completion dates": dates
+        })
+    return habits
+
+def write_database(filename: str, habits: list[dict[str, any]]):
+    """ Writes habits as a JSON database file that Database can open."""
+    with open(filename, "w") as f:
+        json.dump({"database": filename, "habit": {str(habit["id"]): habit for habit in habits}}, f)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from mylife.DB import Database
+
+# One database per user, spread over hashed sub-directories so no directory holds tens of thousands of entries:
+#   <root>/<first 2 hex digits of sha1(user)>/<user>/MylifeData.json
+
+DB_NAME = "MylifeData.json"
+
+
+class TenantStore:
+    """
+    TenantStore Class
+    =================
+    maps users (tenants) to their own database file below a root directory.
+
+    Attributes
+    ----------
+    root : str
+        directory holding every tenant.
+
+    Methods
+    -------
+    path_of(user: str, create: bool = False) -> str
+
+    open(user: str, **kwargs) -> Database
+
+    tenants() -> list[tuple[str, str]]
+    """
+
+    def __init__(self, root: str = "mylife\\tenants"):
+        self.root = root
+
+    @staticmethod
+    def shard_of(user: str) -> str:
+        return hashlib.sha1(user.encode("utf-8")).hexdigest()[:2]
+
+    def path_of(self, user: str, create: bool = False) -> str:
+        """
+        Location of a tenant's database file.
+
+        Raises
+        ------
+        ValueError
+            If the user name is empty or could escape its directory
+        """
+        if not user or user in (".", "..") or "/" in user or "\\" in user:
+            raise ValueError(f"'{user}' is not a valid tenant name")
+        directory = os.path.join(self.root, self.shard_of(user), user)
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, DB_NAME)
+
+    def open(self, user: str, **kwargs) -> Database:
+        """ Opens (or creates) a tenant's database, keyword arguments are passed to Database."""
+        return Database(self.path_of(user, create=True), **kwargs)
+
+    def tenants(self) -> list[tuple[str, str]]:
+        """ (user, database file) of every tenant below root, sorted by user."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for tenant in os.scandir(shard.path):
+                path = os.path.join(tenant.path, DB_NAME)
+                if tenant.is_dir() and os.path.exists(path):
+                    found.append((tenant.name, path))
+        return sorted(found)
+
+
+def tenant_summary(tenant: tuple[str, str]) -> dict[str, any]:
+    """
+    Analytics of one tenant, run in a worker process by fleet_report. The database is opened read only,
+    a report never writes into a tenant's directory.
+
+    Parameters
+    ----------
+    tenant : tuple[str, str]
+        (user, database file)
+
+    :return: {"tenant", "habits", "daily", "weekly", "completions", "longest", "longest habit", "active"} or {"tenant", "error"}
+    :rtype: dict[str, any]
+    """
+    from mylife.analytics import streaks_for_all
+    from mylife.habit import HabitView
+    user, path = tenant
+    try:
+        habits = [HabitView(data) for data in Database(path, read_only=True).db["habit"].values()]
+        streaks = streaks_for_all(habits) or []
+    except (OSError, ValueError, KeyError, TypeError) as e:  # one broken tenant must not abort the fleet report
+        return {"tenant": user, "error": str(e)}
+    best = max(range(len(habits)), key=lambda i: streaks[i][0], default=None)
+    return {
+        "tenant": user,
+        "habits": len(habits),
+        "daily": sum(1 for h in habits if h.frequency == "daily"),
+        "weekly": sum(1 for h in habits if h.frequency == "weekly"),
+        "completions": sum(len(h.completion_dates) for h in habits),
+        "longest": streaks[best][0] if best is not None else 0,
+        "longest habit": habits[best].name if best is not None else None,
+        "active": sum(1 for longest, current in streaks if current > 0)
+    }
+
+def merge_summaries(summaries) -> dict[str, any]:
+    """
+    Merges per tenant summaries into one fleet report.
+
+    :return: {"tenants", "habits", "daily", "weekly", "completions", "active", "longest", "longest tenant", "longest habit", "errors"}
+    :rtype: dict[str, any]
+    """
+    report = {"tenants": 0, "habits": 0, "daily": 0, "weekly": 0, "completions": 0, "active": 0,
+              "longest": 0, "longest tenant": None, "longest habit": None, "errors": {}}
+    for summary in summaries:
+        if "error" in summary:
+            report["errors"][summary["tenant"]] = summary["error"]
+            continue
+        report["tenants"] += 1
+        for field in ("habits", "daily", "weekly", "completions", "active"):
+            report[field] += summary[field]
+        if summary["longest"] > report["longest"]:
+            report["longest"] = summary["longest"]
+            report["longest tenant"] = summary["tenant"]
+            report["longest habit"] = summary["longest habit"]
+    return report
+
+def fleet_report(root: str, workers: int = None) -> dict[str, any]:
+    """
+    Runs tenant_summary for every tenant below root on a process pool and merges the results.
+    Tenants are handed out in chunks so tens of thousands of small files do not cost one round trip each.
+
+    Parameters
+    ----------
+    root : str
+        TenantStore root directory.
+    workers : int
+        number of worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+
+    :return: see merge_summaries
+    :rtype: dict[str, any]
+    """
+    tenants = TenantStore(root).tenants()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tenants) < 2:
+        return merge_summaries(map(tenant_summary, tenants))
+    chunksize = max(1, len(tenants) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_summaries(pool.map(tenant_summary, tenants, chunksize=chunksize))
@@ -1,8 +1,18 @@
 import pytest
-from mylife.DB import Database
+from mylife.DB import Database, VersionConflict
+from mylife.rollups import habit_rollup
+from mylife.dates import parse_date
+from mylife.streak import new_state
+from mylife.habit import Habit, HabitView
+from mylife.analytics import calculate_streak, count_in_range, current_streak, longest_streak_habit
+from mylife import trace
+import mylife
 import test_data
 import shutil
+import json
 import os
+import subprocess
+import sys
 
 
 class TestDB:
@@ -130,4 +140,492 @@ class TestDB:
     def teardown_method(self):
         shutil.copyfile("mylife\\tests\\test_empty_dict.json", "mylife\\tests\\test_working_dict.json")
         os.remove("mylife\\tests\\test_empty_dict.json") 
-        pass
\ No newline at end of file
+        for lock in ("mylife\\tests\\test_empty_dict.json.lock", "mylife\\tests\\test_working_dict.json.lock"):
+            if os.path.exists(lock):
+                os.remove(lock)
+
+class TestJournal:
+    """ Tests on the journaled write mode of the Database class """
+
+    def test_journal_replay_and_compaction(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True, compact_every=5)
+        with open(filename) as f:
+            snapshot = f.read()
+
+        for habit in test_data.habits[:3]:
+            db.save_habit(habit.to_dict())
+        db.delete_habit(1)
+
+        # mutations only touch the journal, the snapshot stays as it was
+        with open(filename) as f:
+            assert f.read() == snapshot
+        assert os.path.exists(db.journal_filename)
+
+        # a fresh instance replays the journal on load
+        reopened = Database(filename=filename, journal=True, compact_every=5)
+        assert reopened.db["habit"] == db.db["habit"]
+        assert sorted(reopened.db["habit"]) == ["0", "2"]
+
+        # the fifth record triggers compaction into a new snapshot
+        db.save_habit(test_data.habits[3].to_dict())
+        assert not os.path.exists(db.journal_filename)
+        assert Database(filename=filename).db["habit"] == db.db["habit"]
+
+    def test_journal_torn_record(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True)
+        db.save_habit(test_data.habits[0].to_dict())
+        with open(db.journal_filename, "a") as f:
+            f.write('{"op": "save", "habit": {"id"')
+
+        # an interrupted append only loses the torn record
+        reopened = Database(filename=filename, journal=True)
+        assert list(reopened.db["habit"]) == ["0"]
+
+        # records appended after it are kept, whether the writer loaded before or after the torn append
+        reopened.save_habit(test_data.habits[1].to_dict())
+        with open(db.journal_filename, "a") as f:
+            f.write('{"op": "save", "habit": {"id"')
+        reopened.save_habit(test_data.habits[2].to_dict())
+        assert list(Database(filename=filename, journal=True).db["habit"]) == ["0", "1", "2"]
+
+    def test_deferred_writes(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True)
+        db.defer_writes = True
+        for habit in test_data.habits[:3]:
+            db.save_habit(habit.to_dict())
+
+        # nothing reaches the disk until flush, which writes every held back record at once
+        assert not os.path.exists(db.journal_filename)
+        assert db.flush() == 3
+        assert db.flush() == 0
+        assert Database(filename=filename).db["habit"] == db.db["habit"]
+
+
+    # held back records survive a conflict with another writer and end up on top of its changes
+    @pytest.mark.parametrize("operation", ["flush", "compact"])
+    def test_deferred_writes_conflict(self, tmp_path, operation):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True)
+        db.save_habit(test_data.habits[0].to_dict())
+        db.defer_writes = True
+        db.save_habit(test_data.habits[1].to_dict())
+        Database(filename=filename, journal=True).save_habit(test_data.habits[2].to_dict())
+
+        db.retry_on_conflict(getattr(db, operation))
+        assert db.flush() == 0
+        assert sorted(Database(filename=filename).db["habit"]) == ["0", "1", "2"]
+
+
+class TestIndex:
+    """ Tests on the name index and id counter of the Database class """
+
+    def test_index_consistency(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        assert db.last_id() == 9
+
+        # renaming through save_habit moves the index entry
+        renamed = dict(db.get_habit_by_name("Yoga"), name="Stretching")
+        db.save_habit(renamed)
+        assert db.get_habit_by_name("Stretching")["id"] == 6
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Yoga")
+
+        # renaming the stored dictionary in place moves the index entry as well
+        record = db.get_habit_by_name("Stretching")
+        record["name"] = "Pilates"
+        db.save_habit(record)
+        assert db.get_habit_by_name("Pilates")["id"] == 6
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Stretching")
+
+        # deleting the newest habit keeps the counter monotonic
+        db.delete_habit(9)
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Walking")
+        assert db.last_id() == 9
+
+        # seed injection overwrites habits with the same id and indexes them
+        assert db.inject_seed_data("mylife/seed_dict.json")
+        assert db.get_habit_by_name("Yoga")["id"] == 6
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Stretching")
+
+        # the index is rebuilt on load
+        reopened = Database(filename=db.filename)
+        for habit in reopened.db["habit"].values():
+            assert reopened.get_habit_by_name(habit["name"]) == habit
+
+    # views of the same habit share the sorted ordinals kept by the database until the habit is saved or deleted
+    def test_sorted_ordinals_outlive_views(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        first = parse_date("01/03/2024")
+        expected = {h.name: sum(parse_date(day) >= first for day in h.completion_dates) for h in test_data.habits}
+
+        trace.start()
+        for _ in range(3):
+            for record in db.db["habit"].values():
+                assert count_in_range(HabitView(record, db), first) == expected[record["name"]]
+        assert trace.counters["ordinal sorts"] == len(test_data.habits)
+
+        habit = dict(db.get_habit_by_name("Walking"))
+        habit["completion dates"] = list(habit["completion dates"]) + ["01/04/2024"]
+        db.save_habit(habit)
+        assert count_in_range(HabitView(db.get_habit_by_name("Walking"), db), first) == expected["Walking"] + 1
+        db.delete_habit(0)
+        assert trace.finish()["counters"]["ordinal sorts"] == len(test_data.habits) + 1
+        with pytest.raises(KeyError):
+            db.sorted_ordinals(0)
+
+
+    # a streak summary coming with a saved or imported habit is recomputed, even when it counts as many dates
+    def test_incoming_streak_is_recomputed(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        habits = [habit.to_dict() for habit in test_data.habits]
+        stale = {"frequency": "daily", "last period": 1, "current": 99, "longest": 99}
+        db.save_habit(dict(habits[0], frequency="daily", streak=dict(stale, total=len(habits[0]["completion dates"]))))
+        db.save_habits([dict(habit, frequency="daily", streak=dict(stale, total=len(habit["completion dates"]))) for habit in habits[1:]])
+        for habit in Database(filename=db.filename).db["habit"].values():
+            assert habit["streak"] == new_state(habit["completion dates"], "daily")
+
+        # dates that do not parse leave no summary behind
+        db.save_habit(dict(habits[0], streak=dict(stale, total=1), **{"completion dates": ["someday"]}))
+        assert "streak" not in db.db["habit"]["0"]
+
+
+class TestTransaction:
+    """ Tests on the unit of work of the Database class """
+
+    @pytest.fixture
+    def writes(self, monkeypatch):
+        """ Counts the snapshots and journal appends reaching the disk."""
+        counted = []
+        replace, write_journal = os.replace, Database._write_journal
+        monkeypatch.setattr("mylife.DB.os.replace", lambda *args: counted.append("snapshot") or replace(*args))
+        monkeypatch.setattr(Database, "_write_journal", lambda db, lines: counted.append(len(lines)) or write_journal(db, lines))
+        return counted
+
+    @pytest.mark.parametrize("journal", [False, True])
+    def test_commit_writes_once(self, tmp_path, writes, journal):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=journal)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        writes.clear()
+
+        with db.transaction():
+            with db.transaction():  # joins the outer one
+                db.save_habit(dict(db.get_habit_by_name("Yoga"), desc="Stretch"))
+            db.save_habit(dict(db.get_habit_by_name("Yoga"), desc="Stretch more"))
+            db.delete_habit(0)
+            db.delete_habit(1)
+            assert writes == []
+        assert writes == ([3] if journal else ["snapshot"])
+        reopened = Database(filename=filename)
+        assert reopened.get_habit_by_name("Yoga")["desc"] == "Stretch more"
+        assert sorted(reopened.db["habit"], key=int) == [str(i) for i in range(2, 10)]
+
+        # nothing changed, nothing written
+        writes.clear()
+        with db.transaction():
+            db.get_habit_by_name("Yoga")
+        assert writes == []
+
+        # Habit.update reuses the open database and writes once
+        habit = Habit.from_dict(db.get_habit_by_name("Walking"))
+        habit.update({"desc": "Walk ten thousand steps"}, db)
+        assert writes == ([1] if journal else ["snapshot"])
+
+        # and raises instead of writing when the database refuses the new data
+        writes.clear()
+        with pytest.raises(ValueError):
+            habit.update({"name": "n1ce $ne"}, db)
+        assert writes == [] and db.get_habit_by_name("Walking")["desc"] == "Walk ten thousand steps"
+
+    def test_rollback(self, tmp_path, writes):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        before = json.loads(json.dumps(db.db))
+        writes.clear()
+
+        with pytest.raises(KeyError):
+            with db.transaction():
+                db.save_habit(dict(db.get_habit_by_name("Yoga"), name="Stretching"))
+                db.delete_habit(0)
+                db.delete_habit(42)
+        assert writes == []
+        assert db.db == before
+        assert db.get_habit_by_name("Yoga")["id"] == 6 and db.get_habit_by_name("Running")["id"] == 0
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Stretching")
+
+        # records held back for the daemon survive a rollback without being written
+        db = Database(filename=filename, journal=True)
+        db.defer_writes = True
+        db.save_habit(dict(db.get_habit_by_name("Yoga"), desc="Stretch"))
+        with pytest.raises(KeyError):
+            with db.transaction():
+                db.delete_habit(6)
+                db.delete_habit(42)
+        assert writes == [] and db.get_habit_by_name("Yoga")["desc"] == "Stretch"
+        assert db.flush() == 1
+
+
+class TestRollups:
+    """ Tests on the completion rollups maintained by the Database class """
+
+    @pytest.mark.parametrize("layout", ["inline", "columnar", "sharded"])
+    def test_rollups_follow_writes(self, tmp_path, layout, monkeypatch):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True, layout=layout)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        db.compact()
+        assert db.rollups == {key: habit_rollup(list(habit["completion dates"])) for key, habit in db.db["habit"].items()}
+
+        # once built, a check only rebuilds the rollup of its habit and a delete drops it
+        built = []
+        monkeypatch.setattr("mylife.DB.habit_rollup", lambda dates: built.append(dates) or habit_rollup(dates))
+        habit = dict(db.get_habit_by_name("Walking"))
+        habit["completion dates"] = list(habit["completion dates"]) + ["01/04/2024"]
+        db.save_habit(habit)
+        db.delete_habit(0)
+        assert len(built) == 1
+        assert db.rollups["9"]["month"]["2024-04"] == 1 and "0" not in db.rollups
+        assert Database(filename=filename).rollups == db.rollups
+
+    # rollups are kept in their side file, the index of the columnar and sharded layouts stays small
+    @pytest.mark.parametrize("layout", ["inline", "columnar", "sharded"])
+    def test_rollups_are_not_stored(self, tmp_path, layout):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, layout=layout)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        expected = {str(h.id): habit_rollup(h.completion_dates) for h in test_data.habits}
+        assert db.rollups == expected
+        db.compact()
+        with open(filename) as f:
+            assert not any("rollup" in habit for habit in json.load(f)["habit"].values())
+        assert Database(filename=filename).rollups == expected
+
+    # a new process reads the rollups from the side file, writers append the rollups of the habits they touch
+    @pytest.mark.parametrize("journal", [True, False])
+    def test_rollups_side_file(self, tmp_path, journal, monkeypatch):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=journal)
+        db.save_habits([dict(habit.to_dict(), **{"completion dates": list(habit.completion_dates)}) for habit in test_data.habits])
+        expected = dict(db.rollups)
+        built = []
+        monkeypatch.setattr("mylife.DB.habit_rollup", lambda dates: built.append(dates) or habit_rollup(dates))
+        assert Database(filename=filename).rollups == expected and built == []
+        assert Database(filename=filename, read_only=True).rollups == expected and built == []
+
+        # another process saves and deletes without ever reading the rollups
+        writer = Database(filename=filename, journal=journal)
+        habit = dict(writer.get_habit_by_name("Walking"), **{"completion dates": ["01/04/2024", "01/04/2024"]})
+        writer.save_habit(habit)
+        writer.delete_habit(0)
+        assert len(built) == 1
+        built.clear()
+        reader = Database(filename=filename, journal=True)
+        expected = {key: habit_rollup(habit.get("completion dates", [])) for key, habit in reader.db["habit"].items()}
+        built.clear()
+        assert reader.rollups == expected and built == []
+        assert reader.rollups["9"]["month"] == {"2024-04": 1} and "0" not in reader.rollups
+
+        # unsaved changes are counted over the side file without being written to it
+        reader.defer_writes = True
+        reader.save_habit(dict(reader.get_habit_by_name("Yoga"), **{"completion dates": ["02/04/2024"]}))
+        reader._rollups = None
+        assert reader.rollups["6"]["month"] == {"2024-04": 1} and len(built) == 2
+        assert Database(filename=filename).rollups == expected
+        reader.flush()
+        assert Database(filename=filename).rollups == reader.rollups
+
+        # the rollups of a torn write are ignored, a writer does not append to them and the next reader rebuilds them once
+        with open(db.rollups_filename, "a") as f:
+            f.write('{"id":"1","rollup":')
+        built.clear()
+        assert Database(filename=filename).rollups == reader.rollups and built == []
+        Database(filename=filename, journal=journal).delete_habit(1)
+        expected = {key: value for key, value in reader.rollups.items() if key != "1"}
+        assert Database(filename=filename).rollups == expected and len(built) == 8
+        built.clear()
+        assert Database(filename=filename).rollups == expected and built == []
+
+        # without a side file writers do not create one
+        os.remove(db.rollups_filename)
+        Database(filename=filename, journal=journal).delete_habit(3)
+        assert not os.path.exists(db.rollups_filename)
+        del expected["3"]
+        assert Database(filename=filename).rollups == expected and len(built) == 7
+
+class TestValidation:
+    """ Tests on the cached validator of the Database class """
+
+    def test_validate_many(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        habits = [habit.to_dict() for habit in test_data.habits]
+        assert db.validate_many(habits) == {}
+
+        habits[1] = dict(habits[1], name="n1ce $ne", frequency="monthly")
+        habits[3] = dict(habits[3], desc="")
+        errors = db.validate_many(habits)
+        assert sorted(errors) == ["1", "3"]
+        assert len(errors["1"]) == 2
+
+        # seed injection reports every invalid habit and injects nothing
+        seed = tmp_path / "seed.json"
+        seed.write_text(json.dumps({"habit": {str(i): h for i, h in enumerate(habits)}}))
+        assert not db.inject_seed_data(str(seed))
+        assert db.db["habit"] == {}
+
+    def test_changed_fields_fast_path(self, tmp_path, monkeypatch):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        habit = test_data.habit2.to_dict()
+        assert db.save_habit(habit)
+
+        # appending a completion date does not run the full schema validation
+        def full_validation(habit_data):
+            raise AssertionError("unchanged fields were revalidated")
+        monkeypatch.setattr(db, "validate_habit", full_validation)
+        appended = dict(habit, **{"completion dates": habit["completion dates"] + ["15/03/2024"]})
+        assert db.save_habit(appended)
+
+        # the changed fields are still checked
+        assert not db.save_habit(dict(habit, **{"completion dates": [1, 2]}))
+        assert not db.save_habit(dict(habit, streak={"current": -1}))
+        monkeypatch.undo()
+
+        # any change to name, desc or frequency goes through the full validation
+        assert not db.save_habit(dict(habit, name="n1ce $ne"))
+
+
+class TestArchive:
+    """ Tests on archiving cold completion dates into compressed segments """
+
+    @pytest.mark.parametrize("compression, date_format", [("lzma", "text"), ("gzip", "ordinal")])
+    def test_archive_keeps_totals_and_streaks(self, tmp_path, compression, date_format):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, date_format=date_format)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        before = parse_date("01/03/2024")
+        expected = {h.id: (sorted(h.completion_dates, key=parse_date), calculate_streak(h.completion_dates, h.frequency))
+                    for h in test_data.habits}
+        old = sum(parse_date(day) < before for h in test_data.habits for day in h.completion_dates)
+        rollups = {str(h.id): habit_rollup(h.completion_dates) for h in test_data.habits}
+
+        assert db.archive_before(before, compression) == old
+        assert db.archive_before(before, compression) == 0
+        with open(filename) as f:
+            stored = json.load(f)["habit"].values()
+        assert sum(len(habit["completion dates"]) for habit in stored) == sum(len(h.completion_dates) for h in test_data.habits) - old
+        assert sum(habit["archived"]["count"] for habit in stored if "archived" in habit) == old
+        assert len(os.listdir(db.archive_dirname)) == 1
+
+        # totals, streak summaries, rollups and recent date ranges never decompress the archive
+        trace.start()
+        reopened = Database(filename=filename)
+        assert reopened.rollups == rollups
+        habits = [Habit.from_dict(data) for data in reopened.db["habit"].values()]
+        for habit in habits:
+            assert len(habit.completion_dates) == len(expected[habit.id][0])
+            assert (longest_streak_habit(habit), current_streak(habit)) == expected[habit.id][1]
+            assert count_in_range(habit, before) == sum(parse_date(day) >= before for day in expected[habit.id][0])
+        checked = habits[-1]
+        checked.check("19/03/2024")
+        assert reopened.save_habit(checked.to_dict())
+        assert "archive segments decompressed" not in trace.counters
+
+        # reaching back reads the archive once
+        for habit in habits:
+            assert count_in_range(habit, None, before - 1) == sum(parse_date(day) < before for day in expected[habit.id][0])
+        assert trace.finish()["counters"]["archive segments decompressed"] == 1
+        for habit in habits[:-1]:
+            assert sorted(habit.completion_dates, key=parse_date) == expected[habit.id][0]
+        assert list(Database(filename=filename).get_habit_by_name(checked.name)["completion dates"])[-1] == "19/03/2024"
+
+    def test_archive_layouts(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, layout="columnar")
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        with pytest.raises(ValueError):
+            db.archive_before(parse_date("01/03/2024"))
+
+        # switching to another layout brings the archived dates back and drops the segments
+        db.layout = "inline"
+        db.save_db()
+        db.archive_before(parse_date("01/03/2024"))
+        db.layout = "sharded"
+        db.save_db()
+        assert not os.path.exists(db.archive_dirname)
+        reopened = Database(filename=filename)
+        for habit in test_data.habits:
+            assert list(reopened.db["habit"][str(habit.id)]["completion dates"]) == habit.completion_dates
+
+
+# one writer process: checks a habit on its own dates, one read-modify-write per date
+WRITER = """
+import sys
+from mylife.DB import Database
+from mylife.habit import Habit, HabitView
+filename, journal, writer = sys.argv[1], sys.argv[2] == "journal", int(sys.argv[3])
+db = Database(filename=filename, journal=journal, compact_every=7)
+for day in range(1, 11):
+    def check():
+        habit = Habit.from_dict(db.get_habit_by_name("Yoga"))
+        habit.check(f"{day:02d}/{writer + 1:02d}/2024")
+        return db.save_habit(habit.to_dict())
+    assert db.retry_on_conflict(check, attempts=1000)
+"""
+
+
+class TestConcurrency:
+    """ Tests on locking, atomic writes and version checks of the Database class """
+
+    def test_conflicting_writer(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        first = Database(filename=filename, journal=True)
+        first.save_habit(test_data.habits[0].to_dict())
+        second = Database(filename=filename, journal=True)
+        second.save_habit(test_data.habits[1].to_dict())
+
+        # first did not see the write of second, its save is refused instead of clobbering it
+        with pytest.raises(VersionConflict):
+            first.save_habit(test_data.habits[2].to_dict())
+        assert first.retry_on_conflict(lambda: first.save_habit(test_data.habits[2].to_dict()))
+        assert sorted(Database(filename=filename).db["habit"]) == ["0", "1", "2"]
+
+    def test_corrupt_file_is_kept(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        with open(filename, "w") as f:
+            f.write('{"database": "x", "habit": {"0": {"id"')
+        with pytest.raises(ValueError):
+            Database(filename=filename)
+        with open(filename) as f:
+            assert f.read().endswith('{"id"')
+
+    @pytest.mark.parametrize("mode", ["journal", "snapshot"])
+    def test_parallel_writers(self, tmp_path, mode):
+        filename = str(tmp_path / "MylifeData.json")
+        Database(filename=filename).save_habit({"id": 0, "name": "Yoga", "desc": "Stretch", "frequency": "daily", "completion dates": []})
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(list(mylife.__path__)[0]))
+        writers = [subprocess.Popen([sys.executable, "-c", WRITER, filename, mode, str(writer)], env=env, stderr=subprocess.PIPE, text=True)
+                   for writer in range(8)]
+        for writer in writers:
+            assert writer.wait(timeout=120) == 0, writer.stderr.read()
+
+        # no update was lost and the file is intact
+        habit = Database(filename=filename).get_habit_by_name("Yoga")
+        assert len(habit["completion dates"]) == 80
+        assert len(set(habit["completion dates"])) == 80
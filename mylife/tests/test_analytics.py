@@ -1,6 +1,9 @@
 from mylife.analytics import *
+from mylife import analytics
+from datetime import datetime, timedelta
 import test_data
 import pytest
+import random
 
 class TestAnalytics:
     """ Tests on analytics class """
@@ -35,6 +38,106 @@ class TestAnalytics:
         assert calculate_streak(completion_dates=None, frequency="daily") == (0,0)
         
         streaks_for_all(habits)
+
+        # weekly streaks continue across new year (ISO week 52 -> week 1)
+        assert calculate_streak(["18/12/2023", "25/12/2023", "01/01/2024", "08/01/2024"], "weekly") == (4, 4)
+        # completions in the same period count once
+        assert calculate_streak(["01/03/2024", "01/03/2024", "02/03/2024", "05/03/2024"], "daily") == (2, 1)
             
+    # The batch engine must agree with calculate_streak, with and without NumPy
+    def test_batch_streaks(self, monkeypatch):
+        rng = random.Random(7)
+        start = datetime(2023, 12, 1)
+        habits = [Habit(i, "Habit", "Random history", rng.choice(["daily", "weekly"]),
+                        [(start + timedelta(days=rng.randrange(90))).strftime("%d/%m/%Y") for _ in range(rng.randrange(40))])
+                  for i in range(50)] + test_data.habits
+        habits.append(Habit(50, "Habit", "Short dates", "daily", ["1/3/2025", "02/3/2025", "3/03/2025", "05/03/2025"]))
+        habits.append(Habit(51, "Habit", "Short dates", "weekly", ["9/3/2025", "10/3/2025"]))
+        expected = [calculate_streak(h.completion_dates, h.frequency) for h in habits]
+        assert batch_streaks(habits) == expected
+
+        # streaks_for_all mixes fresh summaries with the batch results
+        habits[0].streak_state()
+        assert streaks_for_all(habits) == expected
+
+        with pytest.raises(ValueError):
+            batch_streaks([Habit(0, "Habit", "Bad date", "daily", ["31/02/2024"])])
+
+        monkeypatch.setattr(analytics, "np", None)
+        assert batch_streaks(habits) == expected
+
+    # The streaming table only reads its width sample before yielding the first line
+    def test_render_table(self):
+        consumed = []
+        def habits():
+            for h in test_data.habits:
+                consumed.append(h)
+                yield h
+        lines = render_table(habits(), ["id", "name", "total"], sample=3)
+        header = next(lines)
+        assert header.split(" | ")[1].strip() == "Name" and len(consumed) == 3
+        rows = list(lines)[1:]
+        assert len(rows) == len(test_data.habits)
+        assert rows[0].split(" | ") == ["0  ", "Running".ljust(len("Meditation")), str(len(test_data.habits[0].completion_dates)).ljust(5)]
+        with pytest.raises(ValueError):
+            next(render_table(test_data.habits, ["id", "nope"]))
+
+        # a bounded page selection gives the same habits as a full sort
+        for sorter in ("ascending", "descending", "streak"):
+            assert get_sorted_habits(sorter, iter(test_data.habits), 4) == get_sorted_habits(sorter, list(test_data.habits))[:4]
+
+    # The heap selection agrees with a full sort on every ranking
+    def test_top_habits(self):
+        habits = test_data.habits
+        streaks = [calculate_streak(h.completion_dates, h.frequency) for h in habits]
+        for by, values in (("current", [s[1] for s in streaks]), ("longest", [s[0] for s in streaks]),
+                           ("total", [len(h.completion_dates) for h in habits])):
+            expected = sorted(zip(habits, values), key=lambda pair: pair[1], reverse=True)[:4]
+            assert top_habits(habits, 4, by) == expected
+        assert len(top_habits(habits, 100)) == len(habits)
+        with pytest.raises(ValueError):
+            top_habits(habits, 3, "name")
+
+    # Range queries agree with filtering every completion date by hand
+    def test_date_range(self):
+        habits = test_data.habits
+        days = sorted({datetime.strptime(d, "%d/%m/%Y") for h in habits for d in h.completion_dates})
+        for start, end in ((days[0], days[-1]), (days[len(days) // 3], days[len(days) // 2]), (days[-1], None), (None, days[0])):
+            first, last = parse_window(start and start.strftime("%d/%m/%Y"), end and end.strftime("%d/%m/%Y"))
+            for habit in habits:
+                inside = [d for d in habit.completion_dates
+                          if (start is None or datetime.strptime(d, "%d/%m/%Y") >= start)
+                          and (end is None or datetime.strptime(d, "%d/%m/%Y") <= end)]
+                assert count_in_range(habit, first, last) == len(inside)
+                assert streak_in_range(habit, first, last) == calculate_streak(inside, habit.frequency)
+            assert completed_in_range(habits, first, last) == [h for h in habits if count_in_range(h, first, last)]
+        with pytest.raises(ValueError):
+            parse_window("02/01/2024", "01/01/2024")
+
+    # The heatmap is drawn from the rollups alone and rates follow the habit frequency
+    def test_render_heatmap(self):
+        from mylife.rollups import habit_rollup
+        habits = [Habit(0, "Daily", "d", "daily"), Habit(1, "Weekly", "w", "weekly")]
+        rollups = {"0": habit_rollup(["04/03/2024", "05/03/2024", "11/03/2024", "12/03/2024", "13/03/2024", "14/03/2024",
+                                      "15/03/2024", "16/03/2024", "17/03/2024"]),
+                   "1": habit_rollup(["27/02/2024", "12/03/2024"])}
+        lines = list(render_heatmap(habits, rollups, "week", periods=3))
+        assert lines[0].endswith("2024-W09 to 2024-W11 | rate")
+        assert lines[1].endswith("| .-# | 43%")
+        assert lines[2].endswith("| #.# | 67%")
+        lines = list(render_heatmap(habits, rollups, "month", parse_date("01/03/2024"), parse_date("31/03/2024")))
+        assert lines[1].endswith("| - | 29%") and lines[2].endswith("| - | 25%")
+        with pytest.raises(ValueError):
+            list(render_heatmap(habits, rollups, "year"))
+
+        # a day or a week completed more than once counts once, March 2024 holds the thursdays of 4 weeks
+        rollups = {"0": habit_rollup(["01/03/2024", "01/03/2024", "02/03/2024"]),
+                   "1": habit_rollup(["04/03/2024", "05/03/2024", "06/03/2024", "07/03/2024", "08/03/2024"])}
+        assert rollups["0"]["week"] == {"2024-W09": 2} and rollups["0"]["total"] == 3
+        lines = list(render_heatmap(habits, rollups, "week", parse_date("26/02/2024"), parse_date("04/03/2024")))
+        assert lines[1].endswith("| -. | 14%") and lines[2].endswith("| .# | 50%")
+        lines = list(render_heatmap(habits, rollups, "month", parse_date("01/03/2024"), parse_date("31/03/2024")))
+        assert lines[1].endswith("| - | 6%") and lines[2].endswith("| - | 25%")
+
     def teardown_method(self):
         pass
\ No newline at end of file
@@ -0,0 +1,106 @@
+from mylife.DB import Database
+from mylife.bulk import export_lines, read_records, import_records, date_range, read_check_pairs, check_many
+import test_data
+import copy
+import io
+import pytest
+
+
+class TestBulk:
+    """ Tests on the streaming bulk import and export """
+    def setup_method(self):
+        pass
+
+    @pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+    def test_round_trip(self, tmp_path, fmt):
+        source = Database(filename=str(tmp_path / "source.json"))
+        source.save_habits([habit.to_dict() for habit in test_data.habits])
+        source.save_habit({"id": 10, "name": "Empty", "desc": "No completions yet", "frequency": "daily", "completion dates": []})
+
+        exported = io.StringIO("".join(export_lines(source, fmt)))
+        target = Database(filename=str(tmp_path / "target.json"), journal=True)
+        imported, errors = import_records(target, read_records(exported, fmt), batch_size=3)
+        assert (imported, errors) == (11, {})
+
+        fields = ["id", "name", "desc", "frequency", "completion dates"]
+        for key, habit in source.db["habit"].items():
+            assert {f: target.db["habit"][key][f] for f in fields} == {f: habit[f] for f in fields}
+        assert Database(filename=target.filename).db["habit"] == target.db["habit"]
+
+    # the whole import is one journal append and at most one compaction, however many batches it takes
+    def test_import_writes_once(self, tmp_path, monkeypatch):
+        db = Database(filename=str(tmp_path / "MylifeData.json"), journal=True, compact_every=5)
+        appends, compactions = [], []
+        write_journal, compact = db._write_journal, db.compact
+        monkeypatch.setattr(db, "_write_journal", lambda lines: appends.append(len(lines)) or write_journal(lines))
+        monkeypatch.setattr(db, "compact", lambda: compactions.append(1) or compact())
+        records = [dict(habit.to_dict(), **{"completion dates": list(habit.completion_dates)}) for habit in test_data.habits]
+        assert import_records(db, records, batch_size=3) == (10, {})
+        assert (appends, compactions) == ([10], [1])
+
+    # a write by another process during the import saves the records read so far again on the fresh data
+    def test_import_conflict(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True)
+
+        def records():
+            for position, habit in enumerate(test_data.habits):
+                if position == 4:
+                    Database(filename=filename, journal=True).save_habit(
+                        {"id": 42, "name": "Other", "desc": "Saved meanwhile", "frequency": "daily", "completion dates": []})
+                yield dict(habit.to_dict(), **{"completion dates": list(habit.completion_dates)})
+        assert import_records(db, records(), batch_size=3) == (10, {})
+        assert sorted(Database(filename=filename).db["habit"], key=int) == [str(h.id) for h in test_data.habits] + ["42"]
+
+    def test_invalid_records(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        lines = ['{"id": 0, "name": "Running", "desc": "Run", "frequency": "daily"}\n',
+                 '{"id": 1, "name": "Bad", "desc": "Run", "frequency": "monthly"}\n',
+                 '{"name": "No id", "desc": "Run", "frequency": "daily"}\n']
+        imported, errors = import_records(db, read_records(lines), batch_size=2)
+        assert imported == 1
+        assert sorted(errors) == ["#2", "1"]
+        assert list(db.db["habit"]) == ["0"]
+
+        with pytest.raises(ValueError):
+            list(read_records(["{not json"]))
+        with pytest.raises(ValueError):
+            list(read_records(["id,name\n"], "csv"))
+
+    def teardown_method(self):
+        pass
+
+
+class TestBulkCheck:
+    """ Tests on checking many habits at once """
+
+    def test_check_many(self, tmp_path, monkeypatch):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        db.save_habits([copy.deepcopy(habit.to_dict()) for habit in test_data.habits])
+        writes = []
+        monkeypatch.setattr(db, "save_db", lambda: writes.append(1))
+
+        pairs = [(name, day) for name in ["Reading", "Yoga"] for day in date_range("13/03/2024", "17/03/2024")]
+        pairs += read_check_pairs(["Reading,16/03/2024\n", "\n", "Nobody,16/03/2024\n"])
+        checked, errors = check_many(db, pairs)
+
+        # one write for every habit and date, already checked dates are skipped
+        assert len(writes) == 1
+        assert checked == {"Reading": 3, "Yoga": 4}
+        assert list(errors) == ["Nobody"]
+        reading = db.get_habit_by_name("Reading")
+        assert reading["completion dates"][-3:] == ["15/03/2024", "16/03/2024", "17/03/2024"]
+        assert reading["streak"]["current"] == 17
+
+        with pytest.raises(ValueError):
+            date_range("17/03/2024", "13/03/2024")
+
+    # dates are compared as days, not as the strings they are written as
+    def test_check_many_unpadded(self, tmp_path):
+        db = Database(filename=str(tmp_path / "MylifeData.json"))
+        db.save_habits([copy.deepcopy(habit.to_dict()) for habit in test_data.habits])
+        pairs = [("Reading", "14/3/2024"), ("Reading", "15/3/2024"), ("Reading", "15/03/2024")]
+        checked, errors = check_many(db, pairs)
+        assert (checked, errors) == ({"Reading": 1}, {})
+        dates = db.get_habit_by_name("Reading")["completion dates"]
+        assert dates[-2:] == ["14/03/2024", "15/03/2024"] and len(dates) == len(set(dates))
@@ -0,0 +1,73 @@
+from mylife.DB import Database
+from mylife.habit import Habit
+from mylife.columnar import ColumnStore, LazyDates
+from mylife.dates import parse_date
+from mylife.analytics import calculate_streak, batch_streaks
+import test_data
+import json
+import os
+
+
+class TestColumnar:
+    """ Tests on the completion history sidecar """
+    def setup_method(self):
+        pass
+
+    def test_columnar_database(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, layout="columnar")
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        db.save_habit({"id": 10, "name": "Odd", "desc": "Dates the sidecar cannot hold", "frequency": "daily", "completion dates": [""]})
+        expected = {key: list(habit["completion dates"]) for key, habit in db.db["habit"].items()}
+
+        # the JSON file only keeps metadata, except for unparseable dates
+        with open(filename) as f:
+            stored = json.load(f)["habit"]
+        assert "completion dates" not in stored["0"]
+        assert stored["10"]["completion dates"] == [""]
+
+        # completion dates are decoded lazily from the memory-mapped sidecar
+        reopened = Database(filename=filename)
+        assert reopened.layout == "columnar"
+        dates = reopened.db["habit"]["1"]["completion dates"]
+        assert isinstance(dates, LazyDates) and not dates.loaded
+        assert len(dates) == 14
+        assert calculate_streak(dates, "daily") == (14, 14)
+        assert bytes(dates.ordinals()) == bytes(reopened.history.ordinals(1))
+        assert not dates.loaded
+
+        habits = [Habit.from_dict(habit) for key, habit in reopened.db["habit"].items() if key != "10"]
+        assert batch_streaks(habits) == [calculate_streak(expected[str(h.id)], h.frequency) for h in habits]
+        assert not dates.loaded
+        assert dates == expected["1"] and dates.loaded
+
+        # check() works on the lazy list and the next save rewrites the sidecar,
+        # even while a zero-copy ordinals() slice is still held
+        held = reopened.db["habit"]["2"]["completion dates"].ordinals()
+        habit = Habit.from_dict(reopened.get_habit_by_name("Running"))
+        habit.check("25/03/2024")
+        assert reopened.save_habit(habit.to_dict())
+        expected["0"].append("25/03/2024")
+        assert [day for day in held] == [parse_date(day) for day in expected["2"]]
+        assert {key: list(h["completion dates"]) for key, h in Database(filename=filename).db["habit"].items()} == expected
+        assert reopened.save_habit(habit.to_dict())
+        assert list(reopened.db["habit"]["2"]["completion dates"]) == expected["2"]
+
+        # switching back to inline dates removes the sidecar
+        inline = Database(filename=filename, layout="inline")
+        inline.save_db()
+        assert not os.path.exists(inline.history_filename)
+        assert {key: h["completion dates"] for key, h in Database(filename=filename).db["habit"].items()} == expected
+
+    def test_column_store(self, tmp_path):
+        path = str(tmp_path / "history.cols")
+        ColumnStore.write(path, [(2, [738950, 738951]), (0, [738000]), (1, [])])
+        store = ColumnStore(path)
+        assert list(store.ordinals(2)) == [738950, 738951]
+        assert store.count(1) == 0 and store.count(0) == 1
+        assert store.dates(0) == ["29/07/2021"]
+        store.close()
+
+    def teardown_method(self):
+        pass
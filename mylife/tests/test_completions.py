@@ -0,0 +1,65 @@
+from mylife.completions import CompletionBitset
+from mylife.habit import Habit
+from mylife.analytics import calculate_streak
+from mylife.streak import new_state
+from datetime import datetime, timedelta
+import test_data
+import pytest
+import random
+
+
+class TestCompletionBitset:
+    """ Tests on CompletionBitset class """
+    def setup_method(self):
+        pass
+
+    def test_bitset_functions(self):
+        bits = CompletionBitset(["05/03/2024", "01/03/2024", "05/03/2024"])
+        # duplicates are ignored and iteration is chronological
+        assert len(bits) == 2
+        assert list(bits) == ["01/03/2024", "05/03/2024"]
+
+        # add() before the first day shifts the bitset
+        assert bits.add("20/02/2024")
+        assert not bits.add("20/02/2024")
+        assert "20/02/2024" in bits and "21/02/2024" not in bits and "01/01/2000" not in bits
+
+        assert bits.discard("05/03/2024")
+        assert not bits.discard("05/03/2024")
+        assert list(bits) == ["20/02/2024", "01/03/2024"]
+
+        assert CompletionBitset().streak("daily") == (0, 0)
+        with pytest.raises(ValueError):
+            bits.add("2024-03-01")
+
+    # bit-run scanning must agree with calculate_streak on de-duplicated histories
+    def test_bitset_streaks(self):
+        rng = random.Random(3)
+        start = datetime(2023, 12, 1)
+        for _ in range(100):
+            dates = [(start + timedelta(days=rng.randrange(120))).strftime("%d/%m/%Y") for _ in range(rng.randrange(1, 60))]
+            for frequency in ["daily", "weekly"]:
+                bits = CompletionBitset(dates)
+                assert bits.streak(frequency) == calculate_streak(dates, frequency)
+                assert bits.streak_state(frequency) == new_state(list(bits), frequency)
+
+    def test_bitset_habit(self):
+        record = test_data.habit2.to_dict()
+        habit = Habit.from_dict(record, store="bitset")
+        assert isinstance(habit.completion_dates, CompletionBitset)
+
+        habit.check("15/03/2024")
+        habit.check("15/03/2024")
+        assert habit.streak_state()["current"] == 15
+
+        # back-dated check closing a gap recomputes the summary
+        habit.uncheck("10/03/2024")
+        assert habit.streak_state()["current"] == 5
+        habit.check("10/03/2024")
+        assert habit.streak_state()["current"] == 15
+
+        # round trip to the JSON shape
+        assert habit.to_dict()["completion dates"] == record["completion dates"] + ["15/03/2024"]
+
+    def teardown_method(self):
+        pass
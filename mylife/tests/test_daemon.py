@@ -0,0 +1,83 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import pytest
+import mylife
+from mylife.DB import Database
+from mylife.daemon import socket_path, is_running, flush_pending
+import test_data
+
+PACKAGE_ROOT = os.path.dirname(list(mylife.__path__)[0])
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+class TestDaemon:
+    """ Tests on the 'mla serve' daemon and the commands forwarded to it """
+
+    def mla(self, *args):
+        return subprocess.run([sys.executable, "-m", "mylife.mla"] + list(args), cwd=self.cwd, env=self.env,
+                              capture_output=True, text=True)
+
+    def test_forwarded_commands(self, tmp_path):
+        self.cwd = tmp_path
+        filename = str(tmp_path / "MylifeData.json")
+        self.env = dict(os.environ, MYLIFE_DB=filename, PYTHONPATH=PACKAGE_ROOT)
+        path = socket_path(filename)
+
+        # without a daemon the commands use the files directly
+        assert "successfully created" in self.mla("create", "--name", "Yoga", "--desc", "Stretch", "--frequency", "daily").stdout
+
+        with open(filename + ".journal") as f:
+            journal = f.read()
+
+        daemon = subprocess.Popen([sys.executable, "-m", "mylife.mla", "serve", "--flush-interval", "60"], cwd=tmp_path,
+                                  env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            deadline = time.time() + 10
+            while not is_running(path):
+                assert time.time() < deadline and daemon.poll() is None, "daemon did not start"
+                time.sleep(0.05)
+
+            assert "checked off" in self.mla("check", "-n", "Yoga", "-cd", "01/03/2025").stdout
+            assert "checked off" in self.mla("check", "-n", "Yoga", "-cd", "02/03/2025").stdout
+            assert "not found" in self.mla("check", "-n", "Running").stdout
+            assert "Total Completions: 2" in self.mla("anal", "-n", "Yoga").stdout
+
+            # writes are held in the daemon until the next flush
+            with open(filename + ".journal") as f:
+                assert f.read() == journal
+
+            # commands that read the files themselves refuse to run next to the daemon
+            result = self.mla("export")
+            assert result.returncode == 1
+            assert "mla serve" in result.stdout + result.stderr
+        finally:
+            daemon.send_signal(signal.SIGTERM)
+            daemon.wait(timeout=10)
+
+        # shutting down writes the pending changes and removes the socket
+        assert not os.path.exists(path)
+        assert len(Database(filename=filename).get_habit_by_name("Yoga")["completion dates"]) == 2
+
+
+class TestFlush:
+    """ Tests on the periodic flush of the daemon """
+
+    def test_failed_flush_keeps_records(self, tmp_path, monkeypatch, capsys):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, journal=True)
+        db.defer_writes = True
+        db.save_habit(test_data.habits[0].to_dict())
+
+        # a failing write is reported and the records wait for the next flush
+        def fail():
+            raise OSError("disk full")
+        monkeypatch.setattr(db, "flush", fail)
+        assert not flush_pending(db)
+        assert "disk full" in capsys.readouterr().err
+        monkeypatch.undo()
+        assert flush_pending(db)
+        assert list(Database(filename=filename).db["habit"]) == ["0"]
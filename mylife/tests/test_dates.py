@@ -0,0 +1,53 @@
+import json
+import random
+import pytest
+from datetime import date, datetime, timedelta
+import test_data
+from mylife.DB import Database
+from mylife.habit import Habit
+from mylife.dates import parse_date, format_date, decode_dates
+
+
+class TestDates:
+    """ Tests on the date codec and the ordinal date format """
+
+    def test_codec_matches_strptime(self):
+        rng = random.Random(3)
+        days = [(date(1990, 1, 1) + timedelta(days=rng.randrange(20000))).strftime("%d/%m/%Y") for _ in range(500)]
+        for day in days + ["1/3/2024", "01/3/2024"]:
+            assert parse_date(day) == datetime.strptime(day, "%d/%m/%Y").toordinal()
+            assert parse_date(day) == parse_date(day)  # memoized
+        for day in days:
+            assert format_date(parse_date(day)) == day
+        for bad in ["31/02/2024", "2024-03-01", "01/03/24", "1/3/2024 ", "+1/03/2024", "01/13/2024", "", "aa/bb/cccc"]:
+            with pytest.raises(ValueError):
+                datetime.strptime(bad, "%d/%m/%Y")
+            with pytest.raises(ValueError):
+                parse_date(bad)
+
+    def test_ordinal_storage(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        habits = [habit.to_dict() for habit in test_data.habits]
+        db = Database(filename=filename, journal=True, date_format="ordinal")
+        db.save_habits(habits[:5])
+        db.compact()
+        db.save_habits(habits[5:])
+
+        # snapshot and journal hold integers, loading gives back the strings
+        with open(filename) as f:
+            snapshot = json.load(f)
+        assert snapshot["date format"] == "ordinal"
+        assert all(type(day) is int for day in snapshot["habit"]["0"]["completion dates"])
+        with open(db.journal_filename) as f:
+            assert type(json.loads(f.readline())["habit"]["completion dates"][0]) is int
+        reopened = Database(filename=filename)
+        assert reopened.date_format == "ordinal"
+        assert [reopened.db["habit"][str(h["id"])]["completion dates"] for h in habits] == [h["completion dates"] for h in habits]
+
+        # records stored as day ordinals convert back at the Habit boundary
+        habit = test_data.habits[0]
+        stored = Database._encode_dates(habit.to_dict())
+        assert stored["completion dates"] == [parse_date(day) for day in habit.completion_dates]
+        assert Habit.from_dict(stored).completion_dates == habit.completion_dates
+        assert list(Habit.from_dict(stored, store="bitset").completion_dates) == sorted(set(habit.completion_dates), key=parse_date)
+        assert decode_dates([parse_date("01/03/2024"), "02/03/2024"]) == ["01/03/2024", "02/03/2024"]
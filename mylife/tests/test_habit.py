@@ -1,5 +1,10 @@
-from mylife.habit import Habit
+from mylife.habit import Habit, HabitView
+from mylife.completions import CompletionBitset
+from mylife.dates import parse_date
+from mylife.DB import Database
+from mylife.streak import new_state
 import pytest
+import os
 
 class TestHabit:
     def setup_method(self):
@@ -51,4 +56,65 @@ class TestHabit:
         assert alt_habit.completion_dates == []
         
     def teardown_method(self):
-        pass
\ No newline at end of file
+        if os.path.exists("mylife\\MylifeData.json.lock"):  # Habit.update without a database opens the default one
+            os.remove("mylife\\MylifeData.json.lock")
+    # check() keeps the streak summary equal to a full recompute
+    def test_streak_state(self):
+        habit = Habit(0, "Reading", "Read a book", "daily", ["01/03/2024", "02/03/2024", "03/03/2024"])
+        assert habit.streak_state()["current"] == 3
+
+        # appending in order only advances the summary
+        habit.check("04/03/2024")
+        habit.check("04/03/2024")
+        habit.check("06/03/2024")
+        assert habit.streak == new_state(habit.completion_dates, "daily")
+        assert (habit.streak["longest"], habit.streak["current"], habit.streak["total"]) == (4, 1, 6)
+
+        # back-dated checks fall back to a full recompute and keep the dates chronological
+        habit.check("05/03/2024")
+        assert habit.streak == new_state(habit.completion_dates, "daily")
+        assert habit.streak["current"] == 6
+        assert habit.completion_dates[-2:] == ["05/03/2024", "06/03/2024"]
+
+        # so do back-dated checks inside the latest period
+        weekly = Habit(1, "Gym", "Lift", "weekly", ["03/01/2024"])
+        weekly.check("01/01/2024")
+        assert weekly.completion_dates == ["01/01/2024", "03/01/2024"]
+        assert weekly.streak == new_state(weekly.completion_dates, "weekly")
+
+        # the summary survives the dictionary round trip
+        restored = Habit.from_dict(habit.to_dict())
+        assert restored.streak == habit.streak
+
+        with pytest.raises(ValueError):
+            habit.check("2024-03-07")
+
+    # a view reads the record in place and answers like the Habit built from it
+    def test_habit_view(self):
+        record = {"id": "3", "name": "Reading", "desc": "Read a book", "frequency": "weekly",
+                  "completion dates": ["01/03/2024", "08/03/2024", "20/03/2024"]}
+        view = HabitView(record)
+        habit = Habit.from_dict(record)
+        assert (view.id, view.name, view.desc, view.frequency, str(view)) == (habit.id, habit.name, habit.desc, habit.frequency, str(habit))
+        assert view.completion_dates is record["completion dates"]
+        assert view.streak_state() == habit.streak_state()
+        assert list(view.sorted_ordinals()) == list(habit.sorted_ordinals())
+        assert "streak" not in record
+        with pytest.raises(AttributeError):
+            view.name = "Writing"
+        with pytest.raises(AttributeError):
+            habit.color = "blue"  # __slots__, no per instance __dict__
+        assert view.to_habit().to_dict() == Habit.from_dict(record).to_dict()
+
+    # changing the completions without changing their number rebuilds the sorted ordinals
+    @pytest.mark.parametrize("bitset", [False, True])
+    def test_sorted_ordinals_cache(self, bitset, tmp_path):
+        dates = ["01/03/2025", "02/03/2025"]
+        habit = Habit(0, "Reading", "Read a book", "daily", CompletionBitset(dates) if bitset else dates)
+        assert list(habit.sorted_ordinals()) == [parse_date(day) for day in dates]
+        habit.uncheck("01/03/2025")
+        habit.check("10/03/2025")
+        assert list(habit.sorted_ordinals()) == [parse_date("02/03/2025"), parse_date("10/03/2025")]
+        habit.update({"completion dates": ["04/03/2025", "05/03/2025"]}, database=Database(filename=str(tmp_path / "MylifeData.json")))
+        assert list(habit.sorted_ordinals()) == [parse_date("04/03/2025"), parse_date("05/03/2025")]
+
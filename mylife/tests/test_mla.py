@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import mylife
+
+# Startup budget of the CLI, measured in a fresh interpreter like a real 'mla' call.
+# The limits leave headroom for slow machines, they catch regressions such as an eager heavy import.
+HELP_BUDGET = 1.5  # seconds
+LSH_BUDGET = 5.0  # seconds, 10k habits
+PACKAGE_ROOT = os.path.dirname(list(mylife.__path__)[0])
+
+
+def run_mla(args: list[str], cwd, db_file: str) -> tuple[float, subprocess.CompletedProcess]:
+    env = dict(os.environ, MYLIFE_DB=db_file, PYTHONPATH=PACKAGE_ROOT)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "mylife.mla"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+class TestStartup:
+    """ Tests on the start-up cost of the mla CLI """
+    def setup_method(self):
+        pass
+
+    def test_help_is_lightweight(self, tmp_path):
+        db_file = str(tmp_path / "MylifeData.json")
+        code = ("import sys; from mylife.mla import main\n"
+                "try:\n    main(['--help'])\nexcept SystemExit:\n    pass\n"
+                "print(sorted(m for m in ('jsonschema', 'numpy', 'sqlite3', 'mylife.analytics', 'mylife.shards',\n"
+                "                         'socket', 'gzip', 'mmap', 'calendar') if m in sys.modules))")
+        env = dict(os.environ, MYLIFE_DB=db_file, PYTHONPATH=PACKAGE_ROOT)
+        result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+        # --help does not open (or create) the database
+        assert not os.path.exists(db_file)
+
+        elapsed, result = run_mla(["--help"], tmp_path, db_file)
+        assert result.returncode == 0
+        assert elapsed < HELP_BUDGET
+
+    def test_lsh_budget(self, tmp_path):
+        db_file = str(tmp_path / "MylifeData.json")
+        habits = {str(i): {"id": i, "name": f"Habit {chr(65 + i % 26)}", "desc": "Generated habit", "frequency": "daily",
+                           "completion dates": [f"{day:02d}/03/2024" for day in range(1, 11)]} for i in range(10000)}
+        with open(db_file, "w") as f:
+            json.dump({"database": db_file, "habit": habits}, f)
+
+        elapsed, result = run_mla(["lsh"], tmp_path, db_file)
+        assert result.returncode == 0
+        assert len(result.stdout.splitlines()) >= 10002
+        assert elapsed < LSH_BUDGET
+
+    # a damaged database file ends every command with its error instead of a traceback, and is left untouched
+    def test_corrupt_database(self, tmp_path):
+        db_file = str(tmp_path / "MylifeData.json")
+        with open(db_file, "w") as f:
+            f.write('{"habit": {')
+        for args in (["lsh"], ["check", "-n", "Yoga"]):
+            _, result = run_mla(args, tmp_path, db_file)
+            assert result.returncode == 1
+            assert "is not a valid database" in result.stderr and "Traceback" not in result.stderr
+        with open(db_file) as f:
+            assert f.read() == '{"habit": {'
+
+    def teardown_method(self):
+        pass
@@ -0,0 +1,57 @@
+from mylife.DB import Database
+from mylife.habit import Habit
+from mylife.analytics import get_filtered_habits, get_sorted_habits, list_habits
+import test_data
+import json
+import os
+
+
+class TestShards:
+    """ Tests on the sharded completion history layout """
+    def setup_method(self):
+        pass
+
+    def test_sharded_database(self, tmp_path):
+        filename = str(tmp_path / "MylifeData.json")
+        db = Database(filename=filename, layout="sharded", shard_size=4)
+        for habit in test_data.habits:
+            db.save_habit(habit.to_dict())
+        expected = {key: list(habit["completion dates"]) for key, habit in db.db["habit"].items()}
+
+        # the JSON file is a metadata index, dates live in one shard per id range
+        with open(filename) as f:
+            index = json.load(f)["habit"]
+        assert "completion dates" not in index["5"] and index["5"]["completion count"] == 14
+
+        reopened = Database(filename=filename, shard_size=4)
+        assert reopened.layout == "sharded"
+
+        # listing, filtering and sorting by name only touch the index
+        habits = [Habit.from_dict(habit) for habit in reopened.load_db()["habit"].values()]
+        list_habits(get_sorted_habits("ascending", get_filtered_habits("daily", habits)))
+        assert not any(h.completion_dates.loaded for h in habits)
+        assert len(habits[5].completion_dates) == 14
+        assert reopened.history._cache == {}
+
+        # first access loads the dates of one shard only
+        assert habits[5].completion_dates == expected["5"]
+        assert list(reopened.history._cache) == [1]
+
+        # saving rewrites only the shard of the changed habit
+        os.utime(os.path.join(reopened.shard_dirname, "0.json"), (0, 0))
+        habits[5].check("15/03/2024")
+        reopened.save_habit(habits[5].to_dict())
+        assert os.path.getmtime(os.path.join(reopened.shard_dirname, "0.json")) == 0
+        expected["5"].append("15/03/2024")
+
+        # deleting every habit of a shard removes its file
+        for habit_id in (8, 9):
+            reopened.delete_habit(habit_id)
+            del expected[str(habit_id)]
+        assert not os.path.exists(os.path.join(reopened.shard_dirname, "2.json"))
+
+        final = Database(filename=filename, shard_size=4)
+        assert {key: list(h["completion dates"]) for key, h in final.db["habit"].items()} == expected
+
+    def teardown_method(self):
+        pass
@@ -0,0 +1,130 @@
+import json
+import os
+import pytest
+from mylife.DB import Database
+from mylife.sqlite_db import SQLiteDatabase
+from mylife.dates import parse_date
+from mylife.habit import HabitView
+from mylife.analytics import calculate_streak, count_in_range, streak_in_range
+import test_data
+
+
+class TestSQLiteDB:
+    """ Tests on SQLiteDatabase class """
+    def setup_method(self):
+        pass
+
+    def test_sqlite_functions(self, tmp_path):
+        json_db = Database(filename=str(tmp_path / "MylifeData.json"))
+        for habit in test_data.habits:
+            json_db.save_habit(habit.to_dict())
+
+        db = SQLiteDatabase(filename=str(tmp_path / "MylifeData.db"))
+        assert db.last_id() == -1
+
+        # migrate_from_json() keeps the JSON layout, including completion date order, rollups are aggregated by SQLite
+        assert db.migrate_from_json(json_db.filename) == 10
+        assert db.load_db()["habit"] == json_db.db["habit"]
+        assert db.rollups == json_db.rollups
+        assert db.last_id() == 9
+
+        # get_habit_by_name()
+        assert db.get_habit_by_name("Running") == json_db.db["habit"]["0"]
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("no such name")
+
+        # date range filtering is done by SQLite
+        assert db.get_completion_dates(0, start="01/03/2024", end="12/03/2024") == ["04/03/2024", "11/03/2024"]
+        assert db.get_completion_dates(0, start="1/3/2024", end="9/3/2024") == ["04/03/2024"]
+
+        # save_habit() validates and replaces
+        habit = db.get_habit_by_name("Reading")
+        habit["completion dates"] += ["15/03/2024", "2/4/2024"]
+        assert db.save_habit(habit)
+        assert db.get_habit_by_name("Reading")["completion dates"][-2:] == ["15/03/2024", "02/04/2024"]
+        assert db.get_completion_dates(1, start="01/04/2024") == ["02/04/2024"]
+        habit["frequency"] = "monthly"
+        assert not db.save_habit(habit)
+
+        # a save only writes the completion rows that changed
+        habit = db.get_habit_by_name("Reading")
+        changes = db.conn.total_changes
+        assert db.save_habit(dict(habit, **{"completion dates": habit["completion dates"] + ["03/04/2024"]}))
+        assert db.conn.total_changes - changes == 2  # the habit row and one completion row
+        changes = db.conn.total_changes
+        assert db.save_habit(dict(habit, **{"completion dates": habit["completion dates"][:-1]}))
+        assert db.conn.total_changes - changes == 3  # the habit row and the two removed completion rows
+        assert db.get_habit_by_name("Reading")["completion dates"] == habit["completion dates"][:-1]
+
+        # date range queries of views over the database are filtered by SQLite
+        view = HabitView(db.get_habit_by_name("Reading"), db)
+        first, last = parse_date("01/03/2024"), parse_date("31/03/2024")
+        inside = [day for day in habit["completion dates"][:-1] if first <= parse_date(day) <= last]
+        assert list(db.sorted_ordinals(1, first, last)) == sorted(map(parse_date, inside))
+        assert count_in_range(view, first, last) == len(inside)
+        assert streak_in_range(view, first, last) == calculate_streak(inside, view.frequency)
+
+        # delete_habit() removes the habit and its completions
+        db.delete_habit(1)
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Reading")
+        assert db.get_completion_dates(1) == []
+
+        with pytest.raises(FileNotFoundError):
+            db.migrate_from_json(str(tmp_path / "missing.json"))
+        with pytest.raises(ValueError):
+            db.archive_before(parse_date("01/03/2024"))
+
+        # the JSON file options are refused instead of being ignored
+        db.layout = "columnar"
+        with pytest.raises(ValueError):
+            db.compact()
+        db.compact()
+        assert db.flush() == 0
+
+        # a transaction commits every write of its block at once, or none of them
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.delete_habit(0)
+                db.save_habit(dict(db.get_habit_by_name("Yoga"), desc="Stretch"))
+                raise RuntimeError("abort")
+        assert db.get_habit_by_name("Running")["id"] == 0
+        assert db.get_habit_by_name("Yoga")["desc"] != "Stretch"
+        with db.transaction():
+            db.delete_habit(0)
+            db.save_habit(dict(db.get_habit_by_name("Yoga"), desc="Stretch"))
+        assert db.last_id() == 9 and db.get_habit_by_name("Yoga")["desc"] == "Stretch"
+        with pytest.raises(LookupError):
+            db.get_habit_by_name("Running")
+        db.close()
+
+    # a migration reads its source without a lock file and without initializing an empty one
+    def test_migration_leaves_source(self, tmp_path):
+        source = tmp_path / "MylifeData.json"
+        content = json.dumps({"database": str(source), "habit": {str(h.id): h.to_dict() for h in test_data.habits}})
+        source.write_text(content)
+        (tmp_path / "Empty.json").write_text("")
+        db = SQLiteDatabase(filename=str(tmp_path / "MylifeData.db"))
+        assert db.migrate_from_json(str(source)) == 10
+        assert db.migrate_from_json(str(tmp_path / "Empty.json")) == 0
+        assert source.read_text() == content and (tmp_path / "Empty.json").read_text() == ""
+        assert sorted(os.listdir(tmp_path)) == ["Empty.json", "MylifeData.db", "MylifeData.json"]
+        db.close()
+
+    # seed injection validates like the JSON backend: every invalid habit is reported and nothing is injected
+    def test_seed_validation(self, tmp_path, capsys):
+        db = SQLiteDatabase(filename=str(tmp_path / "MylifeData.db"))
+        habits = [habit.to_dict() for habit in test_data.habits[:3]]
+        habits[1] = dict(habits[1], frequency="monthly")
+        seed = tmp_path / "seed.json"
+        seed.write_text(json.dumps({"habit": {str(h["id"]): h for h in habits}}))
+        assert not db.inject_seed_data(str(seed))
+        assert "Validation Error in habit 1" in capsys.readouterr().out
+        assert db.load_db()["habit"] == {}
+
+        assert db.inject_seed_data("mylife/seed_dict.json")
+        assert db.get_habit_by_name("Yoga")["id"] == 6
+        db.close()
+
+    def teardown_method(self):
+        pass
@@ -0,0 +1,47 @@
+from mylife.DB import Database
+from mylife.dates import parse_date
+from mylife.synthetic import generate_habits, habit_name
+from mylife import analytics, benchmarks
+
+
+class TestSynthetic:
+    """ Tests on the synthetic data generator and the benchmark suite """
+
+    def test_generator(self, tmp_path):
+        habits = generate_habits(500, completions=20, daily_ratio=0.6, seed=4)
+        assert habits == generate_habits(500, completions=20, daily_ratio=0.6, seed=4)
+        assert [h["id"] for h in habits] == list(range(500))
+        assert len({h["name"] for h in habits}) == 500
+        assert habit_name(0) == "Habit A" and habit_name(26) == "Habit Aa"
+        assert 0.5 < sum(h["frequency"] == "daily" for h in habits) / 500 < 0.7
+        assert all(10 <= len(h["completion dates"]) <= 30 for h in habits)
+
+        # every habit is valid, some histories are back-dated and some have gaps
+        assert Database(str(tmp_path / "MylifeData.json")).validate_many(habits) == {}
+        ordinals = [[parse_date(day) for day in h["completion dates"]] for h in habits]
+        assert any(days != sorted(days) for days in ordinals)
+        assert any(b - a > 7 for days in ordinals for a, b in zip(sorted(days), sorted(days)[1:]))
+
+    def test_benchmark_suite(self, tmp_path, capsys):
+        results = benchmarks.run_suite(count=30, completions=5, repeat=1)
+        assert set(results) >= {"load_db", "save_db", "streaks_for_all", "cli lsh", "cli check"}
+        assert all(result["seconds"] > 0 and result["peak_kib"] >= 0 for result in results.values())
+
+        slow = {name: {"seconds": result["seconds"] / 10, "peak_kib": 0} for name, result in results.items()}
+        assert set(benchmarks.compare(results, slow)) == set(results)
+        assert benchmarks.compare(results, results) == []
+        assert "ratio" in benchmarks.report(results, slow)
+
+        baseline = str(tmp_path / "baseline.json")
+        args = ["--habits", "20", "--completions", "4", "--repeat", "1", "--baseline", baseline]
+        assert benchmarks.main(args + ["--save-baseline"]) == 0
+        assert benchmarks.main(args + ["--tolerance", "1000"]) == 0
+        assert "load_db" in capsys.readouterr().out
+
+    # the NumPy streak engine has to beat the per-habit loop it replaces
+    def test_batch_streaks_faster(self):
+        results = benchmarks.run_suite(count=300, completions=200, repeat=3, only=["calculate_streak loop", "batch_streaks"])
+        assert set(results) == {"calculate_streak loop", "batch_streaks"}
+        assert benchmarks.not_faster(results) == []
+        assert benchmarks.not_faster(dict(results, batch_streaks=results["calculate_streak loop"])) == \
+            ([] if analytics._numpy() is None else ["batch_streaks"])
@@ -0,0 +1,46 @@
+import os
+import pytest
+import test_data
+from mylife.DB import Database
+from mylife.tenants import TenantStore, fleet_report, tenant_summary
+
+
+class TestTenants:
+    """ Tests on the tenant store and the fleet report """
+
+    def test_fleet_report(self, tmp_path):
+        store = TenantStore(str(tmp_path))
+        for number, user in enumerate(["alice", "bob", "carol"]):
+            db = store.open(user)
+            db.save_habits([habit.to_dict() for habit in test_data.habits[number * 3:number * 3 + 3]])
+        with open(store.path_of("mallory", create=True), "w") as f:
+            f.write("{not json")
+
+        assert [user for user, _ in store.tenants()] == ["alice", "bob", "carol", "mallory"]
+        assert os.path.dirname(os.path.dirname(store.path_of("alice"))) == os.path.join(str(tmp_path), TenantStore.shard_of("alice"))
+        with pytest.raises(ValueError):
+            store.path_of("../alice")
+
+        # the pool gives the same report as a sequential run, a broken tenant is reported and skipped
+        report = fleet_report(str(tmp_path), workers=2)
+        assert report == fleet_report(str(tmp_path), workers=1)
+        assert report["tenants"] == 3
+        assert report["habits"] == 9
+        assert list(report["errors"]) == ["mallory"]
+        summaries = [tenant_summary(tenant) for tenant in store.tenants()[:3]]
+        assert report["completions"] == sum(summary["completions"] for summary in summaries)
+        assert report["longest"] == max(summary["longest"] for summary in summaries)
+
+    # a report only reads: no lock file is created and an empty tenant file is not initialized
+    def test_report_is_read_only(self, tmp_path):
+        store = TenantStore(str(tmp_path))
+        store.open("alice").save_habits([habit.to_dict() for habit in test_data.habits[:3]])
+        os.remove(store.path_of("alice") + ".lock")
+        open(store.path_of("bob", create=True), "w").close()
+
+        report = fleet_report(str(tmp_path), workers=1)
+        assert (report["tenants"], report["habits"]) == (2, 3)
+        assert not os.path.exists(store.path_of("alice") + ".lock") and not os.path.exists(store.path_of("bob") + ".lock")
+        assert os.path.getsize(store.path_of("bob")) == 0
+        with pytest.raises(ValueError):
+            Database(store.path_of("alice"), read_only=True).save_habit(test_data.habits[3].to_dict())
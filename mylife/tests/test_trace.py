@@ -0,0 +1,48 @@
+import json
+import os
+import pstats
+from click.testing import CliRunner
+from mylife import mla, trace
+from mylife.synthetic import generate_habits, write_database
+
+
+class TestTrace:
+    """ Tests on the --profile flag and MYLIFE_TRACE """
+
+    def run(self, tmp_path, args, env=None):
+        mla._database = None
+        filename = str(tmp_path / "MylifeData.json")
+        if not os.path.exists(filename):
+            write_database(filename, generate_habits(20, completions=10))
+        try:
+            runner = CliRunner(mix_stderr=False)
+        except TypeError:  # click 8.2 always keeps stderr apart
+            runner = CliRunner()
+        result = runner.invoke(mla.main, args, env=dict(env or {}, MYLIFE_DB=filename))
+        mla._database = None
+        assert result.exit_code == 0, result.output
+        return result
+
+    def test_profile_flag(self, tmp_path):
+        result = self.run(tmp_path, ["--profile", "check", "-n", "Habit A", "-cd", "01/01/2030"])
+        report = json.loads(result.stderr.strip().splitlines()[-1])
+        assert report["command"] == "check"
+        assert {"read", "json parse", "validation"} <= set(report["phases"])
+        assert report["counters"]["bytes read"] > 0
+        assert report["counters"]["bytes written"] > 0
+        assert report["counters"]["streak computations"] >= 1
+        assert not trace.enabled
+
+        # nothing is recorded without the flag
+        assert self.run(tmp_path, ["lsh"]).stderr == ""
+
+    def test_trace_env_and_cprofile(self, tmp_path):
+        trace_file = str(tmp_path / "trace.jsonl")
+        self.run(tmp_path, ["lsh"], env={"MYLIFE_TRACE": trace_file})
+        self.run(tmp_path, ["anal"], env={"MYLIFE_TRACE": trace_file})
+        with open(trace_file) as f:
+            assert [json.loads(line)["command"] for line in f] == ["lsh", "anal"]
+
+        profile_out = str(tmp_path / "top.prof")
+        self.run(tmp_path, ["--profile-out", profile_out, "top"])
+        assert pstats.Stats(profile_out).total_calls > 0
@@ -0,0 +1,62 @@
+import time
+from contextlib import nullcontext
+
+# Lightweight instrumentation of the hot paths, off unless 'mla --profile' or MYLIFE_TRACE turns it on.
+# Call sites check the module level 'enabled' flag first, so a disabled trace costs one attribute lookup.
+
+enabled = False
+phases = {}    # phase name -> accumulated seconds
+counters = {}  # counter name -> count (calls, bytes, ...)
+_profiler = None
+_NULL = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def phase(name: str):
+    """ Context manager adding the time spent inside it to a named phase, a no-op while tracing is off."""
+    return _Phase(name) if enabled else _NULL
+
+def count(name: str, amount: int = 1):
+    """ Adds amount to a named counter, callers on hot paths check 'enabled' before calling."""
+    if enabled:
+        counters[name] = counters.get(name, 0) + amount
+
+def start(profile: bool = False):
+    """ Clears previous results and turns tracing on, profile=True also runs cProfile until finish()."""
+    global enabled, _profiler
+    phases.clear()
+    counters.clear()
+    enabled = True
+    if profile:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def finish(profile_out: str = None) -> dict[str, any]:
+    """
+    Turns tracing off and returns what was recorded. The cProfile statistics are dumped to profile_out when given.
+
+    :return: {"phases": {name: milliseconds}, "counters": {name: count}}
+    :rtype: dict[str, any]
+    """
+    global enabled, _profiler
+    enabled = False
+    if _profiler is not None:
+        _profiler.disable()
+        if profile_out:
+            _profiler.dump_stats(profile_out)
+        _profiler = None
+    return {"phases": {name: round(seconds * 1000, 3) for name, seconds in phases.items()}, "counters": dict(counters)}